@@ -0,0 +1,339 @@
+#! python3
+r""" benchmark.py
+
+Benchmarks for the hot paths, on synthetic libraries that look like
+diodes-inc.txt, so regressions show up before they reach a real library.
+
+synthetic_library yields the text of n models from a seeded generator.
+Each model has a part banner, an *SRC= comment and a .MODEL card split over
++ continuation lines. Values use scale suffixes (844n, 2.06m, 1meg),
+exponents and bare numbers, and some models spell parameters with aliases
+(IKF, CJ0, MJ, JS, PB) or set MFG and TYPE. Every 50th part is a .SUBCKT
+wrapping its own diode model, which parse skips. The same seed always gives
+the same library. synthetic_four gives .four files in the ngspice format.
+
+Benchmarks:
+    parse               SpiceDiode.parse of the generated file (the scan engine)
+    parse_regex         the same with the line by line regex engine
+    float               SpiceDiode.float of the literals in the library
+    forward_voltage     SpiceDiode.forward_voltage at 1mA for each model
+    subckt              AntiParallelDiodes.subckt for pairs of models
+    four                FourierAnalysis of synthetic .four files
+
+Each reports items/s, MB/s where there is text, the p50/p90/p99 latency of
+one item (a model, literal, call or file), from the fastest of --repeat
+runs, and the peak Python memory (tracemalloc, in a separate pass so it
+does not slow the timed ones). --save
+writes the results as JSON and --baseline compares against a saved run,
+exiting with 1 when anything is slower by more than --tolerance.
+
+    python benchmark.py --models 100k --save baseline.json
+    python benchmark.py --models 100k --baseline baseline.json
+"""
+
+import argparse
+import array
+import gc
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import diodes
+import distortion
+import four_table
+
+multipliers = {"" : 1, "k" : 10**3, "m" : 10**6, "meg" : 10**6, "g" : 10**9}
+
+def count(text):
+    """
+    Return a model count like 100, 1k, 10M or 2.5k. Unlike a spice value, M
+    (and meg) is a million and G a billion.
+    """
+    m = re.match(r"^\s*(\d+(?:\.\d*)?|\.\d+)\s*([a-z]*)\s*$", text, re.I)
+    if not m or m.group(2).lower() not in multipliers:
+        raise argparse.ArgumentTypeError("{text} is not a count like 100, 1k or 10M".format(text=text))
+    n = int(float(m.group(1)) * multipliers[m.group(2).lower()])
+    if n < 1:
+        raise argparse.ArgumentTypeError("{text} is less than one model".format(text=text))
+    return n
+
+parser = argparse.ArgumentParser(description='Benchmark parsing and evaluating diode libraries on synthetic data.')
+parser.add_argument('--models', '-n', type=count, default="1k", help='Models in the synthetic library, with a k, M or G multiplier: 1k, 100k, 10M.')
+parser.add_argument('--seed', type=int, default=1, help='The generator seed.')
+parser.add_argument('--benchmarks', '-b', nargs='+', help='Which benchmarks to run, all of them by default.')
+parser.add_argument('--four_files', type=int, default=1000, help='The number of synthetic .four files.')
+parser.add_argument('--calls', type=int, default=100000, help='The most models or literals used by the per call benchmarks.')
+parser.add_argument('--repeat', '-r', type=int, default=3, help='Time each benchmark this many times and keep the fastest.')
+parser.add_argument('--no_memory', action='store_true', help='Skip the tracemalloc pass.')
+parser.add_argument('--save', help='Write the results to this JSON file.')
+parser.add_argument('--baseline', help='Compare with the results in this JSON file.')
+parser.add_argument('--tolerance', type=float, default=0.10, help='The slow down that counts as a regression.')
+parser.add_argument('--library', help='Write the synthetic library to this file and keep it.')
+
+aliases = {"IK" : "IKF", "CJO" : "CJ0", "M" : "MJ", "IS" : "JS", "VJ" : "PB"}
+kinds = (("Si", "Rectifier"), ("Schottky", "Schottky Barrier Rectifier"), ("Si", "Switching Diode"), ("Zener", "Zener Diode"))
+
+def literal(rng, value):
+    """Write value the way vendor libraries do, picked at random."""
+    style = rng.random()
+    if style < 0.6:
+        for scale, suffix in ((1e6, "meg"), (1e3, "k"), (1, ""), (1e-3, "m"), (1e-6, "u"), (1e-9, "n"), (1e-12, "p"), (1e-15, "f")):
+            if abs(value) >= scale:
+                return "{0:.3g}{1}".format(value / scale, suffix)
+        return "{0:.3g}f".format(value / 1e-15)
+    if style < 0.85:
+        return "{0:.3E}".format(value)
+    return "{0:.6g}".format(value)
+
+def synthetic_model(rng, name, part):
+    """Return the text of one part: banner, SRC comment and the .MODEL card (in a .SUBCKT for every 50th)."""
+    kind, description = kinds[rng.randrange(len(kinds))]
+    bv = rng.choice((20, 30, 40, 50, 75, 100, 200, 400, 600, 1000))
+    current = rng.choice((0.2, 0.5, 1, 2, 3, 5, 10))
+    values = [
+        ("IS", 10 ** rng.uniform(-15, -5)),
+        ("RS", 10 ** rng.uniform(-3, 1)),
+        ("BV", bv),
+        ("IBV", 10 ** rng.uniform(-7, -3)),
+        ("CJO", 10 ** rng.uniform(-12, -9)),
+        ("M", rng.uniform(0.3, 0.5)),
+        ("N", rng.uniform(0.9, 2.2)),
+        ("TT", 10 ** rng.uniform(-9, -5)),
+    ]
+    if rng.random() < 0.3:
+        values.append(("IK", 10 ** rng.uniform(-3, 1)))
+    if rng.random() < 0.2:
+        values.append(("VJ", rng.uniform(0.3, 1)))
+    parameters = []
+    for p, value in values:
+        if p in aliases and rng.random() < 0.2:
+            p = aliases[p]
+        parameters.append("{p}={v}".format(p=p, v=literal(rng, value)))
+    if rng.random() < 0.05:
+        parameters.append("mfg=Synthetic type={kind}".format(kind=kind))
+    split = rng.randrange(2, len(parameters))
+    card = ".MODEL {name} D  ( {first}\n+ {rest} )\n".format(name=name, first=" ".join(parameters[:split]), rest="  ".join(parameters[split:]))
+    lines = [
+        "{part}{stars}\n".format(part=part, stars="*" * 60),
+        "*SRC={part};{name};Synthetic;{kind};  {bv}V  {a}A  {trr}s   Synthetic Inc. {description}\n".format(
+            part=part, name=name, kind=kind, bv=bv, a=current, trr=literal(rng, values[7][1]), description=description),
+    ]
+    if int(part[2:]) % 50 == 49:
+        lines.append(".SUBCKT {part} 1 2\nD1 2 1 DMOD\n{card}.ENDS {part}\n".format(part=part, card=card.replace(name, "DMOD", 1)))
+    else:
+        lines.append(card)
+    lines.append("*" * 60 + "\n\n")
+    return "".join(lines)
+
+def synthetic_library(n, seed=1, chunk=1000):
+    """Yield the text of a library of n models in pieces of chunk parts."""
+    rng = random.Random(seed)
+    for start in range(0, n, chunk):
+        yield "".join(synthetic_model(rng, "DI_SYN{0:08d}".format(i), "SY{0:08d}".format(i)) for i in range(start, min(start + chunk, n)))
+
+def write_library(path, n, seed=1):
+    """Write synthetic_library(n, seed) to path and return the number of models outside subckts."""
+    with open(path, "w") as f:
+        for text in synthetic_library(n, seed):
+            f.write(text)
+    return n - n // 50
+
+def synthetic_four(n, seed=1, harmonics=21):
+    """Yield (name, text) for n .four files with decaying random harmonics."""
+    import numpy
+    rng = numpy.random.default_rng(seed)
+    for i in range(n):
+        magnitude = rng.random(harmonics) * 0.5 ** numpy.arange(harmonics)
+        magnitude[1] = rng.uniform(0.3, 1)
+        phase = rng.uniform(-180, 180, harmonics)
+        thd = distortion.thd(magnitude[numpy.newaxis, :])[0]
+        yield "SYN{0:06d}__SYN{0:06d}.four".format(i), distortion.four_text(magnitude, phase, thd)
+
+class Result():
+    def __init__(self, name, items, seconds, latencies, size=0, peak=None):
+        self.name = name
+        self.items = items
+        self.seconds = seconds
+        self.size = size
+        self.peak = peak
+        ordered = sorted(latencies)
+        def percentile(q):
+            return ordered[min(int(q * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+        self.percentiles = {"p50" : percentile(0.5), "p90" : percentile(0.9), "p99" : percentile(0.99)}
+    def __repr__(self):
+        return "{name:<16}{rate:>12.0f}/s{mb:>9}{p50:>10.2f}{p90:>10.2f}{p99:>10.2f}{peak:>10}".format(
+            name=self.name, rate=self.rate, mb="{0:.1f}".format(self.mb_rate) if self.size else "-",
+            peak="{0:.1f}".format(self.peak / 1e6) if self.peak is not None else "-",
+            **{k : v * 1e6 for k, v in self.percentiles.items()})
+    header = "{0:<16}{1:>14}{2:>9}{3:>10}{4:>10}{5:>10}{6:>10}".format("Benchmark", "Items", "MB/s", "p50 us", "p90 us", "p99 us", "Peak MB")
+    @property
+    def rate(self):
+        return self.items / self.seconds if self.seconds else 0.0
+    @property
+    def mb_rate(self):
+        return self.size / 1e6 / self.seconds if self.seconds else 0.0
+    def to_dict(self):
+        return {"items" : self.items, "seconds" : self.seconds, "rate" : self.rate, "mb_rate" : self.mb_rate,
+            "peak" : self.peak, "percentiles" : self.percentiles}
+
+def timed(items):
+    """Run through an iterable, return (count, seconds, latency of each item)."""
+    latencies = array.array('d')
+    clock = time.perf_counter
+    start = last = clock()
+    count = 0
+    for _ in items:
+        now = clock()
+        latencies.append(now - last)
+        last = now
+        count += 1
+    return count, last - start, latencies
+
+def bench_parse(context, engine=None):
+    path = context["library"]
+    def run():
+        with open(path) as f:
+            yield from diodes.SpiceDiode.parse(f, engine=engine)
+    return run, os.path.getsize(path)
+
+def bench_parse_regex(context):
+    return bench_parse(context, "regex")
+
+def bench_float(context):
+    literals = context["literals"]
+    def run():
+        for x in literals:
+            yield diodes.SpiceDiode.float(None, x)
+    return run, sum(len(x) for x in literals)
+
+def bench_forward_voltage(context):
+    models = context["models"]
+    def run():
+        for diode in models:
+            yield diode.forward_voltage(.001)
+    return run, 0
+
+def bench_subckt(context):
+    models = context["models"]
+    def run():
+        for positive, negative in zip(models, models[1:] + models[:1]):
+            yield diodes.AntiParallelDiodes([positive.name] * 2, [negative.name], 10).subckt()
+    return run, 0
+
+def bench_four(context):
+    files = context["four"]
+    def run():
+        for name, text in files:
+            yield four_table.FourierAnalysis(name, text)
+    return run, sum(len(text) for _, text in files)
+
+benchmarks = {
+    "parse" : bench_parse,
+    "parse_regex" : bench_parse_regex,
+    "float" : bench_float,
+    "forward_voltage" : bench_forward_voltage,
+    "subckt" : bench_subckt,
+    "four" : bench_four,
+}
+
+def run_benchmark(name, context, memory=True, repeat=3):
+    """Time one benchmark, keeping the fastest of repeat runs, then run it again under tracemalloc for its peak."""
+    run, size = benchmarks[name](context)
+    best = None
+    for _ in range(max(repeat, 1)):
+        gc.collect()
+        timing = timed(run())
+        if best is None or timing[1] < best[1]:
+            best = timing
+    items, seconds, latencies = best
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        for _ in run():
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return Result(name, items, seconds, latencies, size, peak)
+
+def build_context(library, calls, four_files, seed, names):
+    """Load what the selected benchmarks need from the library file."""
+    context = {"library" : library}
+    if {"float", "forward_voltage", "subckt"} & set(names):
+        with open(library) as f:
+            head = []
+            for diode in diodes.SpiceDiode.parse(f):
+                head.append(diode)
+                if len(head) >= calls:
+                    break
+        context["models"] = head
+        literals = []
+        with open(library) as f:
+            for name, parameters, _ in diodes.SpiceDiode.scan(f.read(calls * 400)):
+                literals.extend(m.group('value') for m in diodes.SpiceDiode.re_parameters.finditer(parameters)
+                    if m.group('attribute').upper() not in diodes.SpiceDiode.infomational_parameters)
+                if len(literals) >= calls:
+                    break
+        context["literals"] = literals[:calls]
+    if "four" in names:
+        context["four"] = list(synthetic_four(four_files, seed))
+    return context
+
+def compare(results, baseline, tolerance):
+    """Print each result against the baseline, return the names that got slower than tolerance."""
+    regressions = []
+    for result in results:
+        before = baseline.get(result.name)
+        if not before or not before["rate"]:
+            continue
+        change = result.rate / before["rate"] - 1
+        slower = change < -tolerance
+        if slower:
+            regressions.append(result.name)
+        p99 = result.percentiles["p99"] / before["percentiles"]["p99"] - 1 if before["percentiles"]["p99"] else 0
+        print ("{name:<16}{change:>+9.1%} rate {p99:>+9.1%} p99{flag}".format(
+            name=result.name, change=change, p99=p99, flag="  REGRESSION" if slower else ""))
+    return regressions
+
+def main():
+    args = parser.parse_args()
+    n = args.models
+    names = args.benchmarks or list(benchmarks)
+    for name in names:
+        if name not in benchmarks:
+            parser.error("Unknown benchmark {name}, expected one of {names}.".format(name=name, names=", ".join(benchmarks)))
+    library = args.library or os.path.join(tempfile.mkdtemp(), "synthetic.txt")
+    start = time.perf_counter()
+    models = write_library(library, n, args.seed)
+    print ("{n} models ({m} outside subckts), {mb:.1f} MB generated in {s:.1f} s".format(n=n, m=models, mb=os.path.getsize(library) / 1e6, s=time.perf_counter() - start), file=sys.stderr)
+    try:
+        context = build_context(library, args.calls, args.four_files, args.seed, names)
+        print (Result.header)
+        results = []
+        for name in names:
+            results.append(run_benchmark(name, context, not args.no_memory, args.repeat))
+            print (results[-1])
+    finally:
+        if not args.library:
+            os.remove(library)
+            os.rmdir(os.path.dirname(library))
+    run = {"models" : n, "seed" : args.seed, "python" : sys.version.split()[0],
+        "results" : {result.name : result.to_dict() for result in results}}
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(run, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("models") != n:
+            print ("The baseline is for {b} models, this run is {n}.".format(b=baseline.get("models"), n=n))
+        if compare(results, baseline["results"], args.tolerance):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#! python3
+r""" consonance.py
+
+Rank diode pairs by how musical their distortion is.
+
+Each harmonic k lands near a scale degree above the fundamental, see
+harmonic_cents. consonance_weights gives it a weight from 1 (octaves) to 0
+(m2, tritone, or 50 cents out of tune), computed once for harmonics 1 to N.
+The Mag^2 of every harmonic of every pair is split by those weights, in one
+product of the FourierTable magnitudes with the weights:
+
+Consonant THD = sqrt( Sum(2, n)(w[k]*Mag^2[k]) ) / Mag[1]
+Dissonant THD = sqrt( Sum(2, n)((1-w[k])*Mag^2[k]) ) / Mag[1]
+Score         = Sum(w[k]*Mag^2[k]) / Sum(Mag^2[k])
+
+so Consonant^2 + Dissonant^2 = THD^2, and the score is the consonant share
+of the distortion, 1 when all of it is octaves. Pairs are ranked by score
+and written as CSV beside four_table.txt, four_table_consonance.txt by
+default.
+"""
+
+import argparse
+import os
+
+import numpy
+
+import four_table
+import harmonic_cents
+
+parser = argparse.ArgumentParser(description='Rank diode pairs by the consonance of their harmonic distortion.')
+parser.add_argument('--four_folder', default=r"E:\eda\fourier", help='Where all the .four files are.')
+parser.add_argument('--diode_list', '-l', default=r"E:\eda\diodes\diode-list.txt", help='A file with one diode model name per line.')
+parser.add_argument('--table', '-t', default="four_table.txt", help='The four_table.py output, the consonance table is written beside it.')
+parser.add_argument('--out', '-o', help='The table to write, default <table>_consonance.txt.')
+parser.add_argument('--workers', '-j', type=int, default=None, help='Number of worker processes for parsing, default is one per core.')
+
+def score(table):
+    """
+    Return (consonant THD, dissonant THD, score) arrays for every pair in a
+    four_table.FourierTable. Missing harmonics count as 0.
+    """
+    width = table.magnitude.shape[1]
+    weights = harmonic_cents.consonance_weights(max(width - 1, 0))[1:] # harmonics 2 to width-1
+    squares = numpy.square(numpy.nan_to_num(table.magnitude[:, 2:], nan=0.0))
+    total = squares.sum(axis=1)
+    consonant = squares @ weights
+    fundamental = table.magnitude[:, 1]
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        consonant_thd = 100 * numpy.sqrt(consonant) / fundamental
+        dissonant_thd = 100 * numpy.sqrt(numpy.maximum(total - consonant, 0)) / fundamental
+        share = numpy.where(total > 0, consonant / total, 0)
+    return consonant_thd, dissonant_thd, share
+
+def rank(table):
+    """Return the complete rows of table in score order, best first, with score(table)."""
+    consonant_thd, dissonant_thd, share = score(table)
+    rows = numpy.flatnonzero(table.complete())
+    rows = rows[numpy.argsort(-share[rows], kind='stable')]
+    return rows, (consonant_thd, dissonant_thd, share)
+
+def write_table(table, out_file):
+    """Write the ranked pairs as CSV."""
+    rows, (consonant_thd, dissonant_thd, share) = rank(table)
+    out_file.write("Rank,Positive,Negative,THD,Consonant,Dissonant,Score\n")
+    for place, (row, thd, consonant, dissonant, s) in enumerate(zip(rows.tolist(), table.thd[rows].tolist(),
+            consonant_thd[rows].tolist(), dissonant_thd[rows].tolist(), share[rows].tolist()), 1):
+        positive, negative = table.pairs[row]
+        out_file.write("{0},{1},{2},{3},{4:.4f},{5:.4f},{6:.4f}\n".format(place, positive, negative, thd, consonant, dissonant, s))
+
+def main():
+    args = parser.parse_args()
+    with open(args.diode_list) as f:
+        diode_list = f.read().splitlines()
+    table, _ = four_table.load_table(args.four_folder, diode_list, args.workers)
+    out = args.out or "{0}_consonance{1}".format(*os.path.splitext(args.table))
+    with open(out, "w") as f:
+        write_table(table, f)
+    print ("{n} pairs ranked in {out}".format(n=len(table), out=out))
+
+if __name__ == '__main__':
+    main()
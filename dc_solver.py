@@ -0,0 +1,106 @@
+#! python3
+r""" dc_solver.py
+
+Solve the diode-test.py circuit in process instead of running ngspice.
+
+I1      0               1                DC sweep
+D<i>    1               _<model>         <model>
+R<i>    _<model>        0                1k
+
+Each branch is a diode (iv_curves.junction_current) with RS + R in
+series, and the branches share I1. The unknowns are every junction voltage
+vd_k and V(1) at every sweep point, solved together by Newton iteration the
+way SPICE does it, vectorized across models and points:
+
+vd_k + (RS + R)*Id_k - V(1) = 0         each branch
+Sum(Id_k) = I1                          node 1
+
+Each branch equation gives dvd_k in terms of dV(1), so an iteration is one
+junction_current evaluation and a sum over the models. Steps up an
+exponential are damped like pnjlim, and sweep points drop out as they
+converge. Then V(1,_model) = V(1) - Id_k*R. With one model all of I1 goes
+through it and V(1,_model) is just its forward voltage at I1.
+
+    v1, curves = dc_sweep(lazy_library.LazyLibrary("diodes-inc.txt"), ["DI_1N4148W", "BAS70LP"])
+"""
+
+import argparse
+
+import numpy
+
+import diode_library
+import iv_curves
+import lazy_library
+
+parser = argparse.ArgumentParser(description='Solve the diode test circuit and print V(1,_model) for each model.')
+parser.add_argument('models', nargs='+', help='The name(s) of the diode model(s) in the test circuit.')
+parser.add_argument('--model_file', '-f', default=r"E:\eda\diodes\diodes-inc.txt", help='The file to get the model(s) from.')
+parser.add_argument('--start', type=float, default=0, help='The first I1 current.')
+parser.add_argument('--stop', type=float, default=.001, help='The last I1 current.')
+parser.add_argument('--step', type=float, default=.00000001, help='The I1 step.')
+parser.add_argument('--resistance', '-r', type=float, default=1e3, help='The resistor in series with each diode.')
+
+def sweep_currents(start=0, stop=.001, step=.00000001):
+    """Return the I1 values of a SPICE 'dc I1 start stop step' sweep."""
+    return start + step * numpy.arange(int(round((stop - start) / step)) + 1)
+
+def limit(vd, step, nvt, bv):
+    """
+    Damp Newton steps that climb an exponential, forward past zero or into
+    breakdown past -BV, to nvt*log(1 + step/nvt) like SPICE's pnjlim.
+    """
+    new = vd + step
+    damped = nvt * numpy.log1p(numpy.abs(step) / nvt)
+    climbing = ((step > 0) & (new > 0)) | ((step < 0) & (new < -bv))
+    return numpy.where(climbing, vd + numpy.sign(step) * numpy.minimum(damped, numpy.abs(step)), new)
+
+def dc_sweep(models, currents, resistance=1e3, temperature=300, iterations=200, tolerance=1e-12):
+    """
+    Return (V(1), V(1,_model)) for each I1 current: a (points) array and a
+    (models x points) array. models is a DiodeLibrary, a list of SpiceDiode
+    objects or a dict of parameter columns, one branch per model.
+    """
+    columns = dict(iv_curves.columns(models))
+    columns["RS"] = numpy.asarray(columns["RS"], dtype=numpy.float64) + resistance
+    p = iv_curves.parameters(columns)
+    vt = iv_curves.thermal_voltage(temperature)
+    currents = numpy.asarray(currents, dtype=numpy.float64)
+    n = len(p["IS"])
+    # start from the ideal junction voltage with I1 split evenly
+    vd = numpy.array(numpy.broadcast_to(iv_curves.ideal_voltage(p, currents / n, vt), (n, len(currents))))
+    current, _ = iv_curves.junction_current(p, vd, vt)
+    v1 = (vd + p["RS"] * current).mean(axis=0)
+    active = numpy.arange(len(currents))
+    for _ in range(iterations):
+        x, i1 = vd[:, active], currents[active]
+        current, conductance = iv_curves.junction_current(p, x, vt)
+        # branch k: x + RS*Id - V(1) = 0, node 1: Sum(Id) = I1, eliminate the branches for dV(1)
+        h = x + p["RS"] * current - v1[active]
+        a = 1 / (1 + p["RS"] * conductance)
+        dv1 = (i1 - current.sum(axis=0) + (conductance * h * a).sum(axis=0)) / (conductance * a).sum(axis=0)
+        step = (dv1 - h) * a
+        vd[:, active] = limit(x, step, p["N"] * vt, p["BV"])
+        v1[active] += dv1
+        converged = numpy.all(numpy.abs(step) <= tolerance * (1 + numpy.abs(x)), axis=0) & (numpy.abs(dv1) <= tolerance * (1 + numpy.abs(v1[active])))
+        active = active[~converged]
+        if not len(active):
+            break
+    current, _ = iv_curves.junction_current(p, vd, vt)
+    return v1, v1 - current * resistance
+
+def print_curves(names, currents, curves, file=None):
+    """Print the V(1,_model) curves as CSV, one row per I1 current."""
+    print (",".join(["I1"] + ["V(1,_{model})".format(model=model) for model in names]), file=file)
+    for i, row in zip(currents, curves.T):
+        print (",".join(["{0:.6g}".format(i)] + ["{0:.6f}".format(v) for v in row]), file=file)
+
+def main():
+    args = parser.parse_args()
+    with lazy_library.LazyLibrary(args.model_file) as library:
+        models = diode_library.DiodeLibrary([library[model] for model in args.models])
+    currents = sweep_currents(args.start, args.stop, args.step)
+    v1, curves = dc_sweep(models, currents, args.resistance)
+    print_curves(args.models, currents, curves)
+
+if __name__ == '__main__':
+    main()
@@ -29,8 +29,12 @@ import argparse
 parser = argparse.ArgumentParser(description='Create a spice listing for testing diodes.')
 parser.add_argument('models', nargs='+', help='The name(s) of the diode model(s) to make a test circuit for.')
 parser.add_argument('--model_file', '-f', help='The file to get the model(s) from.')
+parser.add_argument('--solve', action='store_true', help='Solve the DC sweep here and print V(1,_model) as CSV instead of the spice listing.')
+parser.add_argument('--local', action='store_true', help='Do not ask diode_server.py, even when it is running.')
+parser.add_argument('--stats', action='store_true', help='Print parse counters and stage timings as JSON on stderr.')
 
-import diodes
+import diode_server
+import instrument
 
 circuit = """
 {model_list}
@@ -59,20 +63,52 @@ R{i:<7}_{model:<15}0                1k
 
 voltage = "V(1,_{model})"
 
+def listing(models, library):
+    """Return the spice listing testing models, looked up in library (anything with library[name])."""
+    return circuit.format(
+        model_list=" ".join(models),
+        nodes="\n".join([node.format(i=i, model=model) for i, model in enumerate(models)]),
+        models="\n".join([str(library[model]) for model in models]),
+        voltage_list=" ".join([voltage.format(model=model) for model in models]),
+    )
+
+def solve(models, library, file=None):
+    """Print the DC sweep of the listing as CSV, solved with dc_solver."""
+    import dc_solver
+    # the same sweep as "dc I1 0 .001 .00000001" in the listing
+    currents = dc_solver.sweep_currents(0, .001, .00000001)
+    v1, curves = dc_solver.dc_sweep([library[model] for model in models], currents)
+    dc_solver.print_curves(models, currents, curves, file=file)
+
 def main():
     args = parser.parse_args()
-    
-    if not args.model_file:
+    if args.stats:
+        instrument.enable()
+    test(args)
+    if args.stats:
+        instrument.report()
+
+def test(args):
+    model_file = args.model_file
+    if not model_file:
         model_file = r"E:\eda\diodes\diodes-inc.txt"
-    d = {diode.name : diode for diode in diodes.SpiceDiode.parse(model_file)}
-
-    print (circuit.format(
-        model_list=" ".join(args.models),
-        nodes="\n".join([node.format(i=i, model=model) for i, model in enumerate(args.models)]),
-        models="\n".join([str(d[model]) for model in args.models]),
-        voltage_list=" ".join([voltage.format(model=model) for model in args.models]),
-    ))
-        
+
+    if not args.local:
+        try:
+            print (diode_server.request("netlist", model_file=model_file, models=args.models, solve=args.solve), end="")
+            return
+        except diode_server.Unavailable:
+            pass
+
+    # only imported when there is no server, they are most of the start up time
+    import lazy_library
+    with lazy_library.LazyLibrary(model_file) as d:
+        with instrument.stage("netlist"):
+            if args.solve:
+                solve(args.models, d)
+            else:
+                print (listing(args.models, d))
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,250 @@
+#! python3
+r""" diode_db.py
+
+Keep diode libraries in an SQLite database instead of parsing them again on
+every run.
+
+Each model is a row of the models table with one REAL column per
+SpiceDiode.spice_parameters entry (defaults included, so ranges work on
+every row), MFG and TYPE, the library file and line it came from, and the
+*SRC= comment that goes with it (see diode_query.DiodeIndex.match_sources).
+A library is loaded in one transaction, inserting batches of rows, and a
+library that has not changed (size and mtime) since it was loaded is
+skipped. Loading a library again replaces its rows.
+
+There are indexes on the names, the text fields and the usual search
+parameters, and an FTS5 index over the names and SRC descriptions. The
+database runs in WAL mode so other tools can read it while a library loads.
+
+    python diode_db.py --load diodes-inc.txt
+    python diode_db.py "BV>=100 AND IAVE>=1 AND type=Schottky"
+    python diode_db.py --search "schottky AND barrier"
+"""
+
+import argparse
+import io
+import os
+import sqlite3
+
+import diode_library
+import diode_query
+import diodes
+import instrument
+import spice_number
+
+parser = argparse.ArgumentParser(description='Load diode libraries into an SQLite database and query it.')
+parser.add_argument('query', nargs='?', help='A query like diode_query.py, e.g. "BV>=100 AND type=Schottky" (no Vf@ terms).')
+parser.add_argument('--db', '-d', default="diodes.db", help='The database file.')
+parser.add_argument('--load', '-l', nargs='+', metavar='MODEL_FILE', help='Load these library files, replacing their models.')
+parser.add_argument('--force', action='store_true', help='Load the libraries even if they have not changed.')
+parser.add_argument('--search', '-s', help='Full text search of the names and descriptions, FTS5 syntax.')
+parser.add_argument('--batch', type=int, default=10000, help='Rows per executemany call.')
+parser.add_argument('--stats', action='store_true', help='Print parse counters and stage timings as JSON on stderr.')
+
+encoding = "latin-1"
+
+class DiodeDatabase():
+    source_columns = { # column : SourceComment attribute
+        "src_part" : "part",
+        "src_model" : "model",
+        "src_mfg" : "mfg",
+        "src_kind" : "kind",
+        "src_category" : "category",
+        "src_voltage" : "voltage",
+        "src_current" : "current",
+        "src_power" : "power",
+        "src_recovery" : "recovery",
+        "src_resistance" : "resistance",
+        "src_linenum" : "linenum",
+        "description" : "description",
+    }
+    # the fields diode_query has besides the spice parameters, and the same fall backs to the SRC comment
+    query_fields = {
+        "NAME" : '"name"',
+        "PART" : '"src_part"',
+        "MFG" : 'COALESCE(NULLIF("MFG", \'\'), "src_mfg")',
+        "KIND" : '"src_kind"',
+        "TYPE" : 'COALESCE(NULLIF("TYPE", \'\'), "src_category")',
+        "VRATED" : 'COALESCE("src_voltage", 0)',
+        "IRATED" : 'COALESCE("src_current", 0)',
+        "PRATED" : 'COALESCE("src_power", 0)',
+        "TRR" : 'COALESCE("src_recovery", 0)',
+        "IAVE" : 'CASE WHEN "IAVE" <> 0 THEN "IAVE" ELSE COALESCE("src_current", 0) END',
+        "VPK" : 'CASE WHEN "VPK" <> 0 THEN "VPK" ELSE COALESCE("src_voltage", 0) END',
+    }
+    indexed = ("NAME", "PART", "MFG", "KIND", "TYPE", "VRATED", "IRATED", "IAVE", "VPK", "BV", "IS", "N", "RS", "CJO", "TT")
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=timeout)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.fts = True
+        self.create()
+    def __repr__(self):
+        models, libraries = self.connection.execute("SELECT (SELECT COUNT(*) FROM models), (SELECT COUNT(*) FROM libraries)").fetchone()
+        return "DiodeDatabase({path}): {models} models from {libraries} libraries".format(path=self.path, models=models, libraries=libraries)
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        self.close()
+    def close(self):
+        self.connection.close()
+    @property
+    def columns(self):
+        """The model columns after id, in insert order."""
+        return (["name", "library", "linenum"] + list(diodes.SpiceDiode.spice_parameters)
+            + list(diodes.SpiceDiode.infomational_parameters) + list(self.source_columns))
+    def create(self):
+        text = set(diodes.SpiceDiode.infomational_parameters) | {"name", "library", "description"} | {
+            c for c, a in self.source_columns.items() if a in ("part", "model", "mfg", "kind", "category")}
+        definitions = ",\n    ".join('"{c}" {t}'.format(c=c, t="TEXT" if c in text else "INTEGER" if c.endswith("linenum") else "REAL")
+            for c in self.columns)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS libraries (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, models INTEGER)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS models (\n    id INTEGER PRIMARY KEY,\n    {d}\n)".format(d=definitions))
+            self.connection.execute('CREATE INDEX IF NOT EXISTS "models_library" ON models ("library")')
+            self.create_indexes()
+            try:
+                self.connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS descriptions USING fts5("
+                    "name, src_part, src_mfg, src_kind, description, content='models', content_rowid='id')")
+            except sqlite3.OperationalError:
+                self.fts = False # sqlite built without FTS5
+    def create_indexes(self):
+        """Create the query indexes, inside the caller's transaction."""
+        for field in self.indexed:
+            # the same expression a query uses, so the index applies
+            collate = " COLLATE NOCASE" if field in diode_query.DiodeIndex.text_fields else ""
+            self.connection.execute('CREATE INDEX IF NOT EXISTS "models_{f}" ON models ({e}{collate})'.format(
+                f=field, e=self.query_fields.get(field, '"{f}"'.format(f=field)), collate=collate))
+    def loaded(self, path):
+        """Return True if path is loaded and has the same size and mtime as when it was."""
+        st = os.stat(path)
+        row = self.connection.execute("SELECT size, mtime FROM libraries WHERE path = ?", (os.path.abspath(path),)).fetchone()
+        return row == (st.st_size, st.st_mtime_ns)
+    @staticmethod
+    def parse(buffer):
+        """Return (DiodeLibrary, the SourceComment for each row) for the text of a library."""
+        library = diode_library.DiodeLibrary(diodes.SpiceDiode.parse(io.StringIO(buffer, newline=None)))
+        sources = diode_query.DiodeIndex.match_sources(library, list(diodes.SourceComment.parse(io.StringIO(buffer, newline=None))))
+        return library, sources
+    def rows(self, path, library, sources):
+        """Yield a tuple of column values for each row of library, loaded from path."""
+        names, linenums = library.names.tolist(), library.linenums.tolist()
+        columns = [library.columns[p].tolist() for p in diodes.SpiceDiode.spice_parameters]
+        info = [library.info[p].tolist() for p in diodes.SpiceDiode.infomational_parameters]
+        empty = (None,) * len(self.source_columns)
+        for row, source in enumerate(sources):
+            yield ((names[row], path, linenums[row]) + tuple(c[row] for c in columns) + tuple(str(c[row]) for c in info)
+                + (tuple(getattr(source, a) for a in self.source_columns.values()) if source else empty))
+    def load(self, path, batch=10000, force=False):
+        """Load the library file at path, replacing its models. Return the number of models, or None if it was unchanged."""
+        if not force and self.loaded(path):
+            return None
+        st = os.stat(path)
+        path = os.path.abspath(path)
+        with open(path, "rb") as f:
+            buffer = f.read().decode(encoding)
+        insert = "INSERT INTO models ({c}) VALUES ({v})".format(
+            c=", ".join('"{c}"'.format(c=c) for c in self.columns), v=", ".join("?" * len(self.columns)))
+        library, sources = self.parse(buffer)
+        # One transaction: readers see the old models or the new ones, and a load
+        # that fails part way leaves the old models and their libraries row.
+        with self.connection:
+            # the DELETE starts the transaction, the DROP INDEXes are in it
+            self.connection.execute("DELETE FROM models WHERE library = ?", (path,))
+            existing, = self.connection.execute("SELECT COUNT(*) FROM models").fetchone()
+            # building the indexes once afterwards is faster than updating them row by row
+            rebuild = len(library) > existing
+            if rebuild:
+                for field in self.indexed:
+                    self.connection.execute('DROP INDEX IF EXISTS "models_{f}"'.format(f=field))
+            count = 0
+            rows = self.rows(path, library, sources)
+            while True:
+                chunk = [row for _, row in zip(range(batch), rows)]
+                if not chunk:
+                    break
+                self.connection.executemany(insert, chunk)
+                count += len(chunk)
+            if rebuild:
+                self.create_indexes()
+            self.connection.execute("INSERT OR REPLACE INTO libraries VALUES (?, ?, ?, ?)", (path, st.st_size, st.st_mtime_ns, count))
+            if self.fts:
+                self.connection.execute("INSERT INTO descriptions(descriptions) VALUES('rebuild')")
+        return count
+    def diode(self, row):
+        """Return a SpiceDiode for a models row (a tuple in columns order after id), with source set to its library."""
+        values = dict(zip(self.columns, row[1:]))
+        overrides = {p : values[p] for p, default in diodes.SpiceDiode._defaults.items() if values[p] != default}
+        diode = diodes.SpiceDiode.__new__(diodes.SpiceDiode)
+        diode.__setstate__((values["name"], values["linenum"], values["library"], overrides))
+        return diode
+    def select(self, where="1", parameters=()):
+        """Return the list of models rows (id first) matching an SQL where clause."""
+        return self.connection.execute("SELECT * FROM models WHERE {where} ORDER BY id".format(where=where), parameters).fetchall()
+    def model(self, name):
+        """Return the SpiceDiode called name, the last one loaded when there are several."""
+        rows = self.select("name = ? COLLATE NOCASE", (name,))
+        if not rows:
+            raise KeyError(name)
+        return self.diode(rows[-1])
+    def where(self, query):
+        """Return (where clause, parameters) for a diode_query style query."""
+        clauses, parameters = [], []
+        for text in diode_query.DiodeIndex.re_and.split(query.strip()):
+            if not text:
+                continue
+            m = diode_query.DiodeIndex.re_term.match(text)
+            if not m:
+                raise ValueError("Could not understand query term {text}".format(text=text))
+            field, op, value = m.group('field').upper(), m.group('op'), m.group('value')
+            op = {"==" : "=", "!=" : "<>"}.get(op, op)
+            if field in diode_query.DiodeIndex.text_fields:
+                if op not in ("=", "<>"):
+                    raise ValueError("Only = and != work on {field}".format(field=field))
+                clauses.append('{e} {op} ? COLLATE NOCASE'.format(e=self.query_fields[field], op=op))
+                parameters.append(value)
+            elif field in diodes.SpiceDiode.spice_parameters or field in self.query_fields:
+                clauses.append('{e} {op} ?'.format(e=self.query_fields.get(field, '"{f}"'.format(f=field)), op=op))
+                parameters.append(spice_number.parse(value))
+            else:
+                raise KeyError("Unknown query field {field}".format(field=field))
+        return " AND ".join(clauses) or "1", parameters
+    def query(self, query):
+        """Return the list of models rows matching a query like "BV>=100 AND type=Schottky"."""
+        return self.select(*self.where(query))
+    def search(self, text, limit=100):
+        """Return the models rows whose name or SRC description matches an FTS5 query, best first."""
+        if not self.fts:
+            raise RuntimeError("This sqlite3 has no FTS5, full text search is not available.")
+        return self.connection.execute("SELECT models.* FROM descriptions JOIN models ON models.id = descriptions.rowid "
+            "WHERE descriptions MATCH ? ORDER BY rank LIMIT ?", (text, limit)).fetchall()
+
+def main():
+    args = parser.parse_args()
+    if args.stats:
+        instrument.enable()
+    with DiodeDatabase(args.db) as db:
+        for model_file in args.load or []:
+            with instrument.stage("load"):
+                count = db.load(model_file, args.batch, args.force)
+            print ("{path}: {count}".format(path=model_file, count="unchanged" if count is None else "{n} models".format(n=count)))
+        rows = []
+        with instrument.stage("query"):
+            if args.query:
+                rows = db.query(args.query)
+            elif args.search:
+                rows = db.search(args.search)
+        columns = db.columns
+        for row in rows:
+            values = dict(zip(columns, row[1:]))
+            print ("{library}:{linenum} {model}  {description}".format(library=values["library"], linenum=values["linenum"],
+                model=db.diode(row), description=values["description"] or ""))
+        if args.query or args.search:
+            print ("{n} models".format(n=len(rows)))
+        print (db)
+    if args.stats:
+        instrument.report()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#! python3
+r""" diode_library.py
+
+A whole library of diode models stored by column.
+
+Every SpiceDiode.spice_parameters entry is a contiguous float64 numpy array
+with one row per model, so math and selection over the whole library run at
+array speed:
+
+    library = DiodeLibrary.parse("diodes-inc.txt")
+    fast = library.select((library.columns["TT"] < 10e-9) & (library.columns["BV"] >= 100))
+    for diode in fast:
+        print (diode.name, diode.forward_voltage(.001))
+
+Rows come back as DiodeRow views that behave like SpiceDiode objects.
+"""
+
+import argparse
+
+import numpy
+
+import diodes
+import instrument
+
+parser = argparse.ArgumentParser(description='Load a diode library into columns and show a summary of each parameter.')
+parser.add_argument('model_file', help='The file to get the models from.')
+parser.add_argument('--stats', action='store_true', help='Print parse counters and stage timings as JSON on stderr.')
+
+class DiodeRow(diodes.SpiceDiode):
+    """A SpiceDiode that reads and writes its parameters in a DiodeLibrary row."""
+    def __init__(self, library, row):
+        object.__setattr__(self, 'library', library)
+        object.__setattr__(self, 'row', row)
+    def __getattr__(self, attribute):
+        if attribute in ('library', 'row'):
+            raise AttributeError(attribute)
+        library = self.library
+        if attribute in library.columns:
+            return float(library.columns[attribute][self.row])
+        if attribute in library.info:
+            return library.info[attribute][self.row]
+        if attribute == 'name':
+            return library.names[self.row]
+        if attribute == 'linenum':
+            return int(library.linenums[self.row])
+        raise AttributeError(attribute)
+    def __setattr__(self, attribute, value):
+        library = self.library
+        if attribute in library.columns:
+            library.columns[attribute][self.row] = value
+        elif attribute in library.info:
+            library.info[attribute][self.row] = value
+        else:
+            raise AttributeError("DiodeRow can not set {attribute}".format(attribute=attribute))
+
+class DiodeLibrary():
+    def __init__(self, diode_list=()):
+        diode_list = list(diode_list)
+        self.names = numpy.array([diode.name for diode in diode_list], dtype=object)
+        self.linenums = numpy.array([diode.linenum for diode in diode_list], dtype=numpy.int64)
+        self.columns = {
+            p : numpy.array([getattr(diode, p) for diode in diode_list], dtype=numpy.float64)
+            for p in diodes.SpiceDiode.spice_parameters}
+        self.info = {
+            p : numpy.array([getattr(diode, p) for diode in diode_list], dtype=object)
+            for p in diodes.SpiceDiode.infomational_parameters}
+        self.reindex()
+    def reindex(self):
+        """Rebuild the name to row index. Like a dict of SpiceDiode.parse output, the last duplicate wins."""
+        self.index = {name : row for row, name in enumerate(self.names)}
+    @classmethod
+    def parse(cls, f, **kwargs):
+        """Return a DiodeLibrary of the models in f, see SpiceDiode.parse."""
+        return cls(diodes.SpiceDiode.parse(f, **kwargs))
+    def __repr__(self):
+        return "DiodeLibrary({n} models)".format(n=len(self))
+    def __len__(self):
+        return len(self.names)
+    def __iter__(self):
+        for row in range(len(self)):
+            yield DiodeRow(self, row)
+    def __contains__(self, name):
+        return name in self.index
+    def __getitem__(self, key):
+        """
+        library["DI_1N4001"] and library[3] return a DiodeRow.
+        A boolean mask or an array of rows returns a new DiodeLibrary, see select.
+        """
+        if isinstance(key, str):
+            return DiodeRow(self, self.index[key])
+        if isinstance(key, (int, numpy.integer)):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError(key)
+            return DiodeRow(self, int(key))
+        return self.select(key)
+    def row(self, name):
+        """Return the row number for the model called name."""
+        return self.index[name]
+    def rows(self, names):
+        """Return an array of row numbers, one for each name."""
+        return numpy.array([self.index[name] for name in names], dtype=numpy.intp)
+    def select(self, key):
+        """Return a new DiodeLibrary with copies of the rows selected by a boolean mask or an array of rows."""
+        key = numpy.asarray(key)
+        library = DiodeLibrary.__new__(DiodeLibrary)
+        library.names = self.names[key]
+        library.linenums = self.linenums[key]
+        library.columns = {p : v[key] for p, v in self.columns.items()}
+        library.info = {p : v[key] for p, v in self.info.items()}
+        library.reindex()
+        return library
+    def to_diodes(self):
+        """Return a list of plain SpiceDiode objects."""
+        diode_list = []
+        for row in range(len(self)):
+            overrides = {p : float(v[row]) for p, v in self.columns.items()}
+            overrides.update((p, v[row]) for p, v in self.info.items())
+            diode = diodes.SpiceDiode.__new__(diodes.SpiceDiode)
+            diode.__setstate__((self.names[row], int(self.linenums[row]), "", overrides))
+            diode_list.append(diode)
+        return diode_list
+
+def main():
+    args = parser.parse_args()
+    if args.stats:
+        instrument.enable()
+    library = DiodeLibrary.parse(args.model_file)
+    print (library)
+    print ("{0:<8}{1:>14}{2:>14}{3:>14}".format("Param", "Min", "Median", "Max"))
+    for p, v in library.columns.items():
+        if not len(v):
+            break
+        print ("{0:<8}{1:>14.4g}{2:>14.4g}{3:>14.4g}".format(p, v.min(), numpy.median(v), v.max()))
+    if args.stats:
+        instrument.report()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+#! python3
+r""" diode_query.py
+
+Range queries over diode parameters and SRC ratings using sorted indexes.
+
+    index = DiodeIndex.parse("diodes-inc.txt")
+    schottky = index.select("BV>=100 AND IAVE>=1 AND Vf@1mA<0.45 AND type=Schottky")
+
+Terms are joined with AND and each is field op value, op one of
+< <= > >= = == !=. Numeric values may use spice suffixes (1mA, 10u).
+
+Fields:
+    any SpiceDiode.spice_parameters name (BV, IS, TT...)
+    VRATED IRATED PRATED TRR    voltage, current, power and recovery ratings from *SRC=
+    IAVE VPK                    the model value, or the SRC rating when the model does not give one
+    Vf@<current>                forward voltage at that current, see iv_curves
+    NAME PART MFG KIND TYPE     text, compared without case. TYPE is the model TYPE, or
+                                Schottky/Zener/MOSFET/kind from the SRC comment
+
+Every numeric field gets an argsort index the first time it is used. A
+query finds the row range of each term with a binary search, starts from
+the term with the fewest rows and checks the remaining terms against those
+rows only.
+"""
+
+import argparse
+import io
+import re
+
+import numpy
+
+import diode_library
+import diodes
+import instrument
+import iv_curves
+import spice_number
+
+parser = argparse.ArgumentParser(description='Query a diode library, e.g. "BV>=100 AND IAVE>=1 AND Vf@1mA<0.45 AND type=Schottky"')
+parser.add_argument('query', help='The query, terms joined with AND.')
+parser.add_argument('--model_file', '-f', default=r"E:\eda\diodes\diodes-inc.txt", help='The file to get the models from.')
+parser.add_argument('--stats', action='store_true', help='Print parse counters and stage timings as JSON on stderr.')
+
+class DiodeIndex():
+    re_and = re.compile(r"\s+AND\s+", re.I)
+    re_term = re.compile(r"^\s*(?P<field>[^<>=!\s]+)\s*(?P<op><=|>=|!=|==|=|<|>)\s*(?P<value>.*?)\s*$")
+    text_fields = ("NAME", "PART", "MFG", "KIND", "TYPE")
+    def __init__(self, library, sources=()):
+        self.library = library
+        self.sources = self.match_sources(library, list(sources))
+        def rating(attribute, default):
+            return numpy.array([getattr(s, attribute) if s else default for s in self.sources], dtype=type(default))
+        self.columns = dict(library.columns)
+        self.columns["VRATED"] = rating("voltage", 0.0)
+        self.columns["IRATED"] = rating("current", 0.0)
+        self.columns["PRATED"] = rating("power", 0.0)
+        self.columns["TRR"] = rating("recovery", 0.0)
+        self.columns["IAVE"] = numpy.where(library.columns["IAVE"] != 0, library.columns["IAVE"], self.columns["IRATED"])
+        self.columns["VPK"] = numpy.where(library.columns["VPK"] != 0, library.columns["VPK"], self.columns["VRATED"])
+        self.text = {
+            "NAME" : library.names,
+            "PART" : rating("part", ""),
+            "MFG" : numpy.where(library.info["MFG"] != "", library.info["MFG"], rating("mfg", "")),
+            "KIND" : rating("kind", ""),
+            "TYPE" : numpy.where(library.info["TYPE"] != "", library.info["TYPE"], rating("category", "")),
+        }
+        self.sorted = {}
+        self.hashed = {}
+    def __repr__(self):
+        return "DiodeIndex({n} models, {s} indexes)".format(n=len(self.library), s=len(self.sorted) + len(self.hashed))
+    @staticmethod
+    def match_sources(library, sources):
+        """
+        Return the SourceComment for each row: the one naming the model, else the
+        closest one above the model and below the model before it.
+        """
+        by_model = {s.model : s for s in sources if s.model}
+        lines = numpy.array([s.linenum for s in sources], dtype=numpy.int64)
+        order = numpy.argsort(library.linenums, kind='stable')
+        matched = [None] * len(library)
+        previous = 0
+        for row in order:
+            linenum = library.linenums[row]
+            source = by_model.get(library.names[row])
+            if source is None and len(lines):
+                i = numpy.searchsorted(lines, linenum) - 1
+                if i >= 0 and lines[i] > previous:
+                    source = sources[i]
+            matched[row] = source
+            previous = linenum
+        return matched
+    @classmethod
+    def parse(cls, f):
+        """Return a DiodeIndex of the models and SRC comments in f (a path or a file-like object)."""
+        if isinstance(f, str):
+            with diodes.open_text(f) as _f:
+                buffer = _f.read()
+        else:
+            buffer = f.read()
+        library = diode_library.DiodeLibrary(diodes.SpiceDiode.parse(io.StringIO(buffer)))
+        return cls(library, diodes.SourceComment.parse(io.StringIO(buffer)))
+    def column(self, field):
+        """Return the numeric column for field, computing Vf@<current> columns the first time."""
+        field = field.upper()
+        if field not in self.columns:
+            if not field.startswith("VF@"):
+                raise KeyError("Unknown query field {field}".format(field=field))
+            current = spice_number.parse(field[3:])
+            self.columns[field] = iv_curves.forward_voltage(self.library, current)
+        return self.columns[field]
+    def sorted_index(self, field):
+        """Return (rows in value order, sorted values, count of values that are not nan)."""
+        if field not in self.sorted:
+            values = self.column(field)
+            order = numpy.argsort(values, kind='stable')
+            self.sorted[field] = (order, values[order], int(numpy.count_nonzero(~numpy.isnan(values))))
+        return self.sorted[field]
+    def hashed_index(self, field):
+        """Return a dict of lower case text value to the array of rows with that value."""
+        if field not in self.hashed:
+            index = {}
+            for row, value in enumerate(self.text[field]):
+                index.setdefault(str(value).lower(), []).append(row)
+            self.hashed[field] = {k : numpy.array(v, dtype=numpy.intp) for k, v in index.items()}
+        return self.hashed[field]
+    def terms(self, query):
+        terms = []
+        for text in self.re_and.split(query.strip()):
+            m = self.re_term.match(text)
+            if not m:
+                raise ValueError("Could not understand query term {text}".format(text=text))
+            field, op, value = m.group('field').upper(), m.group('op'), m.group('value')
+            if op == "==":
+                op = "="
+            if field in self.text_fields:
+                if op not in ("=", "!="):
+                    raise ValueError("Only = and != work on {field}".format(field=field))
+                terms.append((field, op, value.lower()))
+            else:
+                self.column(field)
+                terms.append((field, op, spice_number.parse(value)))
+        return terms
+    def span(self, field, op, value):
+        """Return (order, (start, stop)) so that order[start:stop] are the rows matching a numeric term."""
+        order, values, valid = self.sorted_index(field)
+        values = values[:valid]
+        left = int(numpy.searchsorted(values, value, 'left'))
+        right = int(numpy.searchsorted(values, value, 'right'))
+        return order, {
+            "<" : (0, left),
+            "<=" : (0, right),
+            ">" : (right, valid),
+            ">=" : (left, valid),
+            "=" : (left, right),
+        }[op]
+    def candidates(self, term):
+        """Return (estimated row count, function returning the rows) for one term."""
+        field, op, value = term
+        if field in self.text_fields:
+            rows = self.hashed_index(field).get(value, numpy.empty(0, dtype=numpy.intp))
+            if op == "=":
+                return len(rows), lambda: rows
+            return len(self.library) - len(rows), lambda: numpy.setdiff1d(numpy.arange(len(self.library)), rows)
+        if op == "!=":
+            return len(self.library), lambda: numpy.flatnonzero(self.column(field) != value)
+        order, (start, stop) = self.span(field, op, value)
+        return stop - start, lambda: order[start:stop]
+    def check(self, rows, term):
+        """Return the rows that also match term."""
+        field, op, value = term
+        if field in self.text_fields:
+            text = numpy.array([str(v).lower() for v in self.text[field][rows]], dtype=object)
+            return rows[(text == value) if op == "=" else (text != value)]
+        values = self.column(field)[rows]
+        return rows[{
+            "<" : values < value,
+            "<=" : values <= value,
+            ">" : values > value,
+            ">=" : values >= value,
+            "=" : values == value,
+            "!=" : values != value,
+        }[op]]
+    def query(self, query):
+        """Return the sorted array of rows matching query."""
+        terms = self.terms(query)
+        if not terms:
+            return numpy.arange(len(self.library))
+        sized = sorted(((self.candidates(term), term) for term in terms), key=lambda c: c[0][0])
+        (_, rows), _ = sized[0]
+        rows = numpy.sort(rows())
+        for _, term in sized[1:]:
+            if not len(rows):
+                break
+            rows = self.check(rows, term)
+        return rows
+    def select(self, query):
+        """Return a DiodeLibrary of the models matching query."""
+        return self.library.select(self.query(query))
+
+def main():
+    args = parser.parse_args()
+    if args.stats:
+        instrument.enable()
+    index = DiodeIndex.parse(args.model_file)
+    with instrument.stage("query"):
+        rows = index.query(args.query)
+    fields = []
+    for field, _, _ in index.terms(args.query):
+        if field not in fields:
+            fields.append(field)
+    print (",".join(["Model", "Line"] + fields))
+    for row in rows:
+        values = [str(index.text[f][row]) if f in index.text else "{0:.4g}".format(index.column(f)[row]) for f in fields]
+        print (",".join([index.library.names[row], str(index.library.linenums[row])] + values))
+    print ("{n} of {total} models".format(n=len(rows), total=len(index.library)))
+    if args.stats:
+        instrument.report()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+#! python3
+r""" diode_server.py
+
+Keep diode libraries parsed in one long running process and answer requests
+over a Unix domain socket, so scripts that run diode-test.py, subckt.py or
+diodes.py thousands of times skip the imports and the library parse.
+
+    python diode_server.py &
+    python diode-test.py DI_BAT54A DI_10A01        answered by the server
+
+A request is one line of JSON, {"op" : ..., "model_file" : ..., ...}, and
+the answer is one line, {"result" : ...} or {"error" : <exception type>,
+"message" : ...}. A connection may send any number of requests. op is:
+
+ping        "pong"
+models      the .MODEL text of each of "models"
+netlist     the diode-test.py listing for "models", or with "solve" the CSV
+            of its DC sweep
+subckt      the subckt.py anti-parallel sub circuits of "model" up to "depth"
+vf          [linenum, name, Vf, N] at "current" for "models", or every model,
+            like diodes.main
+stats       the loaded libraries and the number of requests of each op
+
+A library is parsed (through library_cache) the first time it is asked for
+and kept with its name index and the Vf columns computed so far. Every
+request checks the file's size and mtime, and a library that has changed is
+loaded again before it is used.
+
+request() is the client side. It raises Unavailable when no server is
+listening, or the platform has no AF_UNIX, and the CLIs then do the work in
+process. Any socket error, a timeout included, counts as no server. Only
+the standard library and instrument are imported at the top of this module
+so the client stays cheap to import. The socket is $DIODE_SERVER, or diode_server.sock in
+$XDG_RUNTIME_DIR, or diode_server-<uid>.sock in the temp folder; an empty
+DIODE_SERVER turns the client off. The client only talks to a socket owned
+by its own user.
+"""
+
+import argparse
+import collections
+import importlib
+import io
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+
+import instrument
+
+parser = argparse.ArgumentParser(description='Serve diode models, netlists and Vf from libraries kept in memory.')
+parser.add_argument('--socket', '-s', help='The Unix socket to listen on, default $DIODE_SERVER, $XDG_RUNTIME_DIR/diode_server.sock or diode_server-<uid>.sock in the temp folder.')
+parser.add_argument('--model_file', '-f', nargs='*', default=[], help='Libraries to load before answering the first request.')
+
+errors = {"KeyError" : KeyError, "ValueError" : ValueError, "IndexError" : IndexError, "FileNotFoundError" : FileNotFoundError}
+
+class Unavailable(Exception):
+    """No diode server is listening."""
+
+def socket_path():
+    """Return the socket for this user, see the module docstring."""
+    path = os.environ.get("DIODE_SERVER")
+    if path is not None:
+        return path
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"], "diode_server.sock")
+    uid = os.getuid() if hasattr(os, "getuid") else os.getlogin()
+    return os.path.join(tempfile.gettempdir(), "diode_server-{uid}.sock".format(uid=uid))
+
+def request(op, path=None, timeout=60, **arguments):
+    """
+    Send one request to the server and return its result. Errors raised by
+    the server are raised again here (KeyError for an unknown model...).
+    """
+    path = socket_path() if path is None else path
+    if not instrument.enabled:
+        return send(path, timeout, op=op, **arguments)
+    instrument.count("server.requests")
+    with instrument.stage("server"):
+        try:
+            return send(path, timeout, op=op, **arguments)
+        except Unavailable:
+            instrument.count("server.unavailable")
+            raise
+
+def send(path, timeout, **arguments):
+    """Send arguments as one request on path and return the result, see request()."""
+    if not path or not hasattr(socket, "AF_UNIX"):
+        raise Unavailable("no socket")
+    if "model_file" in arguments:
+        # the server may run in another folder
+        arguments["model_file"] = os.path.abspath(arguments["model_file"])
+    try:
+        if hasattr(os, "getuid") and os.stat(path).st_uid != os.getuid():
+            raise Unavailable("{path} belongs to another user".format(path=path))
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(timeout)
+            s.connect(path)
+            s.sendall(json.dumps(arguments).encode() + b"\n")
+            with s.makefile("rb") as f:
+                reply = f.readline()
+    except OSError as e: # not there, refused, reset, timed out, permissions...
+        raise Unavailable("{path}: {e}".format(path=path, e=e)) from e
+    if not reply:
+        raise Unavailable("{path} closed the connection".format(path=path))
+    try:
+        reply = json.loads(reply)
+    except ValueError as e:
+        raise Unavailable("{path} did not answer with JSON".format(path=path)) from e
+    if "error" in reply:
+        raise errors.get(reply["error"], RuntimeError)(reply["message"])
+    return reply["result"]
+
+class Library():
+    """A parsed library file: the models in file order, by name (the last duplicate wins, like LazyLibrary) and Vf columns."""
+    def __init__(self, path):
+        import library_cache
+        st = os.stat(path)
+        self.path = path
+        self.key = (st.st_size, st.st_mtime_ns)
+        self.diodes = library_cache.load(path)
+        self.models = {diode.name : diode for diode in self.diodes}
+        self.vf = {} # current : [Vf of each model]
+    def __repr__(self):
+        return "Library({path}): {n} models".format(path=self.path, n=len(self.diodes))
+    def __getitem__(self, name):
+        return self.models[name]
+    def changed(self):
+        st = os.stat(self.path)
+        return (st.st_size, st.st_mtime_ns) != self.key
+    def forward_voltage(self, current):
+        """Return the list of diode.forward_voltage(current) for every model, computed once per current."""
+        if current not in self.vf:
+            self.vf[current] = [diode.forward_voltage(current) for diode in self.diodes]
+        return self.vf[current]
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                reply = {"result" : self.server.answer(json.loads(line))}
+            except Exception as e:
+                message = e.args[0] if len(e.args) == 1 and isinstance(e.args[0], str) else str(e)
+                reply = {"error" : type(e).__name__, "message" : message}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+            self.wfile.flush()
+
+class DiodeServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128 # scripts run many clients at once, a full backlog fails their connect
+    def __init__(self, path=None):
+        path = path or socket_path()
+        if os.path.exists(path):
+            try:
+                request("ping", path, timeout=5)
+            except (Unavailable, OSError):
+                os.unlink(path) # left behind by a server that did not shut down
+            else:
+                raise OSError("A diode server is already listening on {path}".format(path=path))
+        self.libraries = {}
+        self.lock = threading.Lock()
+        self.stats = collections.Counter()
+        super().__init__(path, Handler)
+        os.chmod(path, 0o600) # only this user may connect
+    def __repr__(self):
+        return "DiodeServer({path}): {libraries}".format(path=self.server_address, libraries=list(self.libraries.values()))
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+    def library(self, path):
+        """Return the Library for path, parsing it again if the file changed."""
+        path = os.path.abspath(path)
+        with self.lock:
+            library = self.libraries.get(path)
+        if library is not None and not library.changed():
+            return library
+        # parsed without the lock, so requests for other libraries are not held up
+        fresh = Library(path)
+        with self.lock:
+            if self.libraries.get(path) is not None:
+                self.stats["reloads"] += 1
+            self.libraries[path] = fresh
+        return fresh
+    def answer(self, request):
+        op = request.pop("op", None)
+        method = getattr(self, "op_{op}".format(op=op), None)
+        if not isinstance(op, str) or method is None:
+            raise ValueError("Unknown op {op}".format(op=op))
+        with self.lock:
+            self.stats[op] += 1
+        return method(**request)
+    def op_ping(self):
+        return "pong"
+    def op_models(self, model_file, models):
+        library = self.library(model_file)
+        return [str(library[model]) for model in models]
+    def op_netlist(self, model_file, models, solve=False):
+        diode_test = importlib.import_module("diode-test")
+        library = self.library(model_file)
+        if solve:
+            out = io.StringIO()
+            diode_test.solve(models, library, file=out)
+            return out.getvalue()
+        return diode_test.listing(models, library) + "\n"
+    def op_subckt(self, model, depth=4):
+        import subckt
+        return subckt.subckts(model, depth)
+    def op_vf(self, model_file, current, models=None):
+        library = self.library(model_file)
+        vf = library.forward_voltage(current)
+        if models is None:
+            return [[diode.linenum, diode.name, v, diode.N] for diode, v in zip(library.diodes, vf)]
+        return [[diode.linenum, diode.name, diode.forward_voltage(current), diode.N] for diode in (library[model] for model in models)]
+    def op_stats(self):
+        with self.lock:
+            return {"libraries" : {path : len(library.diodes) for path, library in self.libraries.items()}, "requests" : dict(self.stats)}
+
+def main():
+    args = parser.parse_args()
+    server = DiodeServer(args.socket)
+    for model_file in args.model_file:
+        print (server.library(model_file))
+    print ("Listening on {path}".format(path=server.server_address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
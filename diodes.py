@@ -33,6 +33,8 @@ TNOM (TREF) Parameter measurement temperature           C       27
 XTI     IS temperature exponent                         -       3.0
 -       pn junction: 3.0                                -       -
 -       Schottky: 2.0                                   -       -
+TBV1    BV linear temperature coefficient               1/C     0
+TRS1    RS linear temperature coefficient               1/C     0
 
 KF      Flicker noise coefficient                       -       0
 AF      Flicker noise exponent                          -       1
@@ -48,9 +50,25 @@ DISS    Maximum power dissipation rating
 NBVL
 IBVL
 """
+import argparse
 import re
 import io
+import itertools
 import math
+import os
+import weakref
+import bz2
+import codecs
+import gzip
+import lzma
+import zipfile
+
+import instrument
+import spice_number
+
+class Overrides(dict):
+    """An interned set of parameter overrides, shared between models. Never changed in place."""
+    __slots__ = ("__weakref__",)
 
 class SpiceDiode():
     re_model_paramter_clean = re.compile(r"\n\s*\+")
@@ -78,6 +96,8 @@ class SpiceDiode():
         "EG"    :   1.11,
         "TNOM"  :   27,
         "XTI"   :   3.0,
+        "TBV1"  :   0,
+        "TRS1"  :   0,
         "KF"    :   0,
         "AF"    :   1,
         "VPK"   :   0,
@@ -90,6 +110,7 @@ class SpiceDiode():
         "MFG"   :   "",
         "TYPE"  :   "",
     }
+    _defaults = dict(spice_parameters, **infomational_parameters)
     parameter_alias = {
         "CJ0"   :   "CJO",
         "MJ"    :   "M",
@@ -99,32 +120,84 @@ class SpiceDiode():
         "PB"    :   "VJ",
         "TREF"  :   "TNOM",
     }
+    # Only name, line and the parameters that differ from the defaults are kept per
+    # model. Identical override sets are interned so duplicate models share one dict.
+    # The table holds them weakly, a set is dropped with the last model using it.
+    __slots__ = ("name", "linenum", "source", "_overrides")
+    _interned = weakref.WeakValueDictionary() # hash of the items : Overrides
+    @classmethod
+    def intern(cls, overrides):
+        """Return the shared Overrides for this set of overrides, leaving out values equal to their default."""
+        overrides = Overrides((p, v) for p, v in overrides.items() if v != cls._defaults[p])
+        key = hash(frozenset(overrides.items()))
+        shared = cls._interned.get(key)
+        if shared is None:
+            cls._interned[key] = overrides
+            return overrides
+        # 1 == 1.0, but they print differently so they are not the same set
+        if shared == overrides and all(type(shared[p]) is type(v) for p, v in overrides.items()):
+            return shared
+        return overrides # a hash collision, this set is just not shared
     def __init__(self, name, parameters, linenum=0):
         self.name=name
         self.linenum = linenum
-        # Set defaults
-        for p, v in self.spice_parameters.items():
-            setattr(self, p, v)
-        for p, v in self.infomational_parameters.items():
-            setattr(self, p, v)
-        # Parse parameters, override defaults
-        for m in self.re_parameters.finditer(parameters):
-            parameter = m.group('attribute').upper()
-            value = m.group('value')
+        self.source = ""
+        overrides = {}
+        # Parse parameters, override defaults. findall tokenizes the whole card in one call.
+        for parameter, value in self.re_parameters.findall(parameters):
+            parameter = parameter.upper()
             if parameter in self.infomational_parameters:
-                setattr(self, parameter, value)
+                overrides[parameter] = value
                 continue
             if parameter not in self.spice_parameters:
                 if parameter in self.parameter_alias:
+                    if instrument.enabled:
+                        instrument.count("parse.aliased." + parameter)
                     parameter = self.parameter_alias[parameter]
                 else:
+                    if instrument.enabled:
+                        instrument.count("parse.ignored." + parameter)
                     print ("Ignoring parameter %s=%s in %s." % (parameter, value, name))
                     continue
             try:
-                setattr(self, parameter, self.float(value))
+                overrides[parameter] = self.float(value)
             except ValueError:
                 print ("Error parsing diode named %s: could not covert a paramter to float.\n  %s=%s" % (self.name, parameter, value))
                 raise
+        self._overrides = self.intern(overrides)
+    def __getattr__(self, attribute):
+        """Parameters come from the overrides, then the defaults."""
+        if attribute == "_overrides":
+            raise AttributeError(attribute)
+        overrides = self._overrides
+        if attribute in overrides:
+            return overrides[attribute]
+        try:
+            return self._defaults[attribute]
+        except KeyError:
+            raise AttributeError(attribute) from None
+    def __setattr__(self, attribute, value):
+        if attribute in self._defaults:
+            # a private copy, changed in place until freeze() interns it again
+            overrides = self._overrides
+            if type(overrides) is Overrides:
+                overrides = dict(overrides)
+                object.__setattr__(self, "_overrides", overrides)
+            if value == self._defaults[attribute]:
+                overrides.pop(attribute, None)
+            else:
+                overrides[attribute] = value
+            return
+        object.__setattr__(self, attribute, value)
+    def freeze(self):
+        """Share the overrides again after parameters were set one at a time."""
+        if type(self._overrides) is not Overrides:
+            self._overrides = self.intern(self._overrides)
+    def __getstate__(self):
+        return (self.name, self.linenum, self.source, self._overrides)
+    def __setstate__(self, state):
+        self.name, self.linenum, self.source, overrides = state
+        self._overrides = self.intern(overrides)
     def __repr__(self):
         return "SpiceDiode(%s, %s)" % (self.name, " ".join(["%s=%s" % (p, getattr(self, p, None)) for p in self.spice_parameters]))
     def __str__(self):
@@ -136,66 +209,117 @@ class SpiceDiode():
         return ".MODEL {name} D  ({parameters})".format(
             name=self.name,
             parameters=parameters)
-    re_scale_notation = re.compile("\s*(?P<number>-?\d*\.?\d*)(?P<scale>(?:t)|(?:g)|(?:x)|(?:meg)|(?:k)|(?:m)|(?:u)|(?:n)|(?:p)|(?:f))[AVFH]?\s*", re.I)
-    re_unit = re.compile("\s*(?P<number>-?\d*\.?\d*)[AVFH]?\s*", re.I)
-    scales = {
-        't' : 12,
-        'g' : 9,
-        'x' : 6,
-        'meg' : 6,
-        'k' : 3,
-        'm' : -3,
-        'u' : -6,
-        'n' : -9,
-        'p' : -12,
-        'f' : -15
-    }
-    re_scientific_notation = re.compile("\s*(-?\d*\.?\d*E[-+]?\d*)[AVFH]?\s*", re.I)
     def float(self, x):
         """
-        Return a float from a string, may have units, scientific notation or scale factors
-        Suffix      Scale   Number              Name
-        T           E+12    1,000,000,000,000   Tera
-        G           E+09    1,000,000,000       Giga
-        X or MEG    E+06    1,000,000           Mega
-        K           E+03    1,000               Kilo
-        M           E-03    0.001               Milli
-        U           E-06    0.000001            Micro
-        N           E-09    0.000000001         Nano
-        P           E-12    0.000000000001      Pico
-        F           E-15    0.000000000000001   Femto
+        Return a float from a string, may have units, scientific notation or scale factors.
+        See spice_number for the suffixes.
         """
-        m = self.re_scientific_notation.match(x)
-        if m:
-            return float(m.group(1))
-        m = self.re_scale_notation.match(x)
-        if m:
-            scale = m.group('scale').lower()
-            if scale not in self.scales:
-                print ("Parse error for diode named %s: %s not in scales" % (self.name, scale))
-            return float(m.group('number')) * math.pow(10, self.scales[scale])
-        m = self.re_unit.match(x)
-        if m:
-            return float(m.group('number'))
-        return float(x)
+        return spice_number.parse(x)
     re_model_d = re.compile("^\s*\.model\s+(?P<name>\S+)\s+D\s*[\( ]\s*(?P<parameters>[^\)]*?)\s*\)?$", re.I)
     re_subckt = re.compile("^\s*\.SUBCKT\s+(?P<name>\S+)\s+(?P<nodes>.+)", re.I)
     re_ends = re.compile("^\s*\.ENDS.*", re.I)
+    parse_engines = ("scan", "regex", "stream")
+    default_engine = "scan"
     @classmethod
-    def parse(cls, f, skip_subckt=True):
+    def parse(cls, f, skip_subckt=True, linenum=0, in_subckt=False, engine=None):
         """
         Return a list of SpiceDiode objects from the file-like object f.
         If a string is passed, this function will treat it as a file path
         and attempt to open it.
+        linenum and in_subckt let a caller resume part way through a file:
+        linenum is the number of lines already consumed before f and
+        in_subckt is the subckt state at that point.
+        engine selects the parser: "scan" (default) makes one pass over the
+        whole buffer, "regex" is the original line by line parser and
+        "stream" scans the file a chunk at a time so only one chunk is held.
+        All return the same models and line numbers. A path to a .gz, .xz,
+        .bz2 or single library .zip file is decompressed as it is read, with
+        the "stream" engine unless another is given. Other engines read a
+        path with open_text, as latin-1 text with its newlines translated.
         """
-        if isinstance(f, str):
-            _f = open (f)
+        compressed = isinstance(f, str) and os.path.splitext(f)[1].lower() in compressed_extensions
+        if engine is None:
+            engine = "stream" if compressed else cls.default_engine
+        if engine not in cls.parse_engines:
+            raise ValueError("Unknown parse engine %s, expected one of %s." % (engine, ", ".join(cls.parse_engines)))
+        timing = instrument.enabled
+        if timing:
+            start = instrument.clock()
+        if compressed and engine == "stream":
+            _f = open_library(f)
+        elif isinstance(f, str):
+            _f = open_text(f)
         else:
             _f = f
-        in_subckt = False
-        for line, linenum in cls.preparse(_f):
+        if engine == "scan":
+            buffer = _f.read() if hasattr(_f, 'read') else "".join(_f)
+            records = cls.scan(buffer, skip_subckt, linenum, in_subckt)
+        elif engine == "stream":
+            records = cls.stream(_f, skip_subckt, linenum, in_subckt)
+        else:
+            records = cls.parse_lines(_f, skip_subckt, linenum, in_subckt)
+        for name, parameters, linenum in records:
+            try:
+                diode = cls(name, parameters, linenum)
+            except ValueError:
+                print ("Error parsing line %d." % linenum)
+                raise
+            if timing:
+                # only the time spent here, not in the caller between models
+                instrument.add_time("parse", instrument.clock() - start)
+                instrument.count("parse.models")
+            yield diode
+            if timing:
+                start = instrument.clock()
+        if isinstance(f, str):
+            _f.close()
+        if timing:
+            instrument.add_time("parse", instrument.clock() - start)
+    @classmethod
+    async def parse_async(cls, reader, skip_subckt=True, linenum=0, in_subckt=False, chunk_size=1 << 16):
+        """
+        Async generator of the SpiceDiode objects in a stream of bytes or text:
+        an asyncio.StreamReader (anything with an awaitable read(n)) or an
+        async iterable of chunks. Each model is yielded as soon as its card,
+        with all its + continuation lines, is complete.
+        """
+        records = RecordStream(skip_subckt, linenum, in_subckt)
+        if hasattr(reader, 'read'):
+            while True:
+                chunk = await reader.read(chunk_size)
+                if not chunk:
+                    break
+                for name, parameters, linenum in records.feed(chunk):
+                    yield cls(name, parameters, linenum)
+        else:
+            async for chunk in reader:
+                for name, parameters, linenum in records.feed(chunk):
+                    yield cls(name, parameters, linenum)
+        for name, parameters, linenum in records.close():
+            yield cls(name, parameters, linenum)
+    @classmethod
+    def stream(cls, f, skip_subckt=True, linenum=0, in_subckt=False, chunk_size=1 << 20):
+        """
+        Yield (name, parameters, linenum) for each diode model in f, a text or
+        binary file, or an iterable of lines, read chunk_size at a time.
+        """
+        records = RecordStream(skip_subckt, linenum, in_subckt)
+        if hasattr(f, 'read'):
+            chunks = iter(lambda: f.read(chunk_size), f.read(0))
+        else:
+            chunks = f
+        for chunk in chunks:
+            yield from records.feed(chunk)
+        yield from records.close()
+    @classmethod
+    def parse_lines(cls, f, skip_subckt=True, linenum=0, in_subckt=False):
+        """
+        The original parser. Yield (name, parameters, linenum) for each diode
+        model, matching every joined line against the card regexes.
+        """
+        for line, linenum in cls.preparse(f, linenum):
             if skip_subckt:
-                if in_subckt: # this will not handle nested subckts
+                if in_subckt: # this will not handle nested subckts, subckt_index does
                     m = cls.re_ends.match(line)
                     if m:
                         in_subckt = False
@@ -208,25 +332,150 @@ class SpiceDiode():
                     continue
             m = cls.re_model_d.match(line)
             if m:
-                try:
-                    yield cls(m.group('name'), m.group('parameters'), linenum)
-                except ValueError:
-                    print ("Error parsing line %d." % linenum)
-                    raise
-        if isinstance(f, str):
-            _f.close()
+                yield m.group('name'), m.group('parameters'), linenum
+    # A card is a dot line and its + continuation lines. preparse joins + lines onto a blank line too,
+    # so a blank line followed by "+ .model ..." is also a card, and so are + lines at the start of the buffer.
+    # re_card finds the cards after the first line by the newline before them: a pattern that starts with
+    # a literal is searched for much faster than one starting with ^. The card leaves its own newline for
+    # the next match, see card_matches. re_first_card only tries the start of the buffer.
+    card_body = r"[^\S\n]*\.(?P<keyword>model|subckt|ends)[^\n]*(?:\n[^\S\n]*\+[^\n]*)*"
+    re_card = re.compile(r"\n(?P<card>(?:[^\S\n]*\n(?:[^\S\n]*\+[^\S\n]*\n)*[^\S\n]*\+)?" + card_body + ")", re.I)
+    re_first_card = re.compile(r"(?P<card>(?:(?:[^\S\n]*\n)?(?:[^\S\n]*\+[^\S\n]*\n)*[^\S\n]*\+)?" + card_body + ")", re.I)
+    re_card_bytes = re.compile(re_card.pattern.encode(), re.I)
+    re_first_card_bytes = re.compile(re_first_card.pattern.encode(), re.I)
+    @classmethod
+    def card_matches(cls, buffer, position=0):
+        """
+        Return an iterator of the matches of the dot cards in buffer (str,
+        bytes or an mmap) from position, a line start. A card is
+        buffer[m.start('card'):m.end()], without its own newline. Everything
+        else, including * comments, is jumped over.
+        """
+        if isinstance(buffer, str):
+            re_first_card, re_card = cls.re_first_card, cls.re_card
+        else:
+            re_first_card, re_card = cls.re_first_card_bytes, cls.re_card_bytes
+        first = re_first_card.match(buffer, position)
+        if first:
+            return itertools.chain([first], re_card.finditer(buffer, first.end()))
+        return re_card.finditer(buffer, position)
+    @classmethod
+    def find_cards(cls, buffer, position=0):
+        """
+        Yield (keyword, start, end) for each dot card in buffer from position,
+        see card_matches. The keyword is lower case str and the card is
+        buffer[start:end], with its newline.
+        """
+        text = isinstance(buffer, str)
+        newline = "\n" if text else b"\n"
+        for m in cls.card_matches(buffer, position):
+            end = m.end()
+            if buffer[end:end + 1] == newline:
+                end += 1
+            keyword = m.group('keyword')
+            yield (keyword if text else keyword.decode("latin-1")).lower(), m.start('card'), end
+    re_continuation = re.compile(r"^[^\S\n]*\+([^\n]*)", re.M)
+    @classmethod
+    def scan(cls, buffer, skip_subckt=True, linenum=0, in_subckt=False):
+        """
+        Yield (name, parameters, linenum) for each diode model in buffer.
+        One pass of find_cards finds the dot cards (with their + continuation
+        lines) and jumps over everything else, including * comments. Only
+        the cards are joined and matched, the same way preparse joins them,
+        so the results are identical to parse_lines.
+        """
+        for name, parameters, first, last, start, end in cls.cards(buffer, skip_subckt, linenum, in_subckt):
+            yield name, parameters, last
+    @classmethod
+    def cards(cls, buffer, skip_subckt=True, linenum=0, in_subckt=False):
+        """
+        Yield (name, parameters, first line, last line, start offset, end offset)
+        for each diode model card in buffer, see scan. buffer may also be bytes
+        or an mmap, then each card is decoded as latin-1. Returns in_subckt at
+        the end of buffer, for a caller resuming with the next part.
+        """
+        text = isinstance(buffer, str)
+        newline = "\n" if text else b"\n"
+        if hasattr(buffer, 'count'):
+            count = buffer.count
+        else: # mmap
+            count = lambda sub, start, end: buffer[start:end].count(sub)
+        model, ends = ("model", "ends") if text else (b"model", b"ends")
+        position = 0
+        linenum += 1 # the line number at position
+        counting = instrument.enabled
+        first_line = linenum
+        for m in cls.card_matches(buffer):
+            if counting:
+                instrument.count("scan.cards")
+            keyword = m.group('keyword').lower()
+            if keyword == model:
+                if skip_subckt and in_subckt:
+                    continue
+            elif not skip_subckt:
+                continue
+            elif in_subckt:
+                # every .ends card matches re_ends once joined, the only card that matters in a subckt
+                if keyword == ends:
+                    in_subckt = False
+                continue
+            start = m.start('card')
+            linenum += count(newline, position, start)
+            position = start
+            card = buffer[start:m.end()]
+            if not text:
+                card = card.decode("latin-1")
+            last = linenum + card.count("\n")
+            if counting:
+                instrument.count("scan.joins", last - linenum)
+            if keyword == model:
+                match = cls.re_model_d.match(cls.join_card(card))
+                if match:
+                    end = m.end()
+                    if buffer[end:end + 1] == newline:
+                        end += 1
+                    yield match.group('name'), match.group('parameters'), linenum, last, start, end
+            elif cls.re_subckt.match(cls.join_card(card)):
+                in_subckt = True
+        if counting:
+            end = len(buffer)
+            tail = buffer[end - 1:end] if end else newline
+            instrument.count("scan.lines", linenum - first_line + count(newline, position, end) + (tail != newline))
+        return in_subckt
+    @classmethod
+    def join_card(cls, card):
+        """
+        Return the text of a card (from find_cards) as one line, joined the
+        same way preparse joins it. CRLF line ends become \\n, like a file
+        opened as text, so cards from bytes or an mmap match too.
+        """
+        if "\r" in card:
+            # the \r of a card's own CRLF is left in it by card_matches
+            card = card.replace("\r\n", "\n")
+            if card.endswith("\r"):
+                card = card[:-1]
+        if cls.re_continuation.match(card): # + lines at the start of the file, joined onto nothing
+            first = 0
+        else:
+            first = card.find("\n") + 1 or len(card)
+        return card[:first] + "".join(cls.re_continuation.findall(card, first))
     re_continue_line = re.compile("^\s*\+(?P<content>.*)")
     @classmethod
-    def preparse(cls, f):
+    def preparse(cls, f, linenum=0):
         """
         Join continued lines. Yield one full line at a time.
+        Line numbers are counted from linenum.
         """
         last_line = ""
-        linenum = 0
+        counting = instrument.enabled
         for line in f:
             linenum += 1
+            if counting:
+                instrument.count("preparse.lines")
             m = cls.re_continue_line.match(line)
             if m:
+                if counting:
+                    instrument.count("preparse.joins")
                 last_line += m.group('content')
                 continue
             if last_line:
@@ -245,6 +494,158 @@ class SpiceDiode():
             return self.N*self.thermal_voltage()*math.log((current/self.IS))
         
 
+compressed_extensions = (".gz", ".xz", ".lzma", ".bz2", ".zip")
+decompressors = {".gz" : gzip.open, ".xz" : lzma.open, ".lzma" : lzma.open, ".bz2" : bz2.open}
+
+def archive_members(path):
+    """Return the names of the files in a .zip archive, or [None] for any other file."""
+    if os.path.splitext(path)[1].lower() != ".zip":
+        return [None]
+    with zipfile.ZipFile(path) as archive:
+        return [info.filename for info in archive.infolist() if not info.is_dir()]
+
+def open_library(path, member=None):
+    """
+    Return a binary file object for a library file, decompressing a .gz, .xz
+    or .bz2 file, or the member of a .zip archive, as it is read. member may
+    be left out for a .zip with only one file in it.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".zip":
+        with zipfile.ZipFile(path) as archive:
+            if member is None:
+                names = [info.filename for info in archive.infolist() if not info.is_dir()]
+                if len(names) != 1:
+                    raise ValueError("{path} has {n} files, give the member to open: {names}".format(path=path, n=len(names), names=", ".join(names)))
+                member = names[0]
+            # the member stays readable after the archive is closed
+            return archive.open(member)
+    return decompressors.get(extension, open)(path, "rb")
+
+def open_text(path):
+    """
+    Return a text file object for a library file. Vendor libraries are not
+    utf-8, so every library is read as latin-1, which decodes any byte. A
+    compressed file is decompressed as it is read, see open_library.
+    """
+    if os.path.splitext(path)[1].lower() in compressed_extensions:
+        return io.TextIOWrapper(open_library(path), encoding="latin-1", newline=None)
+    return open(path, encoding="latin-1")
+
+class RecordStream():
+    """
+    Incremental SpiceDiode.scan: feed() it text or bytes (latin-1) as they
+    arrive and it returns the (name, parameters, linenum) records of the cards
+    that are complete. A card is complete once a line that is not a +
+    continuation has started after it, so only the text from the start of the
+    last such line is kept between feeds.
+    """
+    re_line_start = re.compile(r"[^\S\n]*(\S|\n)") # the first character of a line that is not a space
+    def __init__(self, skip_subckt=True, linenum=0, in_subckt=False, encoding="latin-1"):
+        self.skip_subckt = skip_subckt
+        self.linenum = linenum
+        self.in_subckt = in_subckt
+        # \r\n split across two chunks is still one newline
+        self.decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(), translate=True)
+        self.newlines = io.IncrementalNewlineDecoder(None, translate=True)
+        self.pending = ""
+    def __repr__(self):
+        return "RecordStream: line {linenum}, {n} characters pending".format(linenum=self.linenum, n=len(self.pending))
+    def boundary(self, text):
+        """Return the offset of the last line start in text that no + line before it can continue, or 0."""
+        end = len(text)
+        while True:
+            newline = text.rfind("\n", 0, end)
+            if newline < 0:
+                return 0
+            m = self.re_line_start.match(text, newline + 1)
+            if m and m.group(1) != "+":
+                return newline + 1
+            end = newline
+    def scan(self, text):
+        records = []
+        def cards():
+            self.in_subckt = yield from SpiceDiode.cards(text, self.skip_subckt, self.linenum, self.in_subckt)
+        for name, parameters, first, last, start, end in cards():
+            records.append((name, parameters, last))
+        self.linenum += text.count("\n")
+        return records
+    def feed(self, data):
+        """Add the next chunk and return the records completed by it."""
+        self.pending += self.newlines.decode(data) if isinstance(data, str) else self.decoder.decode(data)
+        split = self.boundary(self.pending)
+        if not split:
+            return []
+        text, self.pending = self.pending[:split], self.pending[split:]
+        return self.scan(text)
+    def close(self):
+        """Return the records left at the end of the stream."""
+        text = self.pending + self.newlines.decode("", final=True) + self.decoder.decode(b"", final=True)
+        self.pending = ""
+        return self.scan(text) if text else []
+
+class SourceComment():
+    """
+    The *SRC= comment vendor libraries put next to each model, e.g.
+    *SRC=10A01;DI_10A01;Diodes;Si;  50.0V  10.0A  3.00us   Diodes Inc. 10A Rectifier
+    Fields are part;model;mfg;kind;ratings and description. Short forms drop
+    the middle fields. Ratings are read up to the first word that is not a
+    number with a V, A, W, s or ohms unit.
+    """
+    re_src = re.compile(r"\*SRC=(?P<fields>.*)", re.I)
+    re_rating = re.compile(r"^-?\d*\.?\d+(?:meg|[tgkmunpf])?(?P<unit>v|a|w|s|ohms)$", re.I)
+    ratings = {
+        "v"     :   "voltage",
+        "a"     :   "current",
+        "w"     :   "power",
+        "s"     :   "recovery",
+        "ohms"  :   "resistance",
+    }
+    def __init__(self, fields, linenum=0):
+        self.linenum = linenum
+        fields = [field.strip() for field in fields.split(";")]
+        self.part = fields[0]
+        middle = fields[1:-1]
+        self.model = middle[0] if len(middle) > 0 else ""
+        self.mfg = middle[1] if len(middle) > 2 else ""
+        self.kind = middle[-1] if len(middle) > 1 else ""
+        for rating in self.ratings.values():
+            setattr(self, rating, 0.0)
+        words = fields[-1].split() if len(fields) > 1 else []
+        while words:
+            m = self.re_rating.match(words[0])
+            if not m:
+                break
+            setattr(self, self.ratings[m.group('unit').lower()], spice_number.parse(words.pop(0)))
+        self.description = " ".join(words)
+    def __repr__(self):
+        return "SourceComment({part}, {model}, {mfg}, {kind}, {voltage}V {current}A {power}W {recovery}s, {description})".format(**self.__dict__)
+    @property
+    def category(self):
+        """Schottky, Zener or MOSFET when the kind or description says so, otherwise the kind (Si...)."""
+        text = (self.kind + " " + self.description).lower()
+        for category in ("Schottky", "Zener", "MOSFET"):
+            if category.lower() in text:
+                return category
+        return self.kind
+    @classmethod
+    def parse(cls, f):
+        """
+        Return a list of SourceComment objects from the file-like object f.
+        If a string is passed, this function will treat it as a file path
+        and attempt to open it.
+        """
+        if isinstance(f, str):
+            _f = open_text(f)
+        else:
+            _f = f
+        for linenum, line in enumerate(_f, 1):
+            m = cls.re_src.search(line)
+            if m:
+                yield cls(m.group('fields'), linenum)
+        if isinstance(f, str):
+            _f.close()
+
 class AntiParallelDiodes():
     subckt_string = """
 .SUBCKT {name} {pos_node} {mid_node} {neg_node}
@@ -311,18 +712,34 @@ Rf      {mid_node:<3} {neg_node:<3} {resistance}
         for diode in self.negative:
             yield diode
 
+parser = argparse.ArgumentParser(description='Print the line, name, Vf at 1mA and N of every model in the library.')
+parser.add_argument('--stats', action='store_true', help='Print parse counters and stage timings as JSON on stderr.')
+
 def main():
-    diodes = [diode for diode in SpiceDiode.parse(r"E:\eda\diodes\diodes-inc.txt")]
-    #diodes = [diode for diode in SpiceDiode.parse(r"E:\eda\diodes\test-data.txt")]
+    import diode_server
+    args = parser.parse_args()
+    if args.stats:
+        instrument.enable()
+    model_file = r"E:\eda\diodes\diodes-inc.txt"
+    try:
+        # [linenum, name, Vf, N] for every model, from the server when it is running
+        rows = diode_server.request("vf", model_file=model_file, current=.001)
+    except diode_server.Unavailable:
+        import library_cache
+        diodes = library_cache.load(model_file)
+        #diodes = [diode for diode in SpiceDiode.parse(r"E:\eda\diodes\test-data.txt")]
+        with instrument.stage("vf"):
+            rows = [(diode.linenum, diode.name, diode.forward_voltage(.001), diode.N) for diode in diodes]
     
-    for diode in diodes:
-        Vf1mA=diode.forward_voltage(.001)
+    for linenum, name, Vf1mA, N in rows:
         print ("{linenum},{model},{Vf1mA:.3f},{N}".format(
-            linenum=diode.linenum,
-            model=diode.name,
+            linenum=linenum,
+            model=name,
             Vf1mA=Vf1mA,
-            N=diode.N))
-    print (len(diodes))
+            N=N))
+    print (len(rows))
+    if args.stats:
+        instrument.report()
 
 if __name__ == "__main__":
     main()
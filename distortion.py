@@ -0,0 +1,226 @@
+#! python3
+r""" distortion.py
+
+Compute the harmonic distortion of anti-parallel diode clippers in process,
+instead of running ngspice for every pair to make the .four files.
+
+Vin     = A*sin(2*pi*f*t)
+Vin --- R --- pos [AntiParallelDiodes] neg --- 0
+
+Inside the subckt, `up` positive diodes in series go from pos to mid, `down`
+negative diodes in series go from mid back to pos, and Rf goes from mid to
+neg. The output is V(pos).
+
+The diodes use the DC model (iv_curves.junction_current with RS), and the
+network has no reactance, so the periodic steady state is the operating
+point at every sample of one period. Charge storage (CJO, TT) is left out,
+which is a good approximation while the period is much longer than TT.
+Identical diodes in a chain share their current, so each chain needs one
+junction voltage. For each (pair, sample) the unknowns are the positive
+junction voltage vp, the negative junction voltage vn and the chain voltage
+u = V(pos) - V(mid):
+
+up*(vp + RSp*Ip) - u = 0
+down*(vn + RSn*In) + u = 0
+(Vin - u)/(R + Rf) - Ip + In = 0
+
+Like dc_solver, the chain equations are eliminated so a Newton iteration
+is two junction_current evaluations, vectorized over every pair and sample.
+Then V(pos) = Vin - R*(Ip - In). An FFT of one period gives the harmonics
+as ngspice's .four output reports them. Magnitudes are peak values, phases
+are in degrees, and the normalized values are relative to the fundamental.
+THD = sqrt(Sum(2, n-1)(Mag^2[k])) / Mag[1], as in FourierAnalysis.
+
+Pairs are split into chunks that run in a process pool.
+"""
+
+import argparse
+import concurrent.futures
+import os
+
+import numpy
+
+import diode_library
+import four_table
+import iv_curves
+import netlist
+
+parser = argparse.ArgumentParser(description='Compute the harmonic distortion of anti-parallel diode clippers for every pair of diodes.')
+parser.add_argument('models', nargs='*', help='The name(s) of the diode model(s) to pair up.')
+parser.add_argument('--model_file', '-f', default=r"E:\eda\diodes\diodes-inc.txt", help='The file to get the model(s) from.')
+parser.add_argument('--diode_list', '-l', help='A file with one diode model name per line, added to the models.')
+parser.add_argument('--up', type=int, default=1, help='The number of positive diodes in series.')
+parser.add_argument('--down', type=int, default=1, help='The number of negative diodes in series.')
+parser.add_argument('--amplitude', '-a', type=float, default=1.0, help='The peak voltage of the sine.')
+parser.add_argument('--frequency', type=float, default=1000, help='The frequency of the sine, only used to label the harmonics.')
+parser.add_argument('--resistance', '-r', type=float, default=1e3, help='The resistor between the sine and the diodes.')
+parser.add_argument('--rf', type=float, default=0, help='Rf in the AntiParallelDiodes subckt.')
+parser.add_argument('--harmonics', '-n', type=int, default=21, help='The number of harmonics, counting DC, like ngspice nfreqs.')
+parser.add_argument('--samples', type=int, default=1024, help='The number of samples in one period.')
+parser.add_argument('--workers', '-j', type=int, default=None, help='Number of worker processes, default is one per core.')
+parser.add_argument('--chunk', type=int, default=64, help='Pairs per worker task.')
+parser.add_argument('--four_folder', help='Write a <positive>__<negative>.four file for each pair to this folder, for four_table.')
+
+four_header = """Fourier analysis for v(pos):
+  No. Harmonics: {n}, THD: {thd:.6g} %, Gridsize: {samples}, Interpolation Degree: 1
+
+Harmonic Frequency   Magnitude   Phase       Norm. Mag   Norm. Phase
+-------- ---------   ---------   -----       ---------   -----------
+"""
+four_line = " {k:<8d} {frequency:<11d} {magnitude:<13.6e} {phase:<11.6f} {norm_mag:<13.6e} {norm_phase:<11.6f} \n"
+
+def limit(v, step, nvt):
+    """Damp forward Newton steps up the exponential like pnjlim, see dc_solver.limit."""
+    new = v + step
+    damped = v + nvt * numpy.log1p(numpy.maximum(step, 0) / nvt)
+    return numpy.where((step > 0) & (new > 0), numpy.minimum(damped, new), new)
+
+def clip(positive, negative, up, down, vin, resistance, rf=0, temperature=300, iterations=200, tolerance=1e-12):
+    """
+    Return V(pos) for each input voltage. positive and negative are (pairs, 1)
+    parameter columns from iv_curves.parameters, up and down are ints or (pairs, 1)
+    arrays, vin broadcasts against (pairs, samples).
+    """
+    vt = iv_curves.thermal_voltage(temperature)
+    shape = numpy.broadcast_shapes(positive["IS"].shape, numpy.shape(vin))
+    grid = {
+        "UP" : numpy.asarray(up, dtype=numpy.float64), "DOWN" : numpy.asarray(down, dtype=numpy.float64),
+        "VIN" : numpy.asarray(vin, dtype=numpy.float64), "VT" : vt,
+    }
+    grid.update({"P_" + k : v for k, v in positive.items()})
+    grid.update({"N_" + k : v for k, v in negative.items()})
+    r = resistance + rf
+    # start as if all the current went through the diodes
+    i = numpy.broadcast_to(grid["VIN"] / r, shape)
+    vp = numpy.array(numpy.broadcast_to(iv_curves.ideal_voltage(positive, i, vt), shape))
+    vn = numpy.array(numpy.broadcast_to(iv_curves.ideal_voltage(negative, -i, vt), shape))
+    u = grid["UP"] * vp - grid["DOWN"] * vn
+    u = numpy.array(numpy.broadcast_to(u, shape))
+    where = None
+    for _ in range(iterations):
+        q = iv_curves.take(grid, shape, where)
+        p = {k[2:] : v for k, v in q.items() if k.startswith("P_")}
+        n = {k[2:] : v for k, v in q.items() if k.startswith("N_")}
+        if where is None:
+            x, y, z = vp, vn, u
+        else:
+            x, y, z = vp[where], vn[where], u[where]
+        ip, gp = iv_curves.junction_current(p, x, q["VT"])
+        in_, gn = iv_curves.junction_current(n, y, q["VT"])
+        hp = q["UP"] * (x + p["RS"] * ip) - z
+        hn = q["DOWN"] * (y + n["RS"] * in_) + z
+        ap = 1 / (q["UP"] * (1 + p["RS"] * gp))
+        an = 1 / (q["DOWN"] * (1 + n["RS"] * gn))
+        k = (q["VIN"] - z) / r - ip + in_
+        du = (k + gp * ap * hp - gn * an * hn) / (1 / r + gp * ap + gn * an)
+        dp = (du - hp) * ap
+        dn = (-du - hn) * an
+        new_x = limit(x, dp, p["N"] * q["VT"])
+        new_y = limit(y, dn, n["N"] * q["VT"])
+        new_z = z + du
+        if where is None:
+            vp[...], vn[...], u[...] = new_x, new_y, new_z
+        else:
+            vp[where], vn[where], u[where] = new_x, new_y, new_z
+        active = ~((numpy.abs(dp) <= tolerance * (1 + numpy.abs(x))) & (numpy.abs(dn) <= tolerance * (1 + numpy.abs(y)))
+            & (numpy.abs(du) <= tolerance * (1 + numpy.abs(z))))
+        if not numpy.any(active):
+            break
+        where = numpy.nonzero(active) if where is None else tuple(w[active] for w in where)
+    ip, _ = iv_curves.junction_current(positive, vp, vt)
+    in_, _ = iv_curves.junction_current(negative, vn, vt)
+    return numpy.broadcast_to(grid["VIN"], shape) - resistance * (ip - in_)
+
+def spectrum(waveforms, n):
+    """
+    Return (magnitude, phase in degrees) of harmonics 0 to n-1 for each row of
+    waveforms, each row one period of samples. Magnitudes are peak values.
+    """
+    samples = waveforms.shape[-1]
+    x = numpy.fft.rfft(waveforms, axis=-1)[..., :n] / samples
+    magnitude = numpy.abs(x)
+    magnitude[..., 1:] *= 2
+    # a sine has phase 0 like ngspice, so measure from the sine instead of the cosine
+    phase = numpy.degrees(numpy.angle(x)) + 90
+    phase[..., 0] = 0
+    phase = (phase + 180) % 360 - 180
+    return magnitude, phase
+
+def thd(magnitude):
+    """Return the total harmonic distortion in percent for each row of harmonic magnitudes."""
+    return 100 * numpy.sqrt(numpy.sum(magnitude[..., 2:]**2, axis=-1)) / magnitude[..., 1]
+
+def analyze(positive, negative, up=1, down=1, amplitude=1.0, resistance=1e3, rf=0, harmonics=21, samples=1024, temperature=300):
+    """
+    Return (magnitude, phase, thd) for the clipper of each pair: (pairs x harmonics)
+    arrays and a (pairs) array. positive and negative are parameter columns, one
+    entry per pair (a DiodeLibrary, list of SpiceDiode objects or dict of columns).
+    """
+    t = numpy.arange(samples) / samples
+    vin = amplitude * numpy.sin(2 * numpy.pi * t)[numpy.newaxis, :]
+    v = clip(iv_curves.parameters(positive), iv_curves.parameters(negative), up, down, vin, resistance, rf, temperature)
+    magnitude, phase = spectrum(v, harmonics)
+    return magnitude, phase, thd(magnitude)
+
+def analyze_chunk(task):
+    positive, negative, kwargs = task
+    return analyze(positive, negative, **kwargs)
+
+def analyze_pairs(library, pairs, workers=None, chunk=64, **kwargs):
+    """
+    Return analyze(...) for a list of (positive, negative) model names in library
+    (a DiodeLibrary), with the pairs split into chunks run in a process pool.
+    """
+    rows = numpy.array([(library.row(positive), library.row(negative)) for positive, negative in pairs], dtype=numpy.intp).reshape(-1, 2)
+    tasks = []
+    for start in range(0, len(rows), chunk):
+        block = rows[start:start + chunk]
+        positive = {k : v[block[:, 0]] for k, v in library.columns.items() if k in iv_curves.dc_parameters}
+        negative = {k : v[block[:, 1]] for k, v in library.columns.items() if k in iv_curves.dc_parameters}
+        tasks.append((positive, negative, kwargs))
+    if len(tasks) > 1 and workers != 1:
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(analyze_chunk, tasks))
+    else:
+        results = [analyze_chunk(task) for task in tasks]
+    if not results:
+        n = kwargs.get("harmonics", 21)
+        return numpy.zeros((0, n)), numpy.zeros((0, n)), numpy.zeros(0)
+    return tuple(numpy.concatenate(parts) for parts in zip(*results))
+
+def four_text(magnitude, phase, thd, frequency=1000, samples=1024):
+    """Return the text of a .four file for one clipper, in the format FourierAnalysis reads."""
+    lines = [four_header.format(n=len(magnitude), thd=thd, samples=samples)]
+    for k, (m, p) in enumerate(zip(magnitude, phase)):
+        lines.append(four_line.format(k=k, frequency=int(round(k * frequency)), magnitude=m, phase=p,
+            norm_mag=m / magnitude[1], norm_phase=p - phase[1]))
+    return "".join(lines)
+
+def fourier_analysis(name, magnitude, phase, thd, frequency=1000, samples=1024):
+    """Return a four_table.FourierAnalysis for one clipper, as if read from the file name."""
+    return four_table.FourierAnalysis(name, four_text(magnitude, phase, thd, frequency, samples))
+
+def main():
+    args = parser.parse_args()
+    diode_list = list(args.models)
+    if args.diode_list:
+        with open(args.diode_list) as f:
+            diode_list.extend(line.strip() for line in f if line.strip())
+    library = diode_library.DiodeLibrary.parse(args.model_file)
+    pairs = list(netlist.pairs(diode_list))
+    magnitude, phase, total = analyze_pairs(library, pairs, args.workers, args.chunk,
+        up=args.up, down=args.down, amplitude=args.amplitude, resistance=args.resistance, rf=args.rf,
+        harmonics=args.harmonics, samples=args.samples)
+    if args.four_folder:
+        os.makedirs(args.four_folder, exist_ok=True)
+        for (positive, negative), m, p, t in zip(pairs, magnitude, phase, total):
+            path = os.path.join(args.four_folder, "{positive}__{negative}.four".format(positive=positive, negative=negative))
+            with open(path, "w") as f:
+                f.write(four_text(m, p, t, args.frequency, args.samples))
+        return
+    print (",".join(["Positive", "Negative", "THD"] + [str(k) for k in range(2, args.harmonics)]))
+    for (positive, negative), m, t in zip(pairs, magnitude, total):
+        print (",".join([positive, negative, "{0:.6g}".format(t)] + ["{0:.6g}".format(v) for v in m[2:] / m[1]]))
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,38 @@
 #! python3
 r"""
 THD = sqrt ( Sum(2, n)(Mag^2[n]) ) / Mag[1]
+
+The THD up to each harmonic comes from a running sum of Mag^2, so all of
+them cost one pass. FourierTable holds every analysis as rows of one
+(pair x harmonic) array, so the closeness filter and the CSV rows are
+array operations over all the pairs at once.
+
+load_table lists the fourier folder once and matches the file names to the
+pairs. Files are parsed in a process pool, and the harmonics are kept in
+<four_folder>/four_table.cache so only new or changed files (by mtime and
+size) are parsed the next time.
 """
 
 import argparse
 import re
 import collections
-import math
+import concurrent.futures
 import itertools
 import os
+import pickle
+
+import numpy
+
+import instrument
 
 parser = argparse.ArgumentParser(description='Create fourier tables out of a collection of fourier files')
 #parser.add_argument('models', nargs='+', help='The name(s) of the diode model(s) to make a test circuit for.')
+parser.add_argument('--four_folder', default=r"E:\eda\fourier", help='Where all the .four files are.')
+parser.add_argument('--diode_list', '-l', default=r"E:\eda\diodes\diode-list.txt", help='A file with one diode model name per line.')
+parser.add_argument('--out', '-o', default="four_table.txt", help='The table to write.')
+parser.add_argument('--workers', '-j', type=int, default=None, help='Number of worker processes for parsing, default is one per core.')
+parser.add_argument('--rebuild', action='store_true', help='Ignore the parse cache and parse every .four file.')
+parser.add_argument('--stats', action='store_true', help='Print parse counters and stage timings as JSON on stderr.')
 
 class Harmonic():
     def __init__(self, m):
@@ -28,10 +49,15 @@ class FourierAnalysis():
     fp = "[-+]?(?:(?:\d*\.\d+)|(?:\d+\.?))(?:[Ee][+-]?\d+)?"
     re_fourier_analysis = re.compile(r"Fourier analysis for.*No. Harmonics:\s*(?P<n>\d+),\s*THD:\s*(?P<thd>{fp})\s*%".format(fp=fp), re.DOTALL)
     re_harmonic = re.compile(r"^\s*(?P<Harmonic>\d+)\s+(?P<Frequency>\d+)\s+(?P<Magnitude>{fp})\s+(?P<Phase>{fp})\s+(?P<NormMag>{fp})\s+(?P<NormPhase>{fp})\s+$".format(fp=fp), re.MULTILINE)
-    def __init__(self, filename):
+    def __init__(self, filename, buffer=None):
+        """Parse the fourier analysis file filename, or the contents given in buffer."""
+        timing = instrument.enabled
+        if timing:
+            start = instrument.clock()
         self.filename = filename
-        with open(filename, "r") as f:
-            buffer = f.read()
+        if buffer is None:
+            with open(filename, "r") as f:
+                buffer = f.read()
         m = self.re_fourier_analysis.search(buffer)
         if not m:
             raise ValueError("{filename} does not look like a fourier analysis file. File contents follow...\n{contents}".format(filename=filename, contents=buffer))
@@ -40,17 +66,22 @@ class FourierAnalysis():
         self.harmonics = collections.OrderedDict()
         for m in self.re_harmonic.finditer(buffer):
             self.harmonics[int(m.group('Harmonic'))] = Harmonic(m)
-        self.distortion = {}
-        last = 0
-        for i in range(2, self.n):
-            try:
-                thd = self.harmonic_distortion(i)
-            except KeyError as e:
-                print (self.filename)
-                print (e)
-                continue
-            self.distortion[i] = thd - last
-            last = thd
+        self.magnitude = numpy.full(self.n, numpy.nan)
+        for k, h in self.harmonics.items():
+            if k < self.n:
+                self.magnitude[k] = h.Magnitude
+        self.cumulative = cumulative_distortion(self.magnitude)
+        missing = numpy.flatnonzero(numpy.isnan(self.magnitude[1:])) + 1
+        if len(missing):
+            print (self.filename)
+            print (KeyError(int(missing[0])))
+        increments = numpy.diff(self.cumulative)
+        self.distortion = {i : float(increments[i - 1]) for i in range(2, self.n) if not numpy.isnan(increments[i - 1])}
+        if timing:
+            instrument.count("four.files")
+            instrument.count("four.harmonics", len(self.harmonics))
+            instrument.count("four.missing", len(missing))
+            instrument.add_time("four", instrument.clock() - start)
 
     def __repr__(self):
         return "FourierAnalysis({filename}): n={n} thd={thd}".format(**self.__dict__)
@@ -62,10 +93,93 @@ class FourierAnalysis():
             k = self.n
         else:
             k = k + 1 # because the arrary is zero based
-        SumMag2 = 0
-        for i in range(2, k):
-            SumMag2 += math.pow(self.harmonics[i].Magnitude, 2)
-        return 100 * math.sqrt(SumMag2) / self.harmonics[1].Magnitude
+        thd = self.cumulative[k - 1] if k > 1 else 0
+        if numpy.isnan(thd):
+            # like looking up the first missing harmonic
+            raise KeyError(int(numpy.flatnonzero(numpy.isnan(self.magnitude[1:k]))[0]) + 1)
+        return float(thd)
+
+def cumulative_distortion(magnitude):
+    """
+    Return the percent THD counting harmonics 2 to k, in column k, for each
+    row of harmonic magnitudes. Columns 0 and 1 are 0, a missing (NaN)
+    harmonic makes its column and all those after it NaN.
+    """
+    magnitude = numpy.asarray(magnitude, dtype=numpy.float64)
+    squares = numpy.square(magnitude)
+    squares[..., :2] = 0
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        return 100 * numpy.sqrt(numpy.cumsum(squares, axis=-1)) / magnitude[..., 1:2]
+
+class FourierTable():
+    def __init__(self, rows=()):
+        """
+        rows is an iterable of ((positive, negative), n, thd, magnitudes), the
+        magnitudes of harmonics 0 to n-1. Shorter rows are padded with NaN.
+        """
+        self.pairs = []
+        n, thd, magnitudes = [], [], []
+        for pair, k, total, magnitude in rows:
+            self.pairs.append(pair)
+            n.append(k)
+            thd.append(total)
+            magnitudes.append(magnitude)
+        self.n = numpy.array(n, dtype=numpy.intp)
+        self.thd = numpy.array(thd, dtype=numpy.float64)
+        width = max(n, default=0)
+        self.magnitude = numpy.full((len(n), width), numpy.nan)
+        for row, magnitude in enumerate(magnitudes):
+            self.magnitude[row, :len(magnitude)] = magnitude
+        self.cumulative = cumulative_distortion(self.magnitude)
+        # column i is the distortion added by harmonic i, columns 0 and 1 are unused
+        self.distortion = numpy.full_like(self.cumulative, numpy.nan)
+        if width > 2:
+            self.distortion[:, 2:] = numpy.diff(self.cumulative[:, 1:], axis=1)
+    @classmethod
+    def from_analyses(cls, analyses):
+        """Return the table of a dict of (positive, negative) : FourierAnalysis."""
+        return cls((pair, fa.n, fa.thd, fa.magnitude) for pair, fa in analyses.items())
+    def __repr__(self):
+        return "FourierTable: {pairs} pairs, {width} harmonics".format(pairs=len(self), width=self.magnitude.shape[1])
+    def __len__(self):
+        return len(self.pairs)
+    def harmonic(self, k):
+        """Return the distortion added by harmonic k for every pair, NaN where there is none."""
+        if 2 <= k < self.distortion.shape[1]:
+            return self.distortion[:, k]
+        return numpy.full(len(self), numpy.nan)
+    def is_close(self, m, n, ratio=2):
+        """Return a mask of the pairs where is_close(fa, m, n, ratio) holds."""
+        a, b = self.harmonic(m), self.harmonic(n)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            biggest = numpy.maximum(a, b) / numpy.minimum(a, b)
+        return (a == b) | ((a != 0) & (b != 0) & (biggest < ratio))
+    def complete(self):
+        """Return a mask of the pairs with every harmonic from 1 to n-1, the rows flatten writes."""
+        columns = numpy.arange(self.magnitude.shape[1])
+        missing = numpy.isnan(self.magnitude) & (columns >= 1) & (columns < self.n[:, numpy.newaxis])
+        return ~missing.any(axis=1)
+    def select(self, mask):
+        """Return a FourierTable of the pairs where mask is True."""
+        table = FourierTable.__new__(FourierTable)
+        rows = numpy.flatnonzero(mask)
+        table.pairs = [self.pairs[row] for row in rows]
+        for name in ("n", "thd", "magnitude", "cumulative", "distortion"):
+            setattr(table, name, getattr(self, name)[rows])
+        return table
+    def write_csv(self, out_file, header=True):
+        """Write the flatten rows of every complete pair, with a header line of the harmonic numbers."""
+        # at least the 2 to 20 that main always wrote
+        width = max(self.magnitude.shape[1], 21)
+        if header:
+            out_file.write("Positive,Negative,THD,{harmonics}\n".format(harmonics=",".join(str(i) for i in range(2, width))))
+        rows = numpy.flatnonzero(self.complete())
+        formats = {} # one format string for each row length
+        for row, n, thd, distortion in zip(rows, self.n[rows].tolist(), self.thd[rows].tolist(), self.distortion[rows, 2:].tolist()):
+            n = max(n - 2, 0)
+            if n not in formats:
+                formats[n] = "%s,%s,%r," + ",".join(["%.4f"] * n) + "\n"
+            out_file.write(formats[n] % (tuple(self.pairs[row]) + (thd,) + tuple(distortion[:n])))
 
 def show_thds(filename):
     fa = FourierAnalysis(filename)
@@ -81,14 +195,15 @@ def show_thds(filename):
         print ("{0:<3} {1:0<12.10f} {2:0<12.10f} {3:0<12.10f}".format(i, fa.harmonics[i].Magnitude, thd, thd - last))
         last = thd
 
-def flatten(positive, negative, four_folder, out_file):
+def flatten(positive, negative, four_folder, out_file, fa=None):
     fourier_file = r"{four_folder}\{positive}__{negative}.four".format(
         four_folder = four_folder,
         positive = positive,
         negative = negative)
-    if not os.path.exists(fourier_file):
-        return
-    fa = FourierAnalysis (fourier_file)
+    if fa is None:
+        if not os.path.exists(fourier_file):
+            return
+        fa = FourierAnalysis (fourier_file)
     h = []
     last = 0
     for i in range(2, fa.n):
@@ -123,35 +238,133 @@ def is_close(fa, m, n, ratio=2):
     biggest = fa.distortion[m] / fa.distortion[n] if fa.distortion[m] > fa.distortion[n] else fa.distortion[n] / fa.distortion[m]
     return biggest < ratio
 
+def list_four(four_folder):
+    """Return {file name : stat} for every .four file in four_folder."""
+    found = {}
+    with os.scandir(four_folder) as entries:
+        for entry in entries:
+            if entry.name.endswith(".four") and entry.is_file():
+                found[entry.name] = entry.stat()
+    return found
+
+def four_files(four_folder, diode_list, found=None):
+    """
+    List four_folder once, unless found is the list_four of it already, and
+    return [((positive, negative), file name, stat)] for each pair of
+    diode_list with a .four file, in four_table order.
+    """
+    if found is None:
+        found = list_four(four_folder)
+    files = []
+    pairs = [(i, i) for i in diode_list]
+    pairs.extend(itertools.combinations(diode_list, 2))
+    for positive, negative in pairs:
+        name = "{positive}__{negative}.four".format(positive=positive, negative=negative)
+        if name in found:
+            files.append(((positive, negative), name, found[name]))
+    return files
+
+def parse_four(path):
+    """Return (n, thd, magnitudes) for one .four file, or None if it is not a fourier analysis."""
+    try:
+        fa = FourierAnalysis(path)
+    except ValueError:
+        print ("{path} does not look like a fourier analysis file.".format(path=path))
+        return None
+    return fa.n, fa.thd, fa.magnitude
+
+def parse_four_counted(path):
+    """parse_four in a worker process, returning (result, instrument.snapshot()) for the parent to merge."""
+    instrument.enable()
+    return parse_four(path), instrument.snapshot()
+
+class FourCache():
+    """The parsed harmonics of the .four files in a folder: file name : (mtime, size, (n, thd, magnitudes))."""
+    file_name = "four_table.cache"
+    version = 1
+    def __init__(self, four_folder):
+        self.path = os.path.join(four_folder, self.file_name)
+        self.entries = {}
+        self.stats = {"hits" : 0, "parsed" : 0, "failed" : 0}
+    def __repr__(self):
+        return "FourCache({path}): hits={hits} parsed={parsed} failed={failed}".format(path=self.path, **self.stats)
+    def read(self):
+        try:
+            with open(self.path, "rb") as f:
+                cache = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError, ValueError):
+            return
+        if isinstance(cache, dict) and cache.get("version") == self.version:
+            self.entries = cache["entries"]
+    def write(self):
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                pickle.dump({"version" : self.version, "entries" : self.entries}, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass # a read only folder still works, it is just parsed again next time
+
+def load_table(four_folder, diode_list, workers=None, rebuild=False, chunk=64):
+    """
+    Return (FourierTable, FourCache) for the pairs of diode_list that have a
+    .four file in four_folder. Only the files not in the cache with the same
+    mtime and size are parsed, in a process pool. Entries for files that
+    are gone are dropped from the cache.
+    """
+    cache = FourCache(four_folder)
+    if not rebuild:
+        cache.read()
+    found = list_four(four_folder)
+    files = four_files(four_folder, diode_list, found)
+    deleted = [name for name in cache.entries if name not in found]
+    for name in deleted:
+        del cache.entries[name]
+    stale = [name for _, name, st in files
+        if cache.entries.get(name, (None, None))[:2] != (st.st_mtime_ns, st.st_size)]
+    paths = [os.path.join(four_folder, name) for name in stale]
+    if len(paths) > 1 and workers != 1:
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            if instrument.enabled:
+                results = []
+                for result, snapshot in pool.map(parse_four_counted, paths, chunksize=chunk):
+                    instrument.merge(snapshot)
+                    results.append(result)
+            else:
+                results = list(pool.map(parse_four, paths, chunksize=chunk))
+    else:
+        results = [parse_four(path) for path in paths]
+    stats = {name : st for _, name, st in files}
+    for name, result in zip(stale, results):
+        cache.entries[name] = (stats[name].st_mtime_ns, stats[name].st_size, result)
+    cache.stats["parsed"] = sum(result is not None for result in results)
+    cache.stats["failed"] = len(results) - cache.stats["parsed"]
+    cache.stats["hits"] = len(files) - len(stale)
+    if stale or deleted or rebuild:
+        cache.write()
+    if instrument.enabled:
+        instrument.count("four.cache_hits", cache.stats["hits"])
+    rows = ((pair, ) + cache.entries[name][2] for pair, name, _ in files if cache.entries[name][2] is not None)
+    return FourierTable(rows), cache
+
 def main():
+    args = parser.parse_args()
     #show_thds("testfile.four")
-    
-    four_folder = r"E:\eda\fourier" # where all the .four files are
-    diode_list_file = r"E:\eda\diodes\diode-list.txt"
-    #diode_list_file = r"E:\eda\diodes\diode-list-test.txt"
-    out_file = r"four_table.txt"
 
-    with open(diode_list_file) as f:
+    with open(args.diode_list) as f:
         diode_list = f.read().splitlines()
-    combo_list = [(i, i) for i in diode_list]
-    combo_list.extend(itertools.combinations(diode_list, 2))
-
-    fa = {}
-    for pd, nd in combo_list:
-        fourier_file = r"{four_folder}\{positive}__{negative}.four".format(
-            four_folder = four_folder,
-            positive = pd,
-            negative = nd)
-        if not os.path.exists(fourier_file):
-            continue
-        fa[(pd, nd)] = FourierAnalysis (fourier_file)
-    
-    close_2_3 = {k : v for k, v in fa.items() if is_close(v, 2, 3)}
+
+    if args.stats:
+        instrument.enable()
+    with instrument.stage("load"):
+        table, cache = load_table(args.four_folder, diode_list, args.workers, args.rebuild)
+    print (cache)
+    close_2_3 = table.select(table.is_close(2, 3))
     
-    with open(out_file, "w") as four_table:
-        four_table.write("Positive,Negative,THD,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20\n")
-        for (dp, dn), v in close_2_3.items():
-            flatten(dp, dn, four_folder, four_table)
+    with instrument.stage("write"), open(args.out, "w") as four_table:
+        close_2_3.write_csv(four_table)
+    if args.stats:
+        instrument.report()
 
 if __name__ == '__main__':
     main()
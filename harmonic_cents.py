@@ -6,26 +6,46 @@ THD = sqrt ( Sum(2, n)(Mag^2[n]) / Mag^2[1])
 import math
 import argparse
 
+import numpy
+
 parser = argparse.ArgumentParser(description='Show relationship between the harmonic series and the equal temperament scale degrees.')
 #parser.add_argument('models', nargs='+', help='The name(s) of the diode model(s) to make a test circuit for.')
 parser.add_argument('--number', '-n', type=int, default=20, help='The number of harmonics to show')
 
+degrees = {
+    0  : '  ',
+    1  : 'm2',
+    2  : ' 2',
+    3  : 'm3',
+    4  : ' 3',
+    5  : 'P4',
+    6  : 'tt',
+    7  : 'P5',
+    8  : 'm6',
+    9  : ' 6',
+    10 : 'm7',
+    11 : ' 7',
+    12 : '  '
+}
+
+# How consonant each scale degree is against the fundamental, 1 for octaves down to 0
+consonance = {
+    0  : 1.0,
+    1  : 0.0,
+    2  : 0.3,
+    3  : 0.6,
+    4  : 0.7,
+    5  : 0.8,
+    6  : 0.0,
+    7  : 0.9,
+    8  : 0.5,
+    9  : 0.6,
+    10 : 0.3,
+    11 : 0.1,
+    12 : 1.0
+}
+
 def closest(n):
-    degrees = {
-        0  : '  ',
-        1  : 'm2',
-        2  : ' 2',
-        3  : 'm3',
-        4  : ' 3',
-        5  : 'P4',
-        6  : 'tt',
-        7  : 'P5',
-        8  : 'm6',
-        9  : ' 6',
-        10 : 'm7',
-        11 : ' 7',
-        12 : '  '
-    }
     cents = (1200 * math.log(n, 2)) % 1200
     degree = int (cents / 100)
     cents = cents % 100
@@ -34,6 +54,25 @@ def closest(n):
         cents = cents - 100
     return (degrees[degree], cents)
 
+def cents_table(n):
+    """Return (degree, cents) arrays for harmonics 1 to n, what closest gives for each."""
+    harmonics = numpy.arange(1, n + 1)
+    cents = (1200 * numpy.log2(harmonics)) % 1200
+    degree = (cents // 100).astype(int)
+    cents = cents % 100
+    sharp = cents > 50
+    return degree + sharp, numpy.where(sharp, cents - 100, cents)
+
+def consonance_weights(n):
+    """
+    Return the consonance of harmonics 1 to n: the consonance of the nearest
+    scale degree, less the further the harmonic is out of tune with it, down
+    to 0 at 50 cents.
+    """
+    degree, cents = cents_table(n)
+    weights = numpy.array([consonance[d] for d in range(13)])
+    return weights[degree] * numpy.cos(numpy.pi * cents / 100)
+
 def main():
     args = parser.parse_args()
     print ("\nHarmonic  Degree    Cents")
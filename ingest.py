@@ -0,0 +1,186 @@
+#! python3
+r""" ingest.py
+
+Parse many vendor libraries in parallel and merge them into one.
+
+Inputs are files or directories (searched for library files). Files larger
+than the chunk size are split at safe record boundaries: the start of a line
+that is not a + continuation and is outside any .SUBCKT block. Each chunk is
+parsed in a process pool with the number of lines before it, so linenum
+values are the same as parsing the whole file. Compressed files (.gz, .xz,
+.bz2) and the libraries in .zip archives are not split, each one is parsed
+as a stream while it is decompressed, without writing it out first.
+
+Every model gets a source attribute with its file, archive/member for a
+.zip; with linenum that is its provenance. Models with the same name are resolved with a policy:
+
+first       keep the first one seen (files in the order given)
+last        keep the last one seen
+error       raise ValueError, unless the duplicates have identical parameters
+rename      keep them all, later ones are renamed NAME~2, NAME~3...
+"""
+
+import argparse
+import concurrent.futures
+import io
+import mmap
+import os
+import re
+
+import diodes
+
+parser = argparse.ArgumentParser(description='Merge diode models from many library files.')
+parser.add_argument('paths', nargs='+', help='Library files or directories of library files.')
+parser.add_argument('--policy', '-p', choices=('first', 'last', 'error', 'rename'), default='first', help='How to resolve duplicate model names.')
+parser.add_argument('--workers', '-j', type=int, default=None, help='Number of worker processes, default is one per core.')
+parser.add_argument('--chunk_size', type=int, default=4 << 20, help='Split files larger than this many bytes.')
+parser.add_argument('--out', '-o', help='Write the merged models to this file, otherwise stdout.')
+
+extensions = (".txt", ".lib", ".mod", ".inc", ".cir")
+policies = ("first", "last", "error", "rename")
+encoding = "latin-1"
+
+re_block = re.compile(rb"^[^\S\n]*\.(subckt|ends)", re.I | re.M)
+
+def library_files(paths):
+    """Return the list of files for paths, directories are walked for files with library extensions."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, _, names in sorted(os.walk(path)):
+                files.extend(os.path.join(folder, name) for name in sorted(names)
+                    if name.lower().endswith(extensions + diodes.compressed_extensions))
+        else:
+            files.append(path)
+    return files
+
+def chunks(path, chunk_size):
+    """
+    Return a list of (path, start, end, linenum) covering the file, split near
+    every chunk_size bytes at a line that starts a record outside any subckt.
+    linenum is the number of lines before start. A compressed file or archive
+    is one (path, member) span per library in it, see parse_member.
+    """
+    if path.lower().endswith(diodes.compressed_extensions):
+        return [(path, member) for member in diodes.archive_members(path)
+            if member is None or member.lower().endswith(extensions)]
+    size = os.path.getsize(path)
+    if size <= chunk_size:
+        return [(path, 0, size, 0)]
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        # Entering on any .subckt line and leaving on any .ends line is never "outside" when
+        # SpiceDiode.parse is inside, so a split where this says outside is safe.
+        blocks = [(m.start(), m.group(1).lower() == b"subckt") for m in re_block.finditer(buffer)]
+        spans = []
+        start, linenum, block = 0, 0, 0
+        in_subckt = False
+        target = chunk_size
+        while target < size:
+            split = buffer.find(b"\n", target) + 1
+            while 0 < split < size:
+                while block < len(blocks) and blocks[block][0] < split:
+                    in_subckt = blocks[block][1]
+                    block += 1
+                line_end = buffer.find(b"\n", split)
+                line = buffer[split:line_end if line_end >= 0 else size]
+                if not in_subckt and not line.lstrip().startswith(b"+"):
+                    break
+                split = line_end + 1
+            if split <= 0 or split >= size:
+                break
+            spans.append((path, start, split, linenum))
+            linenum += buffer[start:split].count(b"\n")
+            start = split
+            target = split + chunk_size
+        spans.append((path, start, size, linenum))
+    return spans
+
+def parse_member(span):
+    """Return the list of SpiceDiode objects in a compressed file or archive member, each with its source set."""
+    path, member = span
+    with diodes.open_library(path, member) as f:
+        diode_list = list(diodes.SpiceDiode.parse(f, engine="stream"))
+    source = path if member is None else "{path}/{member}".format(path=path, member=member)
+    for diode in diode_list:
+        diode.source = source
+    return diode_list
+
+def parse_chunk(span):
+    """Return the list of SpiceDiode objects in one chunk, each with its source set."""
+    if len(span) == 2:
+        return parse_member(span)
+    path, start, end, linenum = span
+    with open(path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode(encoding)
+    diode_list = list(diodes.SpiceDiode.parse(io.StringIO(text, newline=None), linenum=linenum))
+    for diode in diode_list:
+        diode.source = path
+    return diode_list
+
+def same_parameters(a, b):
+    return all(getattr(a, p) == getattr(b, p) for p in list(a.spice_parameters) + list(a.infomational_parameters))
+
+def merge(diode_lists, policy="first"):
+    """
+    Merge lists of SpiceDiode objects in order, resolving duplicate names with policy.
+    Return (merged list, duplicates) where duplicates is a list of (name, kept, dropped).
+    """
+    if policy not in policies:
+        raise ValueError("Unknown duplicate policy {policy}, expected one of {policies}.".format(policy=policy, policies=", ".join(policies)))
+    merged = {}
+    duplicates = []
+    counts = {}
+    for diode_list in diode_lists:
+        for diode in diode_list:
+            kept = merged.get(diode.name)
+            if kept is None:
+                merged[diode.name] = diode
+                counts[diode.name] = 1
+                continue
+            if policy == "first":
+                duplicates.append((diode.name, kept, diode))
+            elif policy == "last":
+                duplicates.append((diode.name, diode, kept))
+                del merged[diode.name] # keep the position of the last one
+                merged[diode.name] = diode
+            elif policy == "error":
+                if not same_parameters(kept, diode):
+                    raise ValueError("Duplicate model {name} in {a}:{a_line} and {b}:{b_line}".format(
+                        name=diode.name, a=kept.source, a_line=kept.linenum, b=diode.source, b_line=diode.linenum))
+                duplicates.append((diode.name, kept, diode))
+            else:
+                counts[diode.name] += 1
+                original = diode.name
+                diode.name = "{name}~{n}".format(name=original, n=counts[original])
+                merged[diode.name] = diode
+                duplicates.append((original, kept, diode))
+    return list(merged.values()), duplicates
+
+def ingest(paths, policy="first", workers=None, chunk_size=4 << 20):
+    """Parse every library under paths in a process pool and return merge(...) of the results."""
+    spans = []
+    for path in library_files(paths):
+        spans.extend(chunks(path, chunk_size))
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        diode_lists = list(pool.map(parse_chunk, spans))
+    return merge(diode_lists, policy)
+
+def main():
+    args = parser.parse_args()
+    diode_list, duplicates = ingest(args.paths, args.policy, args.workers, args.chunk_size)
+    out = open(args.out, "w") if args.out else None
+    try:
+        for diode in diode_list:
+            print ("* {source}:{linenum}\n{model}".format(source=diode.source, linenum=diode.linenum, model=diode), file=out)
+    finally:
+        if out:
+            out.close()
+    for name, kept, dropped in duplicates:
+        print ("Duplicate {name}: kept {kept}:{kept_line}, {action} {dropped}:{dropped_line}".format(
+            name=name, kept=kept.source, kept_line=kept.linenum, dropped=dropped.source, dropped_line=dropped.linenum,
+            action="renamed" if args.policy == "rename" else "dropped"))
+    print ("{n} models, {d} duplicates".format(n=len(diode_list), d=len(duplicates)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#! python3
+r""" instrument.py
+
+Counters and stage timings for the parsers. They are off until enabled.
+
+    instrument.enable()
+    library = diode_library.DiodeLibrary.parse("diodes-inc.txt")
+    print (instrument.to_json())
+
+Counter names are dotted:
+    preparse.lines              physical lines read by preparse
+    preparse.joins              + continuation lines joined onto the line before
+    scan.lines                  lines in the buffers scan went over
+    scan.cards                  dot cards found (.model, .subckt, .ends)
+    scan.joins                  + continuation lines in the cards that were joined
+    parse.models                SpiceDiode objects yielded by parse
+    parse.aliased.<NAME>        parameters given by an alias (IKF, CJ0...)
+    parse.ignored.<NAME>        unknown parameters that were ignored
+    float.exponent              spice_number.parse paths taken on a cache miss:
+    float.scale                     1.5E-3, 1.5m and 1.5
+    float.plain
+    float.cache_hits            the spice_number cache since enable or reset
+    float.cache_misses
+    four.files                  FourierAnalysis files, their harmonic lines
+    four.harmonics                  and the harmonics missing from them
+    four.missing
+    cache.hits                  library_cache loads answered from the cache,
+    cache.misses                    parsed from scratch, or only the appended
+    cache.refreshes                 part parsed
+    server.requests             diode_server.request calls, and those that
+    server.unavailable              found no server and fell back
+
+Timings are the seconds spent in each stage (parse, four, server and the
+work of the --stats CLIs: netlist, subckt, vf). A generator's
+time counts only while its own code runs, not the caller's time between
+yields.
+
+The instrumented code tests instrument.enabled once per call or per model,
+and the rare paths (aliases, ignored parameters, cache misses) test it
+only when they are taken, so the cost when it is off is a few attribute
+lookups. Worker processes can send their snapshot() back to be merged.
+"""
+
+import collections
+import contextlib
+import json
+import sys
+import time
+
+enabled = False
+counters = collections.Counter()
+timings = collections.Counter()
+_cache_start = None
+clock = time.perf_counter
+
+def enable():
+    """Start counting from zero."""
+    global enabled
+    reset()
+    enabled = True
+
+def disable():
+    global enabled
+    enabled = False
+
+def reset():
+    global _cache_start
+    import spice_number
+    counters.clear()
+    timings.clear()
+    _cache_start = spice_number.parse.cache_info()
+
+def count(name, n=1):
+    counters[name] += n
+
+def add_time(stage, seconds):
+    timings[stage] += seconds
+
+@contextlib.contextmanager
+def stage(name):
+    """Add the time spent in the with block to the stage, when enabled."""
+    if not enabled:
+        yield
+        return
+    start = clock()
+    try:
+        yield
+    finally:
+        timings[name] += clock() - start
+
+def snapshot():
+    """Return {"counters" : {...}, "timings" : {...}} sorted by name."""
+    import spice_number
+    snapshot_counters = dict(counters)
+    if _cache_start is not None:
+        info = spice_number.parse.cache_info()
+        snapshot_counters["float.cache_hits"] = snapshot_counters.get("float.cache_hits", 0) + info.hits - _cache_start.hits
+        snapshot_counters["float.cache_misses"] = snapshot_counters.get("float.cache_misses", 0) + info.misses - _cache_start.misses
+    return {
+        "counters" : dict(sorted(snapshot_counters.items())),
+        "timings" : dict(sorted(timings.items())),
+    }
+
+def merge(other):
+    """Add the counters and timings of another snapshot, e.g. from a worker process."""
+    counters.update(other["counters"])
+    timings.update(other["timings"])
+
+def to_json(indent=2):
+    return json.dumps(snapshot(), indent=indent)
+
+def report(file=None):
+    """Print the snapshot as JSON, to stderr by default so it does not mix with the output."""
+    print (to_json(), file=file or sys.stderr)
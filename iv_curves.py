@@ -0,0 +1,241 @@
+#! python3
+r""" iv_curves.py
+
+Evaluate diode I-V curves for a whole library at once.
+
+The model is the PSpice style diode equation, using every DC parameter we
+parse:
+
+Id      = Ifwd - Irev
+Ifwd    = Inrm*Kinj + Irec*Kgen
+Inrm    = IS*(exp(Vd/(N*Vt)) - 1)
+Kinj    = sqrt(IK/(IK+Inrm))                    high injection, only when IK is given
+Irec    = ISR*(exp(Vd/(NR*Vt)) - 1)
+Kgen    = ((1 - Vd/VJ)^2 + 0.005)^(M/2)
+Irev    = IBV*exp(-(Vd + BV)/(N*Vt))            breakdown
+V       = Vd + Id*RS
+
+Vd is the junction voltage and V the terminal voltage. The RS drop is
+solved implicitly with a bracketed Newton iteration, vectorized across every
+model and every grid point, so the result of iv_voltage/iv_current is a
+(models x points) array. Elements drop out of the iteration as they
+converge, and iv_voltage starts from the ideal diode voltage.
+
+Like SpiceDiode.__str__, a parameter equal to its default is treated as
+not given. That matters for IK: SPICE treats a missing IKF as infinite, so the
+1E-3 default in SpiceDiode.spice_parameters does not limit the current.
+"""
+
+import argparse
+
+import numpy
+
+import diodes
+import diode_library
+import spice_number
+
+parser = argparse.ArgumentParser(description='Rank the diodes in a library by forward voltage at one or more currents.')
+parser.add_argument('model_file', help='The file to get the models from.')
+parser.add_argument('--currents', '-i', nargs='+', default=['1m'], help='Forward currents to evaluate, e.g. 1m 100m 1')
+parser.add_argument('--models', '-m', nargs='*', help='Only show these models.')
+
+exp_limit = 80.0 # past this, exp() is continued as a straight line so Newton steps stay finite
+
+# the parameters junction_current uses
+dc_parameters = ("IS", "N", "RS", "IK", "ISR", "NR", "VJ", "M", "BV", "IBV")
+
+def limexp(x):
+    """Return (exp(x), d/dx exp(x)), linearized past exp_limit."""
+    clipped = numpy.minimum(x, exp_limit)
+    e = numpy.exp(clipped)
+    return numpy.where(x > exp_limit, e * (1 + x - exp_limit), e), e
+
+def columns(models):
+    """Return a dict of parameter columns for a DiodeLibrary, a dict of columns or a list of SpiceDiode objects."""
+    if isinstance(models, diode_library.DiodeLibrary):
+        return models.columns
+    if isinstance(models, dict):
+        return models
+    return diode_library.DiodeLibrary(models).columns
+
+def parameters(models):
+    """Return the parameter columns shaped (models, 1) so they broadcast against a grid."""
+    defaults = diodes.SpiceDiode.spice_parameters
+    p = {k : numpy.asarray(v, dtype=numpy.float64)[:, numpy.newaxis] for k, v in columns(models).items() if k in dc_parameters}
+    p["IK"] = numpy.where(p["IK"] == defaults["IK"], numpy.inf, p["IK"])
+    return p
+
+def junction_current(p, vd, vt):
+    """
+    Return the junction current and its derivative for junction voltage vd.
+    The high injection and recombination terms are skipped when no model has them.
+    """
+    nvt = p["N"] * vt
+    e, de = limexp(vd / nvt)
+    inrm = p["IS"] * (e - 1)
+    dinrm = p["IS"] * de / nvt
+    current, conductance = inrm, dinrm
+    # high injection, Kinj = sqrt(IK/(IK+Inrm)) for Inrm > 0
+    ik = p["IK"]
+    if not numpy.all(numpy.isinf(ik)):
+        forward = inrm > 0
+        x = numpy.where(forward, inrm / ik, 0)
+        kinj = 1 / numpy.sqrt(1 + x)
+        dkinj = numpy.where(forward, -0.5 * kinj**3 / ik, 0)
+        current = inrm * kinj
+        conductance = dinrm * (kinj + inrm * dkinj)
+    # recombination
+    if numpy.any(p["ISR"]):
+        nrvt = p["NR"] * vt
+        e, de = limexp(vd / nrvt)
+        irec = p["ISR"] * (e - 1)
+        direc = p["ISR"] * de / nrvt
+        base = (1 - vd / p["VJ"])**2 + 0.005
+        kgen = base**(p["M"] / 2)
+        dkgen = p["M"] / 2 * kgen / base * 2 * (1 - vd / p["VJ"]) * (-1 / p["VJ"])
+        current = current + irec * kgen
+        conductance = conductance + direc * kgen + irec * dkgen
+    # breakdown
+    e, de = limexp(-(vd + p["BV"]) / nvt)
+    current = current - p["IBV"] * e
+    conductance = conductance + p["IBV"] * de / nvt
+    return current, conductance
+
+def take(arrays, shape, where):
+    """
+    Return a dict of the elements at where (an index tuple into shape) of each
+    array broadcast to shape, or arrays itself when where is None.
+    """
+    if where is None:
+        return arrays
+    return {k : numpy.broadcast_to(v, shape)[where] for k, v in arrays.items()}
+
+def solve(f, lo, hi, iterations=200, tolerance=1e-12, x=None):
+    """
+    Find x in [lo, hi] with f(x, where) = 0 elementwise. f returns (value, derivative)
+    and must be increasing. Newton steps that leave the bracket fall back to bisection.
+    x is the starting guess, the middle of the bracket by default.
+    Elements are dropped as they converge, so f gets where=None for the whole
+    grid the first time, then the index tuple of the elements still being solved.
+    """
+    shape = numpy.broadcast_shapes(numpy.shape(lo), numpy.shape(hi))
+    lo = numpy.broadcast_to(lo, shape)
+    hi = numpy.broadcast_to(hi, shape)
+    x = (lo + hi) / 2 if x is None else numpy.broadcast_to(numpy.clip(x, lo, hi), shape)
+    result = numpy.array(x, dtype=numpy.float64)
+    where = None
+    for _ in range(iterations):
+        value, slope = f(x, where)
+        lo = numpy.where(value < 0, x, lo)
+        hi = numpy.where(value > 0, x, hi)
+        with numpy.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            step = x - value / slope
+        # step == x is converged, even when x is a bracket end
+        inside = numpy.isfinite(step) & (((step > lo) & (step < hi)) | (step == x))
+        new_x = numpy.where(inside, step, (lo + hi) / 2)
+        if where is None:
+            result[...] = new_x
+        else:
+            result[where] = new_x
+        active = ~(numpy.abs(new_x - x) <= tolerance * (1 + numpy.abs(x)))
+        if not numpy.any(active):
+            break
+        where = numpy.nonzero(active) if where is None else tuple(w[active] for w in where)
+        x, lo, hi = new_x[active], lo[active], hi[active]
+    return result
+
+def bracket(f, sign, start=1.0, doublings=64):
+    """
+    Return a bound on the side sign (+1/-1, elementwise) of zero where f has
+    crossed zero, nan where it never does.
+    """
+    bound = sign * start
+    for _ in range(doublings):
+        value, _ = f(bound)
+        crossed = value * sign >= 0
+        if numpy.all(crossed):
+            return bound
+        bound = numpy.where(crossed, bound, bound * 2)
+    value, _ = f(bound)
+    return numpy.where(value * sign >= 0, bound, numpy.nan)
+
+def ideal_voltage(p, i, vt):
+    """
+    Return the junction voltage where Inrm*Kinj alone carries i, a close first
+    guess for a forward current. Inrm*Kinj = i solves to
+    Inrm = (i^2/IK + sqrt(i^4/IK^2 + 4*i^2))/2.
+    """
+    i = numpy.maximum(i, 0)
+    with numpy.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        inrm = numpy.where(numpy.isinf(p["IK"]), i, (i * i / p["IK"] + numpy.sqrt((i * i / p["IK"])**2 + 4 * i * i)) / 2)
+    return p["N"] * vt * numpy.log1p(inrm / p["IS"])
+
+def thermal_voltage(temperature):
+    """Return Vt for a temperature in kelvin, either one temperature or one per model."""
+    return diodes.SpiceDiode.thermal_voltage(numpy.reshape(numpy.asarray(temperature, dtype=numpy.float64), (-1, 1)))
+
+def terminal_current(p, v, vt, vd=None):
+    """
+    Return the current, its derivative dI/dV and the junction voltage at
+    terminal voltage v, for (models, 1) parameter columns p broadcast against v.
+    vd is a first guess for the junction voltage.
+    """
+    shape = numpy.broadcast_shapes(p["IS"].shape, numpy.shape(v))
+    grid = dict(p, VT=vt, V=v)
+    def f(vd, where=None):
+        q = take(grid, shape, where)
+        current, conductance = junction_current(q, vd, q["VT"])
+        return vd + q["RS"] * current - q["V"], 1 + q["RS"] * conductance
+    # the junction voltage is always between 0 and the terminal voltage
+    lo = numpy.broadcast_to(numpy.minimum(v, 0), shape)
+    hi = numpy.broadcast_to(numpy.maximum(v, 0), shape)
+    vd = solve(f, lo, hi, x=vd)
+    current, conductance = junction_current(p, vd, vt)
+    return current, conductance / (1 + p["RS"] * conductance), vd
+
+def iv_current(models, voltages, temperature=300):
+    """
+    Return the (models x points) array of diode current at each terminal voltage.
+    temperature (kelvin) is one value or one per model.
+    """
+    v = numpy.asarray(voltages, dtype=numpy.float64)[numpy.newaxis, :]
+    return terminal_current(parameters(models), v, thermal_voltage(temperature))[0]
+
+def iv_voltage(models, currents, temperature=300):
+    """
+    Return the (models x points) array of terminal voltage at each diode current, nan if unreachable.
+    temperature (kelvin) is one value or one per model.
+    """
+    p = parameters(models)
+    i = numpy.asarray(currents, dtype=numpy.float64)[numpy.newaxis, :]
+    vt = thermal_voltage(temperature)
+    shape = numpy.broadcast_shapes(p["IS"].shape, i.shape)
+    grid = dict(p, VT=vt, I=i)
+    def f(vd, where=None):
+        q = take(grid, shape, where)
+        current, conductance = junction_current(q, vd, q["VT"])
+        return current - q["I"], conductance
+    sign = numpy.where(numpy.broadcast_to(i, shape) >= 0, 1.0, -1.0)
+    bound = bracket(f, sign)
+    unreachable = numpy.isnan(bound)
+    bound = numpy.where(unreachable, 0, bound)
+    vd = solve(f, numpy.minimum(bound, 0), numpy.maximum(bound, 0), x=ideal_voltage(p, i, vt))
+    return numpy.where(unreachable, numpy.nan, vd + i * p["RS"])
+
+def forward_voltage(models, current, temperature=300):
+    """Return one forward voltage per model at current."""
+    return iv_voltage(models, [current], temperature)[:, 0]
+
+def main():
+    args = parser.parse_args()
+    library = diode_library.DiodeLibrary.parse(args.model_file)
+    if args.models:
+        library = library.select(library.rows(args.models))
+    currents = spice_number.parse_list(args.currents)
+    vf = iv_voltage(library, currents)
+    print (",".join(["Model"] + ["Vf@{0}".format(c) for c in args.currents]))
+    for row in numpy.lexsort(vf.T[::-1]):
+        print (",".join([library.names[row]] + ["{0:.4f}".format(v) for v in vf[row]]))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#! python3
+r""" lazy_library.py
+
+Look up individual models without parsing the whole library.
+
+The model file is memory mapped and scanned once for .MODEL cards (with
+their + continuation lines, skipping subckts like SpiceDiode.parse). The
+name -> (start, end, first line) byte offsets are saved next to the file in
+<library>.index, keyed by size and mtime, so later runs load the index and
+only decode and parse the records that are asked for.
+
+    library = LazyLibrary("diodes-inc.txt")
+    print (library["DI_1N4001"])
+"""
+
+import argparse
+import mmap
+import os
+import pickle
+
+import diodes
+import instrument
+
+parser = argparse.ArgumentParser(description='Print diode models from a library without parsing all of it.')
+parser.add_argument('models', nargs='+', help='The name(s) of the diode model(s) to print.')
+parser.add_argument('--model_file', '-f', default=r"E:\eda\diodes\diodes-inc.txt", help='The file to get the model(s) from.')
+parser.add_argument('--stats', action='store_true', help='Print parse counters and stage timings as JSON on stderr.')
+
+INDEX_VERSION = 3 # 2: CRLF model cards are indexed, 3: and + cards at the start of the file
+
+class LazyLibrary():
+    suffix = ".index"
+    encoding = "latin-1"
+    def __init__(self, path, skip_subckt=True):
+        self.path = os.path.abspath(path)
+        self.index_path = self.path + self.suffix
+        self.skip_subckt = skip_subckt
+        self.parsed = {}
+        self._file = open(self.path, "rb")
+        st = os.fstat(self._file.fileno())
+        self.size, self.mtime = st.st_size, st.st_mtime_ns
+        # mmap can not map an empty file
+        self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.offsets = self.load_index()
+    def __repr__(self):
+        return "LazyLibrary({path}): {n} models, {p} parsed".format(path=self.path, n=len(self.offsets), p=len(self.parsed))
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        self.close()
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self._file.close()
+    def __len__(self):
+        return len(self.offsets)
+    def __contains__(self, name):
+        return name in self.offsets
+    def __iter__(self):
+        return iter(self.offsets)
+    def __getitem__(self, name):
+        """Return the SpiceDiode called name, parsing only its record."""
+        if name not in self.parsed:
+            start, end, linenum = self.offsets[name]
+            record = self.buffer[start:end].decode(self.encoding)
+            for found, parameters, last in diodes.SpiceDiode.scan(record, False, linenum - 1):
+                self.parsed[name] = diodes.SpiceDiode(found, parameters, last)
+        return self.parsed[name]
+    def get(self, name, default=None):
+        return self[name] if name in self.offsets else default
+    def build_index(self):
+        """Scan the mapped file and return {name : (start, end, first line)}. Like a dict of SpiceDiode.parse output, the last duplicate wins."""
+        return {name : (start, end, first) for name, _, first, _, start, end in diodes.SpiceDiode.cards(self.buffer, self.skip_subckt)}
+    def load_index(self):
+        try:
+            with open(self.index_path, "rb") as f:
+                entry = pickle.load(f)
+            if entry.get("version") == INDEX_VERSION and entry.get("skip_subckt") == self.skip_subckt \
+                    and entry.get("size") == self.size and entry.get("mtime") == self.mtime:
+                return entry["offsets"]
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, TypeError):
+            pass
+        offsets = self.build_index()
+        entry = {
+            "version" : INDEX_VERSION,
+            "skip_subckt" : self.skip_subckt,
+            "size" : self.size,
+            "mtime" : self.mtime,
+            "offsets" : offsets,
+        }
+        temp_path = self.index_path + ".tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.index_path)
+        except OSError:
+            pass # a read only library still works, it just rescans next time
+        return offsets
+
+def main():
+    args = parser.parse_args()
+    if args.stats:
+        instrument.enable()
+    with LazyLibrary(args.model_file) as library:
+        for model in args.models:
+            print (library[model])
+    if args.stats:
+        instrument.report()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#! python3
+r""" library_cache.py
+
+Keep a parsed copy of a spice model library next to the library file so
+later runs can skip SpiceDiode.parse.
+
+The cache is a pickle written to <library>.cache. It is keyed by the
+library path, size, mtime and a sha1 of the contents. When the library has
+only grown (the old contents are an unchanged prefix of the new contents)
+only the appended region is parsed, starting from the last logical line of
+the old contents since the append may have added + continuation lines to it.
+
+A cache that cannot be written (a read only or full folder) is skipped and
+the library is parsed on every load. With instrument enabled the loads are
+counted as cache.hits, cache.misses and cache.refreshes.
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import pickle
+import re
+
+import diodes
+import instrument
+
+parser = argparse.ArgumentParser(description='Build or refresh the parsed-library cache for a spice model file.')
+parser.add_argument('model_files', nargs='+', help='The model file(s) to cache.')
+parser.add_argument('--rebuild', action='store_true', help='Ignore any existing cache and parse from scratch.')
+
+CACHE_VERSION = 3 # 3: + cards at the start of the file are parsed
+
+class LibraryCache():
+    suffix = ".cache"
+    encoding = "latin-1" # vendor files are not utf-8, latin-1 also keeps byte offsets == character offsets
+    re_continue_line = re.compile(rb"^[ \t]*\+")
+    def __init__(self, path, skip_subckt=True):
+        self.path = os.path.abspath(path)
+        self.cache_path = self.path + self.suffix
+        self.skip_subckt = skip_subckt
+        self.stats = {"hits" : 0, "misses" : 0, "refreshes" : 0}
+    def __repr__(self):
+        return "LibraryCache({path}): hits={hits} misses={misses} refreshes={refreshes}".format(path=self.path, **self.stats)
+    def load(self, rebuild=False):
+        """Return the list of SpiceDiode objects for the library, using the cache when it is valid."""
+        st = os.stat(self.path)
+        entry = None if rebuild else self.read()
+        if entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime_ns:
+            self.count("hits")
+            return entry["diodes"]
+        with open(self.path, "rb") as f:
+            buffer = f.read()
+        if entry and len(buffer) >= entry["size"]:
+            if hashlib.sha1(buffer[:entry["size"]]).hexdigest() == entry["sha1"]:
+                if len(buffer) == entry["size"]:
+                    # touched but not changed
+                    self.count("hits")
+                    entry["mtime"] = st.st_mtime_ns
+                    self.write(entry)
+                    return entry["diodes"]
+                self.count("refreshes")
+                return self.refresh(entry, buffer, st)
+        self.count("misses")
+        entry = self.build(buffer, st)
+        return entry["diodes"]
+    def count(self, name):
+        self.stats[name] += 1
+        if instrument.enabled:
+            instrument.count("cache." + name)
+    def build(self, buffer, st):
+        resume = self.resume_point(buffer, 0, 0, False)
+        entry = {
+            "diodes" : self.parse(buffer, 0, 0, False),
+            "resume" : resume,
+        }
+        self.finish(entry, buffer, st)
+        return entry
+    def refresh(self, entry, buffer, st):
+        """Re-parse from the start of the last logical line of the cached contents."""
+        offset, linenum, in_subckt = entry["resume"]
+        kept = [diode for diode in entry["diodes"] if diode.linenum <= linenum]
+        entry["diodes"] = kept + self.parse(buffer, offset, linenum, in_subckt)
+        entry["resume"] = self.resume_point(buffer, offset, linenum, in_subckt)
+        self.finish(entry, buffer, st)
+        return entry["diodes"]
+    def finish(self, entry, buffer, st):
+        entry.update({
+            "version" : CACHE_VERSION,
+            "path" : self.path,
+            "skip_subckt" : self.skip_subckt,
+            "size" : len(buffer),
+            "mtime" : st.st_mtime_ns,
+            "sha1" : hashlib.sha1(buffer).hexdigest(),
+        })
+        self.write(entry)
+    def parse(self, buffer, offset, linenum, in_subckt):
+        text = io.StringIO(buffer[offset:].decode(self.encoding), newline=None)
+        return list(diodes.SpiceDiode.parse(text, self.skip_subckt, linenum, in_subckt))
+    def resume_point(self, buffer, offset, linenum, in_subckt):
+        """
+        Return (offset, linenum, in_subckt) for the start of the last logical line
+        in buffer. linenum is the number of physical lines before offset.
+        """
+        resume = (offset, linenum, in_subckt)
+        for line in io.BytesIO(buffer[offset:]):
+            if not self.re_continue_line.match(line):
+                resume = (offset, linenum, in_subckt)
+                if self.skip_subckt:
+                    text = line.decode(self.encoding)
+                    if in_subckt:
+                        in_subckt = not diodes.SpiceDiode.re_ends.match(text)
+                    else:
+                        in_subckt = bool(diodes.SpiceDiode.re_subckt.match(text))
+            offset += len(line)
+            linenum += 1
+        return resume
+    def read(self):
+        try:
+            with open(self.cache_path, "rb") as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError, ValueError):
+            return None
+        if not isinstance(entry, dict) or entry.get("version") != CACHE_VERSION:
+            return None
+        if entry.get("path") != self.path or entry.get("skip_subckt") != self.skip_subckt:
+            return None
+        return entry
+    def write(self, entry):
+        temp_path = self.cache_path + ".tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.cache_path)
+        except OSError:
+            pass # a read only library still works, it is just parsed again next time
+
+def load(path, skip_subckt=True):
+    """Return the list of SpiceDiode objects in the library at path, via its cache."""
+    return LibraryCache(path, skip_subckt).load()
+
+def main():
+    args = parser.parse_args()
+    for model_file in args.model_files:
+        cache = LibraryCache(model_file)
+        diode_list = cache.load(rebuild=args.rebuild)
+        print ("{cache} models={n}".format(cache=cache, n=len(diode_list)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#! python3
+r""" memory_benchmark.py
+
+Measure bytes per model for a parsed library.
+
+"before" rebuilds the models the way SpiceDiode used to store them: every
+default and every override copied into each instance __dict__, with a new
+float for every value. "after" is the current SpiceDiode, which keeps
+only its overrides, interns identical override sets and shares the floats
+from the spice_number cache.
+"""
+
+import argparse
+import gc
+import tracemalloc
+
+import diodes
+import spice_number
+
+parser = argparse.ArgumentParser(description='Show bytes per model before and after the compact SpiceDiode representation.')
+parser.add_argument('model_file', nargs='?', default=r"E:\eda\diodes\diodes-inc.txt", help='The file to get the models from.')
+
+class LegacyDiode():
+    """A SpiceDiode as it used to be stored, for comparison only."""
+    def __init__(self, name, parameters, linenum=0):
+        self.name = name
+        self.linenum = linenum
+        for p, v in diodes.SpiceDiode.spice_parameters.items():
+            setattr(self, p, v)
+        for p, v in diodes.SpiceDiode.infomational_parameters.items():
+            setattr(self, p, v)
+        for m in diodes.SpiceDiode.re_parameters.finditer(parameters):
+            parameter = m.group('attribute').upper()
+            value = m.group('value')
+            if parameter in diodes.SpiceDiode.infomational_parameters:
+                setattr(self, parameter, value)
+                continue
+            parameter = diodes.SpiceDiode.parameter_alias.get(parameter, parameter)
+            if parameter in diodes.SpiceDiode.spice_parameters:
+                setattr(self, parameter, spice_number.parse.__wrapped__(value))
+
+def measure(factory, records):
+    """Return (the models, bytes still allocated) after building a model for each record."""
+    gc.collect()
+    tracemalloc.start()
+    models = [factory(*record) for record in records]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return models, allocated
+
+def main():
+    args = parser.parse_args()
+    with diodes.open_text(args.model_file) as f:
+        records = list(diodes.SpiceDiode.scan(f.read()))
+    models, before = measure(LegacyDiode, records)
+    del models
+    diodes.SpiceDiode._interned.clear()
+    spice_number.parse.cache_clear()
+    models, after = measure(diodes.SpiceDiode, records)
+    n = len(models)
+    # the interned sets only live as long as the models using them
+    sets = len(diodes.SpiceDiode._interned)
+    print ("{n} models, {sets} distinct parameter sets".format(n=n, sets=sets))
+    print ("before {0:>10} bytes {1:>8.0f} bytes/model".format(before, before / max(n, 1)))
+    print ("after  {0:>10} bytes {1:>8.0f} bytes/model".format(after, after / max(n, 1)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#! python3
+r""" netlist.py
+
+Write the anti-parallel diode subckts for a whole sweep to one file.
+
+Each AntiParallelDiodes topology is written once, however many times the
+sweep asks for it (the name is the topology), as soon as it is added. So
+memory stays flat and the output is written through one large buffer
+instead of building every subckt and printing it. Instance lines can be
+written along with them. The .MODEL cards of the diodes that were used are
+written once each, when the writer is closed.
+
+    with NetlistWriter("sweep.cir", lazy_library.LazyLibrary("diodes-inc.txt")) as netlist:
+        for circuit in sweep(["DI_1N4148W", "DI_BAS70JW"], depth=3):
+            netlist.add(circuit)
+"""
+
+import argparse
+import itertools
+import sys
+
+import diodes
+import lazy_library
+
+parser = argparse.ArgumentParser(description='Write anti-parallel diode subckts for every pair of diodes.')
+parser.add_argument('models', nargs='*', help='The name(s) of the diode model(s) to pair up.')
+parser.add_argument('--model_file', '-f', default=r"E:\eda\diodes\diodes-inc.txt", help='The file to get the model(s) from.')
+parser.add_argument('--diode_list', '-l', help='A file with one diode model name per line, added to the models.')
+parser.add_argument('--depth', '-d', type=int, default=1, help='Sweep 1 to depth diodes in series in each direction.')
+parser.add_argument('--resistance', '-r', default="0", help='The resistance of Rf in each subckt.')
+parser.add_argument('--nodes', nargs=3, metavar=('POS', 'MID', 'NEG'), help='Also write an instance line for each subckt on these nodes.')
+parser.add_argument('--out', '-o', help='The file to write, otherwise stdout.')
+
+def pairs(diode_list):
+    """Each diode with itself, then every combination of two, like four_table."""
+    yield from ((diode, diode) for diode in diode_list)
+    yield from itertools.combinations(diode_list, 2)
+
+def sweep(diode_list, depth=1, resistance=0):
+    """Yield an AntiParallelDiodes for every pair and every 1 to depth up and down count."""
+    for positive, negative in pairs(diode_list):
+        for up, down in itertools.product(range(1, depth + 1), repeat=2):
+            yield diodes.AntiParallelDiodes([positive] * up, [negative] * down, resistance)
+
+class NetlistWriter():
+    def __init__(self, out, library, buffer_size=1 << 20):
+        """
+        out is a path or a file object, library maps model names to
+        SpiceDiode objects (a LazyLibrary, DiodeLibrary or dict).
+        """
+        self.library = library
+        self.owned = isinstance(out, str)
+        self.out = open(out, "w", buffering=buffer_size) if self.owned else out
+        self.written = set() # subckt names
+        self.models = {} # model names in the order they were first used
+        self.instances = 0
+        self.duplicates = 0
+    def __repr__(self):
+        return "NetlistWriter: {n} subckts, {i} instances, {m} models, {d} duplicates skipped".format(
+            n=len(self.written), i=self.instances, m=len(self.models), d=self.duplicates)
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        self.close()
+    def add(self, circuit, line_name=None, nodes=None):
+        """
+        Write the subckt for circuit unless it has been written already and,
+        when nodes (positive, middle, negative) are given, an instance line.
+        line_name defaults to a running count.
+        """
+        if circuit.name in self.written:
+            self.duplicates += 1
+        else:
+            self.written.add(circuit.name)
+            self.out.write(circuit.subckt())
+            self.out.write("\n")
+            for model in circuit.diodes():
+                self.models.setdefault(model, None)
+        if nodes:
+            self.instances += 1
+            self.out.write(circuit.node(line_name or self.instances, *nodes))
+            self.out.write("\n")
+    def write_models(self):
+        """Write the .MODEL cards of every diode used so far that has not been written yet."""
+        for model, written in self.models.items():
+            if not written:
+                self.out.write("\n{model}".format(model=self.library[model]))
+                self.models[model] = True
+        self.out.write("\n")
+    def close(self):
+        self.write_models()
+        if self.owned:
+            self.out.close()
+        else:
+            self.out.flush()
+
+def main():
+    args = parser.parse_args()
+    diode_list = list(args.models)
+    if args.diode_list:
+        with open(args.diode_list) as f:
+            diode_list.extend(line.strip() for line in f if line.strip())
+    with lazy_library.LazyLibrary(args.model_file) as library:
+        with NetlistWriter(args.out or sys.stdout, library) as netlist:
+            for circuit in sweep(diode_list, args.depth, args.resistance):
+                netlist.add(circuit, nodes=args.nodes)
+    print (netlist, file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
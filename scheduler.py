@@ -0,0 +1,242 @@
+#! python3
+r""" scheduler.py
+
+Run a whole sweep of simulations, resuming where an interrupted run stopped.
+
+Jobs are expanded the way four_table looks for them: every diode with
+itself and every combination of two, giving a <positive>__<negative>.four
+file. The netlist is an AntiParallelDiodes clipper driven through a
+resistor by a sine. With --kind dc each diode gets a diode-test.py circuit
+that writes its V(1,_model) sweep to <model>.data instead.
+
+Netlists are written as jobs are handed to a bounded pool of workers, each
+running the simulator on one netlist. A job is done when the simulator
+exits with 0 and its output file exists. Every finished job is appended to
+manifest.jsonl in the output folder, and a rerun skips the jobs the
+manifest lists as done, so a sweep can be stopped and started again.
+
+The simulator is a command template; {netlist} is replaced by the netlist
+path and the command runs in the output folder. spice_stub.py stands in for
+ngspice when testing:
+
+    python scheduler.py -l diode-list.txt -o E:\eda\fourier --simulator "ngspice -b {netlist}"
+    python scheduler.py -l diode-list.txt -o fourier --stub
+"""
+
+import argparse
+import concurrent.futures
+import importlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+
+import diodes
+import lazy_library
+import netlist
+
+diode_test = importlib.import_module("diode-test")
+
+parser = argparse.ArgumentParser(description='Run spice simulations for every pair of diodes on a pool of workers.')
+parser.add_argument('models', nargs='*', help='The name(s) of the diode model(s) to simulate.')
+parser.add_argument('--model_file', '-f', default=r"E:\eda\diodes\diodes-inc.txt", help='The file to get the model(s) from.')
+parser.add_argument('--diode_list', '-l', help='A file with one diode model name per line, added to the models.')
+parser.add_argument('--out', '-o', default="fourier", help='The folder for the netlists, outputs and manifest.')
+parser.add_argument('--kind', choices=('four', 'dc'), default='four', help='Anti-parallel clipper fourier jobs or diode-test dc sweeps.')
+parser.add_argument('--simulator', default="ngspice -b {netlist}", help='The simulator command, {netlist} is the netlist file.')
+parser.add_argument('--stub', action='store_true', help='Use spice_stub.py instead of a real simulator.')
+parser.add_argument('--workers', '-j', type=int, default=os.cpu_count() or 1, help='How many simulations to run at once.')
+parser.add_argument('--timeout', type=float, default=600, help='Seconds before a simulation is given up on.')
+parser.add_argument('--retry', action='store_true', help='Also rerun the jobs the manifest lists as failed.')
+
+clipper = """* {name}
+V1      in      0       SIN(0 {amplitude} {frequency})
+R1      in      pos     {resistance}
+{instance}
+{subckt}
+
+{models}
+
+.control
+set noaskquit
+set nfreqs={harmonics}
+tran {step} {stop}
+fourier {frequency} v(pos) > {output}
+.endc
+
+.END
+"""
+
+class Job():
+    def __init__(self, name, output, text):
+        self.name = name
+        self.output = output
+        self.text = text
+    def __repr__(self):
+        return "Job({name})".format(name=self.name)
+
+def four_jobs(diode_list, library, up=1, down=1, amplitude=1, frequency=1000, resistance="1k", harmonics=21):
+    """Yield a clipper Job for each pair, writing <positive>__<negative>.four."""
+    period = 1.0 / frequency
+    for positive, negative in netlist.pairs(diode_list):
+        circuit = diodes.AntiParallelDiodes([positive] * up, [negative] * down)
+        name = "{positive}__{negative}".format(positive=positive, negative=negative)
+        output = name + ".four"
+        models = "\n".join(str(library[model]) for model in dict.fromkeys(circuit.diodes()))
+        # ten periods to settle, ngspice's fourier looks at the last one
+        text = clipper.format(name=name, amplitude=amplitude, frequency=frequency, resistance=resistance,
+            instance=circuit.node(1, "pos", "mid", 0), subckt=circuit.subckt(), models=models, harmonics=harmonics,
+            step=period / 1000, stop=10 * period, output=output)
+        yield Job(name, output, text)
+
+def dc_jobs(diode_list, library):
+    """Yield a diode-test.py Job for each diode, writing the V(1,_model) sweep to <model>.data."""
+    for model in dict.fromkeys(diode_list):
+        output = model + ".data"
+        text = diode_test.circuit.format(
+            model_list=model,
+            nodes=diode_test.node.format(i=0, model=model),
+            models=str(library[model]),
+            voltage_list=diode_test.voltage.format(model=model),
+        )
+        # write the sweep to a file instead of plotting it
+        text = text.replace("plot ", "wrdata {output} ".format(output=output), 1)
+        yield Job(model, output, text)
+
+class Manifest():
+    """The jobs that have finished, appended to <folder>/manifest.jsonl as they finish."""
+    file_name = "manifest.jsonl"
+    def __init__(self, folder):
+        self.path = os.path.join(folder, self.file_name)
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue # the last line of an interrupted run may be cut short
+                    self.entries[entry["job"]] = entry
+        self.f = open(self.path, "a")
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        self.f.close()
+    def done(self, name, retry=False):
+        entry = self.entries.get(name)
+        return entry is not None and (entry["status"] == "ok" or not retry)
+    def record(self, entry):
+        self.entries[entry["job"]] = entry
+        self.f.write(json.dumps(entry) + "\n")
+        self.f.flush()
+
+def run(job, command, folder, timeout):
+    """Write the netlist for job, run the simulator on it and return its manifest entry."""
+    netlist_file = job.name + ".cir"
+    output = os.path.join(folder, job.output)
+    start = time.perf_counter()
+    try:
+        with open(os.path.join(folder, netlist_file), "w") as f:
+            f.write(job.text)
+        if os.path.exists(output):
+            os.remove(output)
+        result = subprocess.run([part.format(netlist=netlist_file) for part in command], cwd=folder,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=timeout)
+        returncode, error = result.returncode, result.stderr.decode("latin-1").strip()[-500:]
+    except subprocess.TimeoutExpired:
+        returncode, error = None, "timed out after {timeout} s".format(timeout=timeout)
+    except OSError as e:
+        returncode, error = None, str(e)
+    ok = returncode == 0 and os.path.exists(output)
+    return {
+        "job" : job.name,
+        "status" : "ok" if ok else "failed",
+        "returncode" : returncode,
+        "seconds" : round(time.perf_counter() - start, 3),
+        "output" : job.output,
+        "error" : "" if ok else error or "no output",
+    }
+
+class Progress():
+    """Print done/total, jobs per second and the time left, at most every interval seconds."""
+    def __init__(self, total, interval=1.0, file=sys.stderr):
+        self.total = total
+        self.interval = interval
+        self.file = file
+        self.start = time.perf_counter()
+        self.last = 0
+        self.printed = None
+        self.counts = {"ok" : 0, "failed" : 0}
+    def update(self, status, final=False):
+        if status:
+            self.counts[status] += 1
+        now = time.perf_counter()
+        done = sum(self.counts.values())
+        if (not final and now - self.last < self.interval) or (final and done == self.printed):
+            return
+        self.last, self.printed = now, done
+        rate = done / max(now - self.start, 1e-9)
+        left = (self.total - done) / rate if rate else float("inf")
+        print ("{done}/{total} ok={ok} failed={failed} {rate:.2f} jobs/s {left:.0f} s left".format(
+            done=done, total=self.total, rate=rate, left=left, **self.counts), file=self.file)
+
+def schedule(jobs, command, folder, workers=1, timeout=600, retry=False, total=None):
+    """
+    Run every job not already done in the folder's manifest on a pool of workers.
+    Return the Progress, with counts of the jobs run now.
+    jobs is taken one at a time, so a generator only builds the netlists
+    as they are handed out. total is the number of jobs for the progress
+    line, len(jobs) by default; the jobs already done come off it as they
+    are skipped.
+    """
+    os.makedirs(folder, exist_ok=True)
+    if isinstance(command, str):
+        command = shlex.split(command)
+    if total is None:
+        total = len(jobs)
+    with Manifest(folder) as manifest:
+        progress = Progress(total)
+        def todo():
+            for job in jobs:
+                if manifest.done(job.name, retry):
+                    progress.total -= 1
+                else:
+                    yield job
+        with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+            pending = set()
+            for job in todo():
+                # keep the queue short so the netlists are written as they are needed
+                if len(pending) >= 2 * workers:
+                    finished, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in finished:
+                        entry = future.result()
+                        manifest.record(entry)
+                        progress.update(entry["status"])
+                pending.add(pool.submit(run, job, command, folder, timeout))
+            for future in concurrent.futures.as_completed(pending):
+                entry = future.result()
+                manifest.record(entry)
+                progress.update(entry["status"])
+        progress.update(None, final=True)
+    return progress
+
+def main():
+    args = parser.parse_args()
+    diode_list = list(args.models)
+    if args.diode_list:
+        with open(args.diode_list) as f:
+            diode_list.extend(line.strip() for line in f if line.strip())
+    command = args.simulator
+    if args.stub:
+        command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "spice_stub.py"), "{netlist}"]
+    with lazy_library.LazyLibrary(args.model_file) as library:
+        if args.kind == 'four':
+            jobs, total = four_jobs(diode_list, library), sum(1 for _ in netlist.pairs(diode_list))
+        else:
+            jobs, total = dc_jobs(diode_list, library), len(dict.fromkeys(diode_list))
+        schedule(jobs, command, args.out, args.workers, args.timeout, args.retry, total)
+
+if __name__ == '__main__':
+    main()
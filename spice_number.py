@@ -0,0 +1,81 @@
+#! python3
+r""" spice_number.py
+
+Parse spice numeric literals: plain numbers, scientific notation and scale
+factors, optionally followed by a unit letter.
+
+Suffix      Scale   Number              Name
+T           E+12    1,000,000,000,000   Tera
+G           E+09    1,000,000,000       Giga
+X or MEG    E+06    1,000,000           Mega
+K           E+03    1,000               Kilo
+M           E-03    0.001               Milli
+U           E-06    0.000001            Micro
+N           E-09    0.000000001         Nano
+P           E-12    0.000000000001      Pico
+F           E-15    0.000000000000001   Femto
+
+Only the leading number is used, anything after it is ignored, so 10.0uA,
+10.0u and 10.0uF are all 1e-05. Note that a bare F is Femto, not Farad.
+
+Vendor libraries repeat the same literals thousands of times, so results
+are kept in a bounded LRU cache.
+"""
+
+import argparse
+import functools
+import math
+import re
+
+import instrument
+
+parser = argparse.ArgumentParser(description='Convert spice numeric literals to floats.')
+parser.add_argument('literals', nargs='+', help='The literal(s) to convert, e.g. 10.0u 1meg 2.06E-3')
+
+# exponent is tried first, then the scale factor. meg must come before m.
+re_literal = re.compile(r"\s*(?P<number>-?\d*\.?\d*)(?:(?P<exponent>E[-+]?\d*)|(?P<scale>meg|[tgxkmunpf]))?", re.I)
+scales = {
+    't' : math.pow(10, 12),
+    'g' : math.pow(10, 9),
+    'x' : math.pow(10, 6),
+    'meg' : math.pow(10, 6),
+    'k' : math.pow(10, 3),
+    'm' : math.pow(10, -3),
+    'u' : math.pow(10, -6),
+    'n' : math.pow(10, -9),
+    'p' : math.pow(10, -12),
+    'f' : math.pow(10, -15),
+}
+
+@functools.lru_cache(maxsize=4096)
+def parse(literal):
+    """
+    Return a float from a string, may have units, scientific notation or scale factors.
+    Raises ValueError if there is no number at the start of the string.
+    """
+    m = re_literal.match(literal)
+    if m.group('exponent'):
+        if instrument.enabled:
+            instrument.count("float.exponent")
+        return float(m.group('number') + m.group('exponent'))
+    if m.group('scale'):
+        if instrument.enabled:
+            instrument.count("float.scale")
+        return float(m.group('number')) * scales[m.group('scale').lower()]
+    if instrument.enabled:
+        instrument.count("float.plain")
+    return float(m.group('number'))
+
+def parse_list(literals):
+    """Return a list of floats, one for each literal. Each distinct literal is parsed once."""
+    values = {literal : parse(literal) for literal in set(literals)}
+    return [values[literal] for literal in literals]
+
+def main():
+    args = parser.parse_args()
+    for literal, value in zip(args.literals, parse_list(args.literals)):
+        print ("{literal:<16}{value}".format(literal=literal, value=value))
+    print (parse.cache_info())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#! python3
+r""" spice_stub.py
+
+A stand-in for 'ngspice -b netlist' that answers the netlists scheduler.py
+writes, so a sweep can be run without ngspice.
+
+For a clipper netlist (one with a fourier command) the anti-parallel pair
+is read from the subckt, the sine and resistor from V1 and R1, and the
+.four file is computed with distortion.py. For a diode-test netlist (one
+with wrdata) the dc sweep is solved with dc_solver.py and written as
+'I1 V(1,_model)' columns. Anything else is an error, exit status 1.
+
+    python spice_stub.py BAS70LP__DI_BAS70JW.cir
+"""
+
+import argparse
+import io
+import re
+import sys
+
+import dc_solver
+import diodes
+import distortion
+import spice_number
+
+parser = argparse.ArgumentParser(description='Stand in for ngspice on the netlists scheduler.py writes.')
+parser.add_argument('netlist', help='The netlist to simulate.')
+parser.add_argument('-b', action='store_true', help='Ignored, for the same command line as ngspice.')
+
+re_fourier = re.compile(r"^\s*fourier\s+(?P<frequency>\S+)\s+\S+\s*>\s*(?P<output>\S+)", re.I | re.M)
+re_wrdata = re.compile(r"^\s*wrdata\s+(?P<output>\S+)", re.I | re.M)
+re_dc = re.compile(r"^\s*dc\s+I1\s+(?P<start>\S+)\s+(?P<stop>\S+)\s+(?P<step>\S+)", re.I | re.M)
+re_sine = re.compile(r"^V1\s+\S+\s+\S+\s+SIN\(\s*\S+\s+(?P<amplitude>\S+)", re.I | re.M)
+re_resistor = re.compile(r"^R1\s+\S+\s+\S+\s+(?P<value>\S+)", re.I | re.M)
+re_nfreqs = re.compile(r"^\s*set\s+nfreqs\s*=\s*(?P<n>\d+)", re.I | re.M)
+re_diode = re.compile(r"^D\S*\s+\S+\s+\S+\s+(?P<model>\S+)", re.I | re.M)
+re_rf = re.compile(r"^Rf\s+\S+\s+\S+\s+(?P<value>\S+)", re.I | re.M)
+
+def four(text, match, library):
+    subckt = re.search(r"^\.SUBCKT\s+\S+\s+\S+\s+(?P<mid>\S+)\s+\S+\s*$(?P<body>.*?)^\.ENDS", text, re.I | re.M | re.S)
+    models = re_diode.findall(subckt.group('body'))
+    up = int(subckt.group('mid')) - 1
+    positive, negative = library[models[0]], library[models[up]]
+    nfreqs = re_nfreqs.search(text)
+    rf = re_rf.search(subckt.group('body'))
+    magnitude, phase, thd = distortion.analyze([positive], [negative], up, len(models) - up,
+        amplitude=spice_number.parse(re_sine.search(text).group('amplitude')),
+        resistance=spice_number.parse(re_resistor.search(text).group('value')),
+        rf=spice_number.parse(rf.group('value')) if rf else 0,
+        harmonics=int(nfreqs.group('n')) if nfreqs else 10)
+    frequency = spice_number.parse(match.group('frequency'))
+    return distortion.four_text(magnitude[0], phase[0], thd[0], frequency)
+
+def dc(text, library):
+    sweep = re_dc.search(text)
+    currents = dc_solver.sweep_currents(*(spice_number.parse(sweep.group(k)) for k in ('start', 'stop', 'step')))
+    # the dc card looks like a diode line too
+    models = [model for model in dict.fromkeys(re_diode.findall(text)) if model in library]
+    _, curves = dc_solver.dc_sweep([library[model] for model in models], currents)
+    out = io.StringIO()
+    for i, row in zip(currents, curves.T):
+        out.write("".join(" {i:.6e} {v:.6e}".format(i=i, v=v) for v in row) + "\n")
+    return out.getvalue()
+
+def main():
+    args = parser.parse_args()
+    with open(args.netlist) as f:
+        text = f.read()
+    library = {diode.name : diode for diode in diodes.SpiceDiode.parse(io.StringIO(text), skip_subckt=False)}
+    match = re_fourier.search(text)
+    if match:
+        output, result = match.group('output'), four(text, match, library)
+    elif re_wrdata.search(text) and re_dc.search(text):
+        output, result = re_wrdata.search(text).group('output'), dc(text, library)
+    else:
+        print ("No fourier or wrdata analysis in %s." % args.netlist, file=sys.stderr)
+        sys.exit(1)
+    with open(output, "w") as f:
+        f.write(result)
+
+if __name__ == '__main__':
+    main()
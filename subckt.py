@@ -40,24 +40,47 @@ import argparse
 parser = argparse.ArgumentParser(description='Make some diode sub circuits')
 parser.add_argument('model', help='The name of the diode model to make sub-circuts for')
 parser.add_argument('--depth', type=int, default=4)
+parser.add_argument('--local', action='store_true', help='Do not ask diode_server.py, even when it is running.')
+parser.add_argument('--stats', action='store_true', help='Print parse counters and stage timings as JSON on stderr.')
 
-def main():
-    args = parser.parse_args()
-    
-    for depth in range (1, args.depth+1):
-        print (head.format(model=args.model, up=1, down=depth, anode=1, cathode=2))
+import diode_server
+import instrument
+
+def subckts(model, depth=4):
+    """Return the text of the anti-parallel sub circuits of model, 1 to depth diodes each way."""
+    lines = []
+    for depth in range (1, depth+1):
+        lines.append (head.format(model=model, up=1, down=depth, anode=1, cathode=2))
         for i in range (1, depth):
-            print (body.format(number=i, anode=i+1, cathode=i+2, model=args.model))
-        print (body.format(number=depth, anode=depth+1, cathode=1, model=args.model))
-        print (tail)
+            lines.append (body.format(number=i, anode=i+1, cathode=i+2, model=model))
+        lines.append (body.format(number=depth, anode=depth+1, cathode=1, model=model))
+        lines.append (tail)
         if depth==1:
             continue
     
-        print (head.format(model=args.model, up=depth, down=1, anode=2, cathode=1))
+        lines.append (head.format(model=model, up=depth, down=1, anode=2, cathode=1))
         for i in range (1, depth):
-            print (body.format(number=i, anode=i+1, cathode=i+2, model=args.model))
-        print (body.format(number=depth, anode=depth+1, cathode=1, model=args.model))
-        print (tail)
+            lines.append (body.format(number=i, anode=i+1, cathode=i+2, model=model))
+        lines.append (body.format(number=depth, anode=depth+1, cathode=1, model=model))
+        lines.append (tail)
+    return "\n".join(lines)
+
+def main():
+    args = parser.parse_args()
+    if args.stats:
+        instrument.enable()
+    text = None
+    if not args.local:
+        try:
+            text = diode_server.request("subckt", model=args.model, depth=args.depth)
+        except diode_server.Unavailable:
+            pass
+    if text is None:
+        with instrument.stage("subckt"):
+            text = subckts(args.model, args.depth)
+    print (text)
+    if args.stats:
+        instrument.report()
 
 if __name__ == '__main__':
     main()
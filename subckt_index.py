@@ -0,0 +1,221 @@
+#! python3
+r""" subckt_index.py
+
+Index the .SUBCKT blocks of a library and pull out the diode models inside
+them.
+
+SpiceDiode.parse can only skip subckts, so the diode models that vendors
+wrap in a subckt (like DMOD1 in the ZETEX ZXM66P03N8) are lost. One pass of
+SpiceDiode.find_cards over the memory mapped file records every subckt: its
+name, pins, byte range, line range, nested children and the .MODEL D cards
+inside it.
+Only the dot cards are looked at, the bodies in between are jumped over,
+and with wanted only the model cards of those subckts are decoded. The
+models are parsed when they are asked for.
+
+Vendor libraries are not always balanced. A .SUBCKT inside an open block
+is taken as nested only when the open block uses it (its name appears in
+the body so far), otherwise the open block is missing its .ENDS and is
+closed there. An .ENDS with a name closes the blocks up to that name, an
+.ENDS with a name that is not open closes the innermost block. Blocks still
+open at the end of the file are closed there. A block closed without its
+own .ENDS ends after the last diode model it uses; the models after that
+are the next part's and go back to the enclosing level.
+
+    index = SubcktIndex("diodes-inc.txt")
+    index.diodes("ZXM66P03N8")
+"""
+
+import argparse
+import mmap
+import os
+import re
+
+import diodes
+
+parser = argparse.ArgumentParser(description='List the subckts in a library and the diode models inside them.')
+parser.add_argument('subckts', nargs='*', help='The name(s) of the subckt(s) to show, all of them if none are given.')
+parser.add_argument('--model_file', '-f', default=r"E:\eda\diodes\diodes-inc.txt", help='The file to get the subckts from.')
+parser.add_argument('--models', '-m', action='store_true', help='Print the diode models inside each subckt.')
+
+class Subckt():
+    """One .SUBCKT block. Offsets are bytes into the file, end is just after the .ENDS card (or where the block was closed)."""
+    def __init__(self, name, pins, start, linenum, parent=None):
+        self.name = name
+        self.pins = pins
+        self.start = start
+        self.end = start
+        self.linenum = linenum
+        self.last = linenum
+        self.parent = parent
+        self.children = []
+        self.models = {} # name : (start, end, first line, last line)
+        self.closed = False # True when it has its own .ENDS
+    def __repr__(self):
+        return "Subckt({path} {pins}): lines {linenum}-{last}, {n} diode model(s), {c} nested".format(
+            path=self.path, pins=" ".join(self.pins), linenum=self.linenum, last=self.last, n=len(self.models), c=len(self.children))
+    @property
+    def path(self):
+        """The names of the enclosing subckts and this one, joined with '.'."""
+        return self.name if self.parent is None else self.parent.path + "." + self.name
+    def walk(self):
+        """Yield this subckt and every subckt nested in it, depth first."""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+class SubcktIndex():
+    encoding = "latin-1"
+    def __init__(self, path, wanted=None):
+        """Index path, with wanted (a collection of names) only the models inside those subckts are recorded."""
+        self.path = os.path.abspath(path)
+        self._file = open(self.path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        # mmap can not map an empty file
+        self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.subckts = {} # name : Subckt, for every block including nested ones, the last duplicate wins
+        self.top = [] # the outermost blocks in file order
+        self.models = {} # the diode models outside any subckt, name : (start, end, first line, last line)
+        self.parsed = {}
+        self.name_patterns = {} # name : compiled pattern for uses
+        self.scan(wanted)
+    def __repr__(self):
+        return "SubcktIndex({path}): {n} subckts, {t} top level, {m} top level diode models".format(
+            path=self.path, n=len(self.subckts), t=len(self.top), m=len(self.models))
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        self.close()
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self._file.close()
+    def __len__(self):
+        return len(self.subckts)
+    def __contains__(self, name):
+        return name in self.subckts
+    def __iter__(self):
+        return iter(self.subckts)
+    def __getitem__(self, name):
+        return self.subckts[name]
+    def uses(self, block, name, end):
+        """Return True if the body of the open block, up to end, refers to name."""
+        pattern = self.name_patterns.get(name)
+        if pattern is None:
+            pattern = self.name_patterns[name] = re.compile(rb"[\s(]" + re.escape(name.encode(self.encoding)) + rb"(?=[\s)]|$)", re.I | re.M)
+        return pattern.search(self.buffer, block.start, end) is not None
+    def scan(self, wanted=None):
+        wanted = None if wanted is None else set(wanted)
+        buffer = self.buffer
+        count = buffer.count if hasattr(buffer, 'count') else lambda sub, start, end: buffer[start:end].count(sub)
+        stack = [] # (Subckt, record its models)
+        position = 0
+        linenum = 1 # the line number at position
+        def close(block, end, last):
+            block.end, block.last = end, last
+            if block.closed:
+                return
+            # Missing its .ENDS, the block ends with the last diode model it uses. The models
+            # (and subckts) after that belong to the enclosing level.
+            cut = next((record[0] for name, record in block.models.items() if not self.uses(block, name, record[0])), None)
+            if cut is None:
+                return
+            outer = stack[-1] if stack else (None, wanted is None)
+            target = outer[0].models if outer[0] else self.models
+            for name, record in list(block.models.items()):
+                if record[0] >= cut:
+                    del block.models[name]
+                    if outer[1]:
+                        target[name] = record
+            moved = [child for child in block.children if child.start >= cut]
+            block.children = [child for child in block.children if child.start < cut]
+            for child in moved:
+                child.parent = outer[0]
+                (outer[0].children if outer[0] else self.top).append(child)
+            block.end, block.last = cut, block.linenum
+            for _, (start, end, first, last) in block.models.items():
+                block.end, block.last = end, last
+            for child in block.children:
+                if child.end > block.end:
+                    block.end, block.last = child.end, child.last
+        for keyword, start, end in diodes.SpiceDiode.find_cards(buffer):
+            linenum += count(b"\n", position, start)
+            position = start
+            if keyword == 'model':
+                keep = stack[-1][1] if stack else wanted is None
+                if not keep:
+                    continue
+            card = buffer[start:end].decode(self.encoding)
+            line = diodes.SpiceDiode.join_card(card)
+            last = linenum + card.count("\n") - card.endswith("\n")
+            if keyword == 'model':
+                match = diodes.SpiceDiode.re_model_d.match(line)
+                if match:
+                    record = (start, end, linenum, last)
+                    (stack[-1][0].models if stack else self.models)[match.group('name')] = record
+            elif keyword == 'subckt':
+                match = diodes.SpiceDiode.re_subckt.match(line)
+                if not match:
+                    continue
+                name = match.group('name')
+                while stack and not self.uses(stack[-1][0], name, start):
+                    close(stack.pop()[0], start, linenum - 1)
+                parent = stack[-1][0] if stack else None
+                block = Subckt(name, match.group('nodes').split(), start, linenum, parent)
+                if parent is None:
+                    self.top.append(block)
+                else:
+                    parent.children.append(block)
+                self.subckts[name] = block
+                keep = (wanted is None or name in wanted) or (bool(stack) and stack[-1][1])
+                stack.append((block, keep))
+            elif stack:
+                closing = line.split()[1:2]
+                names = [block.name.lower() for block, _ in stack]
+                depth = len(stack) - 1
+                if closing and closing[0].lower() in names:
+                    depth = len(names) - 1 - names[::-1].index(closing[0].lower())
+                while len(stack) > depth + 1:
+                    close(stack.pop()[0], start, linenum - 1)
+                block = stack.pop()[0]
+                block.closed = True
+                close(block, end, last)
+        end = len(buffer)
+        linenum += count(b"\n", position, end) - (end > 0 and buffer[end - 1:end] == b"\n")
+        while stack:
+            close(stack.pop()[0], end, linenum)
+    def body(self, name):
+        """Return the text of the subckt called name, from its .SUBCKT card to its end."""
+        block = self.subckts[name]
+        return self.buffer[block.start:block.end].decode(self.encoding)
+    def diodes(self, name, nested=True):
+        """
+        Return the list of SpiceDiode objects defined inside the subckt called
+        name, and inside the subckts nested in it unless nested is False.
+        """
+        blocks = self.subckts[name].walk() if nested else [self.subckts[name]]
+        return [self.model(block, model) for block in blocks for model in block.models]
+    def model(self, block, name):
+        """Return the SpiceDiode called name inside block, which may be None for the top level models."""
+        key = (block.path if block else None, name)
+        if key not in self.parsed:
+            start, end, first, _ = (block.models if block else self.models)[name]
+            record = self.buffer[start:end].decode(self.encoding)
+            for found, parameters, last in diodes.SpiceDiode.scan(record, False, first - 1):
+                self.parsed[key] = diodes.SpiceDiode(found, parameters, last)
+        return self.parsed[key]
+
+def main():
+    args = parser.parse_args()
+    with SubcktIndex(args.model_file, args.subckts or None) as index:
+        for name in args.subckts or [block.name for block in index.top]:
+            for block in index[name].walk():
+                print (block)
+                if args.models:
+                    for model in block.models:
+                        print (index.model(block, model))
+        if not args.subckts:
+            print (index)
+
+if __name__ == '__main__':
+    main()
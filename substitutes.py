@@ -0,0 +1,166 @@
+#! python3
+r""" substitutes.py
+
+Find the closest behavioural equivalents of a diode model.
+
+Each model becomes a point of log10 IS, RS, CJO, BV, TT, plain N, and the
+forward voltage at a few currents. Every coordinate is scaled to unit
+standard deviation over the library and then multiplied by its weight, so
+the distance is a weighted euclidean distance. The points go in a KD tree
+and a k nearest query only visits the few leaves whose bounding boxes can
+beat the k-th best distance found so far.
+
+    finder = SubstituteFinder(DiodeLibrary.parse("diodes-inc.txt"), weights={"BV": 2})
+    finder.nearest("DI_1N4148W", k=5)
+"""
+
+import argparse
+import heapq
+
+import numpy
+
+import diode_library
+import diodes
+import iv_curves
+import spice_number
+
+parser = argparse.ArgumentParser(description='Find the closest substitutes for a diode model.')
+parser.add_argument('model', help='The name of the diode model to find substitutes for.')
+parser.add_argument('--model_file', '-f', default=r"E:\eda\diodes\diodes-inc.txt", help='The file to get the models from.')
+parser.add_argument('-k', type=int, default=5, help='How many substitutes to show.')
+parser.add_argument('--weight', '-w', nargs='*', default=[], help='Feature weights as FEATURE=weight, e.g. BV=2 Vf@1m=3')
+
+# the log scaled features and the floor (or ceiling for BV) that keeps log10 finite
+log_features = {
+    "IS"    :   1e-20,
+    "RS"    :   1e-4,
+    "CJO"   :   1e-15,
+    "BV"    :   1e4, # BV defaults to 1E100, treat anything above this as the same
+    "TT"    :   1e-12,
+}
+linear_features = ("N",)
+default_currents = ("1m", "100m")
+
+class KDTree():
+    """A KD tree over the rows of points for k nearest neighbour queries."""
+    def __init__(self, points, leaf_size=32):
+        self.points = numpy.asarray(points, dtype=numpy.float64)
+        self.index = numpy.arange(len(self.points))
+        # each node is [start, end, left, right], bounding boxes in lo/hi
+        self.nodes = []
+        lo, hi = [], []
+        stack = [(0, len(self.points), None, None)]
+        while stack:
+            start, end, parent, side = stack.pop()
+            node = len(self.nodes)
+            self.nodes.append([start, end, -1, -1])
+            if parent is not None:
+                self.nodes[parent][side] = node
+            rows = self.points[self.index[start:end]]
+            lo.append(rows.min(axis=0) if len(rows) else numpy.zeros(self.points.shape[1]))
+            hi.append(rows.max(axis=0) if len(rows) else numpy.zeros(self.points.shape[1]))
+            if end - start <= leaf_size:
+                continue
+            dimension = int(numpy.argmax(hi[-1] - lo[-1]))
+            middle = (start + end) // 2
+            part = numpy.argpartition(rows[:, dimension], middle - start)
+            self.index[start:end] = self.index[start:end][part]
+            stack.append((middle, end, node, 3))
+            stack.append((start, middle, node, 2))
+        self.lo = numpy.array(lo)
+        self.hi = numpy.array(hi)
+    def box_distance(self, node, point):
+        gap = numpy.maximum(self.lo[node] - point, 0) + numpy.maximum(point - self.hi[node], 0)
+        return float(numpy.dot(gap, gap))
+    def query(self, point, k=1, exclude=()):
+        """Return a list of (distance, row) for the k rows nearest point, closest first."""
+        point = numpy.asarray(point, dtype=numpy.float64)
+        exclude = set(exclude)
+        best = [] # max heap of (-distance squared, row)
+        queue = [(self.box_distance(0, point), 0)]
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if len(best) == k and distance >= -best[0][0]:
+                break
+            start, end, left, right = self.nodes[node]
+            if left >= 0:
+                for child in (left, right):
+                    heapq.heappush(queue, (self.box_distance(child, point), child))
+                continue
+            rows = self.index[start:end]
+            d = self.points[rows] - point
+            for distance, row in zip(numpy.einsum('ij,ij->i', d, d), rows):
+                if row in exclude:
+                    continue
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, row))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, row))
+        return sorted((float(numpy.sqrt(-d)), int(row)) for d, row in best)
+
+class SubstituteFinder():
+    def __init__(self, library, weights=None, currents=default_currents):
+        self.library = library
+        self.currents = list(currents)
+        self.names = [name for name in log_features] + list(linear_features) + ["Vf@" + c for c in self.currents]
+        raw = self.features(library.columns)
+        self.center = raw.mean(axis=0)
+        scale = raw.std(axis=0)
+        self.scale = numpy.where(scale > 0, scale, 1)
+        weights = {k.upper() : v for k, v in (weights or {}).items()}
+        unknown = set(weights) - set(name.upper() for name in self.names)
+        if unknown:
+            raise ValueError("Unknown feature(s) {unknown}, expected some of {names}".format(unknown=", ".join(sorted(unknown)), names=", ".join(self.names)))
+        self.weights = numpy.array([weights.get(name.upper(), 1.0) for name in self.names])
+        self.tree = KDTree(self.normalize(raw))
+    def __repr__(self):
+        return "SubstituteFinder({n} models, features={names})".format(n=len(self.library), names=" ".join(self.names))
+    def features(self, columns):
+        """Return the (models x features) array of raw feature values for a dict of parameter columns."""
+        features = []
+        for name, limit in log_features.items():
+            values = numpy.asarray(columns[name], dtype=numpy.float64)
+            values = numpy.minimum(values, limit) if name == "BV" else numpy.maximum(values, limit)
+            features.append(numpy.log10(values))
+        for name in linear_features:
+            features.append(numpy.asarray(columns[name], dtype=numpy.float64))
+        currents = spice_number.parse_list(self.currents)
+        vf = iv_curves.iv_voltage(columns, currents)
+        features.extend(numpy.nan_to_num(vf, nan=0.0).T)
+        return numpy.column_stack(features)
+    def normalize(self, raw):
+        return (raw - self.center) / self.scale * self.weights
+    def nearest(self, target, k=5):
+        """
+        Return a list of (name, distance) for the k models nearest target, closest first.
+        target is a model name in the library (which is left out of the results),
+        a SpiceDiode or a dict of parameter values (missing parameters take the defaults).
+        """
+        exclude = ()
+        if isinstance(target, str):
+            row = self.library.row(target)
+            columns = {p : v[row:row + 1] for p, v in self.library.columns.items()}
+            exclude = (row,)
+        elif isinstance(target, dict):
+            columns = diode_library.DiodeLibrary([diodes.SpiceDiode("target", "")]).columns
+            for p, v in target.items():
+                columns[p.upper()][0] = v
+        else:
+            columns = diode_library.DiodeLibrary([target]).columns
+        point = self.normalize(self.features(columns))[0]
+        return [(self.library.names[row], distance) for distance, row in self.tree.query(point, k, exclude)]
+
+def main():
+    args = parser.parse_args()
+    weights = {}
+    for weight in args.weight:
+        feature, value = weight.split("=")
+        weights[feature] = float(value)
+    library = diode_library.DiodeLibrary.parse(args.model_file)
+    finder = SubstituteFinder(library, weights)
+    print ("{0:<20}{1:>10}".format("Model", "Distance"))
+    for name, distance in finder.nearest(args.model, args.k):
+        print ("{0:<20}{1:>10.4f}".format(name, distance))
+
+if __name__ == '__main__':
+    main()
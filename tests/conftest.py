@@ -0,0 +1,15 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+@pytest.fixture
+def test_data(tmp_path):
+    """A copy of test-data.txt in a temporary folder, so caches and indexes are written there."""
+    path = tmp_path / "test-data.txt"
+    shutil.copyfile(os.path.join(root, "test-data.txt"), path)
+    return str(path)
@@ -0,0 +1,21 @@
+import argparse
+
+import pytest
+
+import benchmark
+import diodes
+
+@pytest.mark.parametrize("text, n", [("100", 100), ("1k", 1000), ("2.5k", 2500), ("10M", 10**7), ("10meg", 10**7), ("1G", 10**9)])
+def test_count(text, n):
+    assert benchmark.count(text) == n
+
+@pytest.mark.parametrize("text", ["0", "0.5", "1m2", "ten"])
+def test_bad_count(text):
+    with pytest.raises(argparse.ArgumentTypeError):
+        benchmark.count(text)
+
+def test_synthetic_library(tmp_path):
+    path = str(tmp_path / "synthetic.txt")
+    outside = benchmark.write_library(path, 500, seed=3)
+    with open(path, encoding="latin-1") as f:
+        assert len(list(diodes.SpiceDiode.parse(f))) == outside
@@ -0,0 +1,54 @@
+import io
+
+import numpy
+import pytest
+
+import consonance
+import four_table
+import harmonic_cents
+
+def test_cents_table_matches_closest():
+    degree, cents = harmonic_cents.cents_table(2000)
+    assert len(degree) == len(cents) == 2000
+    for n in range(1, 2001):
+        label, offset = harmonic_cents.closest(n)
+        assert harmonic_cents.degrees[degree[n - 1]] == label, n
+        assert cents[n - 1] == pytest.approx(offset, abs=1e-9), n
+
+def test_weight_end_values(monkeypatch):
+    weights = harmonic_cents.consonance_weights(64)
+    # octaves are exactly in tune
+    assert list(weights[[0, 1, 3, 7, 15, 31, 63]]) == [1] * 7
+    assert numpy.all((weights >= 0) & (weights <= 1))
+    # in tune is the degree's consonance, 50 cents out is nothing, whatever the degree
+    monkeypatch.setattr(harmonic_cents, "cents_table", lambda n: (numpy.array([0, 7, 12, 0, 7]), numpy.array([0.0, 0.0, 0.0, 50.0, -50.0])))
+    assert list(harmonic_cents.consonance_weights(5)) == pytest.approx([1, 0.9, 1, 0, 0], abs=1e-12)
+
+@pytest.fixture
+def table():
+    # one harmonic each: the octave, the fifth (3), the major third (5), the 11th, 49 cents flat of a tritone
+    return four_table.FourierTable([
+        (("T", "T"), 12, 1, [0, 1] + [0] * 9 + [0.01]),
+        (("M", "M"), 12, 1, [0, 1, 0, 0, 0, 0.01] + [0] * 6),
+        (("O", "O"), 12, 1, [0, 1, 0.01] + [0] * 9),
+        (("F", "F"), 12, 1, [0, 1, 0, 0.01] + [0] * 8),
+        (("X", "X"), 12, 1, [0, 1, float("nan")] + [0] * 9), # incomplete, not ranked
+    ])
+
+def test_ranking(table):
+    rows, (consonant, dissonant, share) = consonance.rank(table)
+    assert [table.pairs[row] for row in rows] == [("O", "O"), ("F", "F"), ("M", "M"), ("T", "T")]
+    weights = harmonic_cents.consonance_weights(11)
+    assert list(share[rows]) == pytest.approx([1, weights[2], weights[4], weights[10]])
+    assert share[rows[-1]] < 0.05
+    # the consonant and dissonant parts add up to the THD
+    thd = 100 * numpy.sqrt(numpy.nansum(numpy.square(table.magnitude[:, 2:]), axis=1)) / table.magnitude[:, 1]
+    numpy.testing.assert_allclose(numpy.hypot(consonant, dissonant)[rows], thd[rows])
+
+def test_write_table(table):
+    out = io.StringIO()
+    consonance.write_table(table, out)
+    lines = out.getvalue().splitlines()
+    assert lines[0] == "Rank,Positive,Negative,THD,Consonant,Dissonant,Score"
+    assert [line.split(",")[:3] for line in lines[1:]] == [["1", "O", "O"], ["2", "F", "F"], ["3", "M", "M"], ["4", "T", "T"]]
+    assert lines[1].endswith(",1.0000,0.0000,1.0000")
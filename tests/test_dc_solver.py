@@ -0,0 +1,33 @@
+import numpy
+import pytest
+
+import dc_solver
+import diodes
+import iv_curves
+
+@pytest.fixture
+def library(test_data):
+    return {diode.name : diode for diode in diodes.SpiceDiode.parse(test_data)}
+
+def test_sweep_currents():
+    currents = dc_solver.sweep_currents(0, .001, .00000001)
+    assert len(currents) == 100001
+    assert currents[0] == 0 and currents[-1] == pytest.approx(.001)
+
+def test_one_model_is_its_forward_voltage(library):
+    diode = library["D1N4148"]
+    currents = dc_solver.sweep_currents(0, .001, .00001)
+    v1, curves = dc_solver.dc_sweep([diode], currents)
+    numpy.testing.assert_allclose(curves[0, 1:], iv_curves.iv_voltage([diode], currents[1:])[0], rtol=1e-9)
+    numpy.testing.assert_allclose(v1 - curves[0], currents * 1e3, rtol=1e-9)
+    assert abs(curves[0, 0]) < 1e-9
+
+def test_branches_share_the_current(library):
+    models = [library[name] for name in ("D1N4148", "1N5818", "UF4007")]
+    currents = dc_solver.sweep_currents(0, .001, .00005)
+    v1, curves = dc_solver.dc_sweep(models, currents)
+    branch = (v1 - curves) / 1e3
+    numpy.testing.assert_allclose(branch.sum(axis=0), currents, rtol=1e-9, atol=1e-15)
+    for diode, v, i in zip(models, curves, branch):
+        # each branch is the diode at its own share of I1
+        numpy.testing.assert_allclose(iv_curves.iv_current([diode], v)[0], i, rtol=1e-6, atol=1e-15)
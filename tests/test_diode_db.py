@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+import diode_db
+import diodes
+
+def append_model(path, name):
+    with open(path, "a") as f:
+        f.write("\n.MODEL {name} D (IS=1n N=1.5 BV=75)\n".format(name=name))
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000))
+
+def count(db):
+    return db.connection.execute("SELECT COUNT(*) FROM models").fetchone()[0]
+
+@pytest.fixture
+def db(tmp_path):
+    with diode_db.DiodeDatabase(str(tmp_path / "diodes.db")) as db:
+        yield db
+
+def test_load_and_round_trip(db, test_data):
+    parsed = list(diodes.SpiceDiode.parse(test_data))
+    assert db.load(test_data) == len(parsed)
+    assert [str(db.diode(row)) for row in db.select()] == [str(diode) for diode in parsed]
+    assert db.load(test_data) is None # unchanged
+    append_model(test_data, "APPENDED")
+    assert db.load(test_data) == len(parsed) + 1
+    assert count(db) == len(parsed) + 1
+    assert db.model("APPENDED").BV == 75
+
+def test_query(db, test_data):
+    db.load(test_data)
+    parsed = list(diodes.SpiceDiode.parse(test_data))
+    assert sorted(db.diode(row).name for row in db.query("BV>=50")) == sorted(d.name for d in parsed if d.BV >= 50)
+
+def failing_rows(db, after):
+    rows = db.rows
+    def fail(*args):
+        for n, row in enumerate(rows(*args)):
+            if n == after:
+                raise RuntimeError("interrupted")
+            yield row
+    return fail
+
+def test_failed_first_load_leaves_nothing(db, test_data, monkeypatch):
+    monkeypatch.setattr(db, "rows", failing_rows(db, 3))
+    with pytest.raises(RuntimeError):
+        db.load(test_data, batch=2)
+    assert count(db) == 0
+    assert not db.loaded(test_data)
+
+def test_failed_reload_keeps_the_old_library(db, test_data, monkeypatch):
+    n = db.load(test_data)
+    before = [str(db.diode(row)) for row in db.select()]
+    append_model(test_data, "APPENDED")
+    monkeypatch.setattr(db, "rows", failing_rows(db, 3))
+    with pytest.raises(RuntimeError):
+        db.load(test_data, batch=2)
+    assert [str(db.diode(row)) for row in db.select()] == before
+    assert not db.loaded(test_data)
+    monkeypatch.undo()
+    assert db.load(test_data) == n + 1
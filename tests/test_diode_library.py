@@ -0,0 +1,64 @@
+import numpy
+import pytest
+
+import diode_library
+import diodes
+
+@pytest.fixture
+def models(test_data):
+    return list(diodes.SpiceDiode.parse(test_data))
+
+@pytest.fixture
+def library(models):
+    return diode_library.DiodeLibrary(models)
+
+def test_columns_match_the_diodes(models, library):
+    assert len(library) == len(models)
+    assert set(library.columns) == set(diodes.SpiceDiode.spice_parameters)
+    assert set(library.info) == set(diodes.SpiceDiode.infomational_parameters)
+    for row, diode in enumerate(models):
+        assert library.names[row] == diode.name
+        assert library.linenums[row] == diode.linenum
+        for p, column in library.columns.items():
+            assert column[row] == getattr(diode, p), (diode.name, p)
+        for p, column in library.info.items():
+            assert column[row] == getattr(diode, p), (diode.name, p)
+
+def test_rows_read_like_the_diodes(models, library):
+    parameters = list(diodes.SpiceDiode.spice_parameters) + list(diodes.SpiceDiode.infomational_parameters)
+    for diode, row, copy in zip(models, library, library.to_diodes()):
+        assert (row.name, row.linenum) == (copy.name, copy.linenum) == (diode.name, diode.linenum)
+        for p in parameters:
+            assert getattr(row, p) == getattr(copy, p) == getattr(diode, p), (diode.name, p)
+        assert row.forward_voltage(1e-3) == diode.forward_voltage(1e-3)
+
+def test_names_row_and_getitem(models, library):
+    names = [diode.name for diode in models]
+    assert list(library.names) == names
+    for name in set(names):
+        row = library.row(name)
+        assert library.names[row] == name
+        assert row == max(i for i, n in enumerate(names) if n == name) # the last duplicate wins
+        assert library[name].name == name and library[name].row == row
+        assert name in library
+    assert "NO_SUCH_MODEL" not in library
+    with pytest.raises(KeyError):
+        library["NO_SUCH_MODEL"]
+    with pytest.raises(KeyError):
+        library.row("NO_SUCH_MODEL")
+    assert library[0].name == names[0]
+    assert library[-1].name == names[-1]
+    assert library[numpy.int64(1)].name == names[1]
+    with pytest.raises(IndexError):
+        library[len(names)]
+    assert list(library.rows(names[:2])) == [library.row(name) for name in names[:2]]
+
+def test_select_copies(library):
+    mask = library.columns["BV"] >= 100
+    selected = library[mask]
+    assert isinstance(selected, diode_library.DiodeLibrary)
+    assert list(selected.names) == list(library.names[mask])
+    assert list(library[[2, 0]].names) == [library.names[2], library.names[0]]
+    selected[0].IS = 1.0
+    assert library.columns["IS"][numpy.flatnonzero(mask)[0]] != 1.0
+    assert selected.columns["IS"][0] == 1.0
@@ -0,0 +1,18 @@
+import diode_query
+import diodes
+
+def test_parse_latin1(test_data, tmp_path):
+    with open(test_data, "rb") as f:
+        buffer = f.read()
+    path = str(tmp_path / "latin1.txt")
+    with open(path, "wb") as f:
+        f.write("* \xb5A \xb0C vendor comment\n".encode("latin-1") + buffer)
+    index = diode_query.DiodeIndex.parse(path)
+    assert len(index.library) == len(list(diodes.SpiceDiode.parse(test_data)))
+
+def test_query_matches_a_scan(test_data):
+    index = diode_query.DiodeIndex.parse(test_data)
+    parsed = list(diodes.SpiceDiode.parse(test_data))
+    for query, test in (("BV>=50", lambda d: d.BV >= 50), ("BV>=50 AND RS<1", lambda d: d.BV >= 50 and d.RS < 1), ("N>1.5", lambda d: d.N > 1.5)):
+        rows = index.query(query)
+        assert sorted(index.library.names[row] for row in rows) == sorted(d.name for d in parsed if test(d)), query
@@ -0,0 +1,154 @@
+import importlib
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import diode_server
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def server(tmp_path):
+    server = diode_server.DiodeServer(str(tmp_path / "server.sock"))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_no_socket(tmp_path):
+    with pytest.raises(diode_server.Unavailable):
+        diode_server.request("ping", str(tmp_path / "missing.sock"))
+
+def test_disabled():
+    with pytest.raises(diode_server.Unavailable):
+        diode_server.request("ping", "")
+
+def test_hung_server(tmp_path):
+    path = str(tmp_path / "hung.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        listener.bind(path)
+        listener.listen(1) # never accepts or answers
+        with pytest.raises(diode_server.Unavailable):
+            diode_server.request("ping", path, timeout=0.2)
+
+def test_connection_closed(tmp_path):
+    path = str(tmp_path / "closing.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        listener.bind(path)
+        listener.listen(1)
+        def close():
+            connection, _ = listener.accept()
+            connection.close()
+        thread = threading.Thread(target=close)
+        thread.start()
+        with pytest.raises(diode_server.Unavailable):
+            diode_server.request("ping", path, timeout=5)
+        thread.join()
+
+def test_requests(server, test_data):
+    path = server.server_address
+    assert diode_server.request("ping", path) == "pong"
+    diode_test = importlib.import_module("diode-test")
+    import lazy_library
+    with lazy_library.LazyLibrary(test_data) as library:
+        names = list(library)[:2]
+        listing = diode_test.listing(names, library)
+    assert diode_server.request("netlist", path, model_file=test_data, models=names) == listing + "\n"
+    with pytest.raises(KeyError):
+        diode_server.request("models", path, model_file=test_data, models=["NO_SUCH_MODEL"])
+    with pytest.raises(ValueError):
+        diode_server.request("no_such_op", path)
+
+def test_library_change_is_picked_up(server, test_data):
+    path = server.server_address
+    with pytest.raises(KeyError):
+        diode_server.request("models", path, model_file=test_data, models=["APPENDED"])
+    with open(test_data, "a") as f:
+        f.write("\n.MODEL APPENDED D (IS=1n N=1.5)\n")
+    st = os.stat(test_data)
+    os.utime(test_data, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000))
+    model, = diode_server.request("models", path, model_file=test_data, models=["APPENDED"])
+    assert model.startswith(".MODEL APPENDED D")
+
+def test_parse_does_not_hold_the_lock(tmp_path, test_data, monkeypatch):
+    other = str(tmp_path / "other.txt")
+    shutil.copyfile(test_data, other)
+    started, release = threading.Event(), threading.Event()
+    class SlowLibrary(diode_server.Library):
+        def __init__(self, path):
+            if path == os.path.abspath(test_data):
+                started.set()
+                release.wait(10)
+            super().__init__(path)
+    monkeypatch.setattr(diode_server, "Library", SlowLibrary)
+    server = diode_server.DiodeServer(str(tmp_path / "server.sock"))
+    try:
+        slow = threading.Thread(target=server.library, args=(test_data,))
+        slow.start()
+        assert started.wait(10)
+        # another library and the stats are served while test_data is parsed
+        answers = []
+        request = threading.Thread(target=lambda: answers.append(server.answer({"op" : "models", "model_file" : other, "models" : ["D1N4148"]})))
+        request.start()
+        request.join(5)
+        assert answers and answers[0][0].startswith(".MODEL D1N4148")
+        release.set()
+        request.join(10)
+        slow.join(10)
+        library = server.library(test_data)
+        assert server.library(test_data) is library
+        st = os.stat(test_data)
+        os.utime(test_data, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000))
+        assert server.library(test_data) is not library
+        assert server.stats["reloads"] == 1
+    finally:
+        release.set()
+        server.server_close()
+
+def run(script, *args, socket_path):
+    environment = dict(os.environ, DIODE_SERVER=socket_path)
+    return subprocess.run([sys.executable, os.path.join(root, script)] + list(args), env=environment,
+        capture_output=True, text=True, check=True).stdout
+
+@pytest.mark.parametrize("script, args", [
+    ("diode-test.py", ["D1N4148"]),
+    ("subckt.py", ["D1N4148", "--depth", "2"]),
+])
+def test_cli_falls_back(tmp_path, test_data, script, args):
+    if script == "diode-test.py":
+        args = args + ["-f", test_data]
+    local = run(script, *args, "--local", socket_path="")
+    assert run(script, *args, socket_path=str(tmp_path / "missing.sock")) == local
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        hung = str(tmp_path / "hung.sock")
+        listener.bind(hung)
+        listener.listen(1)
+        # a stale socket file with nothing listening
+    assert run(script, *args, socket_path=hung) == local
+
+def test_cli_uses_server(server, test_data):
+    args = ["D1N4148", "-f", test_data]
+    assert run("diode-test.py", *args, socket_path=server.server_address) == run("diode-test.py", *args, "--local", socket_path="")
+    assert server.stats["netlist"] == 1
+
+@pytest.mark.parametrize("script, args", [
+    ("diode-test.py", ["D1N4148"]),
+    ("subckt.py", ["D1N4148", "--depth", "2"]),
+])
+def test_cli_stats(tmp_path, test_data, script, args):
+    if script == "diode-test.py":
+        args = args + ["-f", test_data]
+    environment = dict(os.environ, DIODE_SERVER=str(tmp_path / "missing.sock"))
+    result = subprocess.run([sys.executable, os.path.join(root, script)] + args + ["--stats"], env=environment,
+        capture_output=True, text=True, check=True)
+    assert result.stdout == run(script, *args, "--local", socket_path="")
+    stats = json.loads(result.stderr)
+    assert stats["counters"]["server.unavailable"] == 1
+    assert "server" in stats["timings"]
@@ -0,0 +1,64 @@
+import math
+
+import numpy
+import pytest
+
+import diodes
+import distortion
+import four_table
+import iv_curves
+
+vt = diodes.SpiceDiode.thermal_voltage()
+
+positive = diodes.SpiceDiode("P", "IS=1e-14 N=1.5 RS=2")
+negative = diodes.SpiceDiode("NEG", "IS=1e-9 N=1.05 RS=0.5")
+
+def bisect(f, lo, hi):
+    """The root of an increasing f in [lo, hi]."""
+    while True:
+        middle = (lo + hi) / 2
+        if middle in (lo, hi):
+            return middle
+        if f(middle) > 0:
+            hi = middle
+        else:
+            lo = middle
+
+def diode_current(diode, v):
+    """The current of one ideal diode with RS at terminal voltage v."""
+    def current(vd):
+        return diode.IS * (math.exp(vd / (diode.N * vt)) - 1)
+    vd = bisect(lambda vd: vd + diode.RS * current(vd) - v, min(v, 0), max(v, 0))
+    return current(vd)
+
+def scalar_clip(vin, up, down, resistance, rf):
+    """V(pos) for one input voltage, solved on the chain voltage u = V(pos) - V(mid)."""
+    def net(u):
+        return diode_current(positive, u / up) - diode_current(negative, -u / down)
+    u = bisect(lambda u: u + (resistance + rf) * net(u) - vin, -abs(vin), abs(vin))
+    return vin - resistance * net(u)
+
+@pytest.mark.parametrize("up, down, rf", [(1, 1, 0), (2, 1, 10), (1, 3, 0)])
+def test_clip_matches_a_scalar_solve(up, down, rf):
+    vin = numpy.linspace(-3, 3, 21)[numpy.newaxis, :]
+    v = distortion.clip(iv_curves.parameters([positive]), iv_curves.parameters([negative]), up, down, vin, 1e3, rf)
+    expected = [scalar_clip(x, up, down, 1e3, rf) for x in vin[0]]
+    numpy.testing.assert_allclose(v[0], expected, rtol=1e-7, atol=1e-12)
+
+def test_spectrum_of_known_waveform():
+    t = numpy.arange(256) / 256
+    wave = 0.5 + 2 * numpy.sin(2 * numpy.pi * t) + 0.2 * numpy.sin(3 * 2 * numpy.pi * t)
+    magnitude, phase = distortion.spectrum(wave[numpy.newaxis, :], 5)
+    numpy.testing.assert_allclose(magnitude[0], [0.5, 2, 0, 0.2, 0], atol=1e-12)
+    assert phase[0, 1] == pytest.approx(0, abs=1e-9) and phase[0, 3] == pytest.approx(0, abs=1e-9)
+    assert distortion.thd(magnitude)[0] == pytest.approx(10)
+
+def test_four_text_round_trip():
+    magnitude, phase, thd = distortion.analyze([positive, negative], [negative, positive], amplitude=2, harmonics=11)
+    for m, p, t in zip(magnitude, phase, thd):
+        fa = four_table.FourierAnalysis("P__NEG.four", distortion.four_text(m, p, t))
+        assert fa.n == 11
+        assert fa.thd == pytest.approx(t, rel=1e-5)
+        assert [fa.harmonics[k].Magnitude for k in range(11)] == pytest.approx(m.tolist(), rel=1e-6, abs=1e-300)
+        assert [fa.harmonics[k].Phase for k in range(11)] == pytest.approx(p.tolist(), abs=1e-6)
+        assert fa.harmonic_distortion() == pytest.approx(t, rel=1e-6)
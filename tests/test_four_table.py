@@ -0,0 +1,92 @@
+import math
+import os
+
+import numpy
+import pytest
+
+import four_table
+
+def four_text(magnitudes, thd=1.5):
+    lines = ["Fourier analysis for v(out):", "  No. Harmonics: {n}, THD: {thd} %, Gridsize: 200, Interpolation Degree: 1".format(n=len(magnitudes), thd=thd), ""]
+    for k, magnitude in enumerate(magnitudes):
+        lines.append(" {k:<8} {frequency:<8} {magnitude:e} 0.0 {norm:e} 0.0 ".format(k=k, frequency=1000 * k, magnitude=magnitude, norm=magnitude / magnitudes[1]))
+    return "\n".join(lines) + "\n"
+
+def write_four(folder, positive, negative, magnitudes):
+    path = os.path.join(folder, "{positive}__{negative}.four".format(positive=positive, negative=negative))
+    with open(path, "w") as f:
+        f.write(four_text(magnitudes))
+    return path
+
+@pytest.fixture
+def folder(tmp_path):
+    write_four(tmp_path, "A", "A", [0.0, 1.0, 0.1, 0.05, 0.01])
+    write_four(tmp_path, "A", "B", [0.0, 2.0, 0.2, 0.3, 0.02])
+    write_four(tmp_path, "B", "B", [0.0, 1.0, 0.3, 0.1, 0.03])
+    return str(tmp_path)
+
+def test_harmonic_distortion(folder):
+    fa = four_table.FourierAnalysis(os.path.join(folder, "A__A.four"))
+    assert fa.n == 5
+    assert fa.harmonic_distortion(3) == pytest.approx(100 * math.sqrt(0.1**2 + 0.05**2))
+    assert fa.harmonic_distortion() == pytest.approx(100 * math.sqrt(0.1**2 + 0.05**2 + 0.01**2))
+
+def test_load_table(folder):
+    table, cache = four_table.load_table(folder, ["A", "B"], workers=1)
+    assert table.pairs == [("A", "A"), ("B", "B"), ("A", "B")]
+    assert cache.stats == {"hits" : 0, "parsed" : 3, "failed" : 0}
+    fa = four_table.FourierAnalysis(os.path.join(folder, "A__B.four"))
+    numpy.testing.assert_allclose(table.cumulative[2], fa.cumulative)
+    assert table.is_close(2, 3).tolist() == [False, False, True]
+    analyses = [four_table.FourierAnalysis(os.path.join(folder, "{0}__{1}.four".format(*pair))) for pair in table.pairs]
+    assert [four_table.is_close(fa, 2, 3) for fa in analyses] == [False, False, True]
+
+def test_cache_parses_only_changed_files(folder):
+    first, _ = four_table.load_table(folder, ["A", "B"], workers=1)
+    table, cache = four_table.load_table(folder, ["A", "B"], workers=1)
+    assert cache.stats == {"hits" : 3, "parsed" : 0, "failed" : 0}
+    numpy.testing.assert_array_equal(table.magnitude, first.magnitude)
+    write_four(folder, "B", "B", [0.0, 1.0, 0.5, 0.1, 0.03, 0.01])
+    table, cache = four_table.load_table(folder, ["A", "B"], workers=1)
+    assert cache.stats == {"hits" : 2, "parsed" : 1, "failed" : 0}
+    assert table.n.tolist() == [5, 6, 5]
+    assert table.magnitude[1, 2] == 0.5
+
+def test_cache_rebuild_and_bad_files(folder):
+    four_table.load_table(folder, ["A", "B"], workers=1)
+    with open(os.path.join(folder, "A__B.four"), "w") as f:
+        f.write("not a fourier analysis\n")
+    table, cache = four_table.load_table(folder, ["A", "B"], workers=1, rebuild=True)
+    assert cache.stats == {"hits" : 0, "parsed" : 2, "failed" : 1}
+    assert table.pairs == [("A", "A"), ("B", "B")]
+    # the failure is cached too, so the file is not parsed again until it changes
+    table, cache = four_table.load_table(folder, ["A", "B"], workers=1)
+    assert cache.stats == {"hits" : 3, "parsed" : 0, "failed" : 0}
+
+def test_process_pool_matches(folder):
+    serial, _ = four_table.load_table(folder, ["A", "B"], workers=1, rebuild=True)
+    pooled, cache = four_table.load_table(folder, ["A", "B"], workers=2, rebuild=True)
+    assert cache.stats["parsed"] == 3
+    assert pooled.pairs == serial.pairs
+    numpy.testing.assert_array_equal(pooled.magnitude, serial.magnitude)
+
+def test_cache_drops_deleted_files(folder):
+    four_table.load_table(folder, ["A", "B"], workers=1)
+    write_four(folder, "C", "C", [0.0, 1.0, 0.2, 0.1, 0.02])
+    four_table.load_table(folder, ["C"], workers=1)
+    os.remove(os.path.join(folder, "A__B.four"))
+    table, cache = four_table.load_table(folder, ["A", "B"], workers=1)
+    assert cache.stats == {"hits" : 2, "parsed" : 0, "failed" : 0}
+    assert table.pairs == [("A", "A"), ("B", "B")]
+    # rewritten without the deleted file, the other diode list's file is kept
+    cache = four_table.FourCache(folder)
+    cache.read()
+    assert sorted(cache.entries) == ["A__A.four", "B__B.four", "C__C.four"]
+
+def test_unwritable_cache_still_loads(folder, monkeypatch):
+    # the cache path is inside a .four file, so every write fails
+    monkeypatch.setattr(four_table.FourCache, "file_name", os.path.join("A__A.four", "four_table.cache"))
+    for _ in range(2):
+        table, cache = four_table.load_table(folder, ["A", "B"], workers=1)
+        assert cache.stats == {"hits" : 0, "parsed" : 3, "failed" : 0}
+        assert table.pairs == [("A", "A"), ("B", "B"), ("A", "B")]
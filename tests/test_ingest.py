@@ -0,0 +1,102 @@
+import gzip
+import os
+import shutil
+
+import pytest
+
+import diodes
+import ingest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def models(diode_list):
+    return [(diode.name, diode.linenum, str(diode)) for diode in diode_list]
+
+def tricky_library(path, n=60):
+    """Long + continued models with subckts (and the models in them) between them."""
+    lines = []
+    for i in range(n):
+        lines.append("* part {i}".format(i=i))
+        lines.append(".model D{i} D(IS={i}n".format(i=i + 1))
+        lines.extend("+ N=1.{k}".format(k=k) for k in range(5))
+        lines.append("+ RS={i})".format(i=i))
+        if i % 7 == 0:
+            lines.append(".SUBCKT S{i} 1 2".format(i=i))
+            lines.append("D1 1 2 DS{i}".format(i=i))
+            lines.append(".model DS{i} D(IS=1p".format(i=i))
+            lines.append("+ N=2)")
+            lines.append(".model D{i} D(IS=9)".format(i=i))
+            lines.append(".ENDS")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+@pytest.mark.parametrize("chunk_size", [50, 333, 1000, 4096])
+def test_chunks_match_one_pass(tmp_path, chunk_size):
+    path = str(tmp_path / "tricky.txt")
+    tricky_library(path)
+    spans = ingest.chunks(path, chunk_size)
+    assert len(spans) > 1
+    with open(path, "rb") as f:
+        buffer = f.read()
+    for _, start, end, linenum in spans:
+        # never inside a + card or a subckt
+        assert not buffer[start:end].lstrip().startswith(b"+")
+        assert buffer[:start].count(b"\n") == linenum
+    chunked = [diode for span in spans for diode in ingest.parse_chunk(span)]
+    assert models(chunked) == models(diodes.SpiceDiode.parse(path))
+    assert {diode.source for diode in chunked} == {path}
+
+def test_ingest_matches_one_pass(tmp_path):
+    path = str(tmp_path / "diodes-inc.txt")
+    shutil.copyfile(os.path.join(root, "diodes-inc.txt"), path)
+    merged, duplicates = ingest.ingest([str(tmp_path)], policy="last", workers=2, chunk_size=100000)
+    expected = {diode.name : diode for diode in diodes.SpiceDiode.parse(path)}
+    assert len(ingest.chunks(path, 100000)) > 5
+    assert sorted(models(merged)) == sorted(models(expected.values()))
+
+def test_compressed_file_is_one_span(tmp_path, test_data):
+    gz_path = test_data + ".gz"
+    with open(test_data, "rb") as f, gzip.open(gz_path, "wb") as out:
+        out.write(f.read())
+    assert ingest.chunks(gz_path, 10) == [(gz_path, None)]
+    assert models(ingest.parse_chunk((gz_path, None))) == models(diodes.SpiceDiode.parse(test_data))
+
+def libraries(tmp_path, second="IS=2n"):
+    a = tmp_path / "a.txt"
+    b = tmp_path / "b.txt"
+    a.write_text(".model ONE D(IS=1n)\n.model TWO D(IS=1n)\n")
+    b.write_text(".model TWO D({second})\n.model THREE D(IS=3n)\n".format(second=second))
+    return [ingest.parse_chunk((str(path), 0, os.path.getsize(path), 0)) for path in (a, b)]
+
+def names_and_is(diode_list):
+    return [(diode.name, pytest.approx(diode.IS)) for diode in diode_list]
+
+def test_policy_first(tmp_path):
+    merged, duplicates = ingest.merge(libraries(tmp_path), "first")
+    assert names_and_is(merged) == [("ONE", 1e-9), ("TWO", 1e-9), ("THREE", 3e-9)]
+    (name, kept, dropped), = duplicates
+    assert name == "TWO" and kept.source.endswith("a.txt") and dropped.source.endswith("b.txt")
+
+def test_policy_last(tmp_path):
+    merged, duplicates = ingest.merge(libraries(tmp_path), "last")
+    assert names_and_is(merged) == [("ONE", 1e-9), ("TWO", 2e-9), ("THREE", 3e-9)]
+    (name, kept, dropped), = duplicates
+    assert kept.source.endswith("b.txt") and dropped.source.endswith("a.txt")
+
+def test_policy_error(tmp_path):
+    with pytest.raises(ValueError, match="TWO"):
+        ingest.merge(libraries(tmp_path), "error")
+    # identical duplicates are not an error
+    merged, duplicates = ingest.merge(libraries(tmp_path, second="IS=1n"), "error")
+    assert [diode.name for diode in merged] == ["ONE", "TWO", "THREE"]
+    assert len(duplicates) == 1
+
+def test_policy_rename(tmp_path):
+    lists = libraries(tmp_path) + [libraries(tmp_path)[0][1:2]]
+    merged, duplicates = ingest.merge(lists, "rename")
+    assert names_and_is(merged) == [("ONE", 1e-9), ("TWO", 1e-9), ("TWO~2", 2e-9), ("THREE", 3e-9), ("TWO~3", 1e-9)]
+    assert [name for name, _, _ in duplicates] == ["TWO", "TWO"]
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        ingest.merge([], "newest")
@@ -0,0 +1,41 @@
+import math
+
+import numpy
+import pytest
+
+import diodes
+import iv_curves
+
+currents = [1e-6, 1e-3, 0.1, 1.0]
+
+@pytest.fixture
+def library(test_data):
+    return list(diodes.SpiceDiode.parse(test_data))
+
+def test_ideal_diode_matches_forward_voltage():
+    diode = diodes.SpiceDiode("IDEAL", "IS=1e-14 N=1.5")
+    vf = iv_curves.forward_voltage([diode], 1e-3)[0]
+    assert vf == pytest.approx(diode.forward_voltage(1e-3), rel=1e-9)
+
+def test_series_resistance():
+    diode = diodes.SpiceDiode("RS", "IS=1e-14 N=1.5 RS=2")
+    vt = diodes.SpiceDiode.thermal_voltage()
+    for current, v in zip(currents, iv_curves.iv_voltage([diode], currents)[0]):
+        assert v == pytest.approx(1.5 * vt * math.log1p(current / 1e-14) + current * 2, rel=1e-9)
+
+def test_current_and_voltage_are_inverse(library):
+    voltages = iv_curves.iv_voltage(library, currents)
+    for diode, row in zip(library, voltages):
+        numpy.testing.assert_allclose(iv_curves.iv_current([diode], row)[0], currents, rtol=1e-6)
+
+def test_vectorized_matches_one_model_at_a_time(library):
+    voltages = iv_curves.iv_voltage(library, currents)
+    for diode, row in zip(library, voltages):
+        numpy.testing.assert_allclose(iv_curves.iv_voltage([diode], currents)[0], row, rtol=1e-12)
+    assert numpy.all(numpy.diff(voltages, axis=1) > 0)
+
+def test_reverse_breakdown():
+    diode = diodes.SpiceDiode("ZENER", "IS=1e-14 BV=5.1 IBV=1m")
+    v = iv_curves.iv_voltage([diode], [-1e-3, -1e-2])[0]
+    assert -5.2 < v[1] < v[0] < -5.0
+    numpy.testing.assert_allclose(iv_curves.iv_current([diode], v)[0], [-1e-3, -1e-2], rtol=1e-6)
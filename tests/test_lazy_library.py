@@ -0,0 +1,55 @@
+import os
+
+import diodes
+import lazy_library
+
+def reference(path):
+    # the last duplicate wins, like the index
+    return {diode.name : (diode.linenum, str(diode)) for diode in diodes.SpiceDiode.parse(path)}
+
+def test_lookup(test_data):
+    expected = reference(test_data)
+    with lazy_library.LazyLibrary(test_data) as library:
+        assert set(library) == set(expected)
+        for name, model in expected.items():
+            assert (library[name].linenum, str(library[name])) == model
+
+def test_crlf(test_data, tmp_path):
+    expected = reference(test_data)
+    with open(test_data, "rb") as f:
+        buffer = f.read().replace(b"\n", b"\r\n")
+    path = str(tmp_path / "crlf.txt")
+    with open(path, "wb") as f:
+        f.write(buffer)
+    with lazy_library.LazyLibrary(path) as library:
+        assert set(library) == set(expected)
+        for name, model in expected.items():
+            assert (library[name].linenum, str(library[name])) == model
+
+def test_index_is_reused_and_rebuilt(test_data):
+    with lazy_library.LazyLibrary(test_data) as library:
+        names = set(library)
+    assert os.path.exists(test_data + lazy_library.LazyLibrary.suffix)
+    with open(test_data, "a") as f:
+        f.write("\n.MODEL APPENDED D (IS=1n N=1.5)\n")
+    st = os.stat(test_data)
+    os.utime(test_data, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000))
+    with lazy_library.LazyLibrary(test_data) as library:
+        assert set(library) == names | {"APPENDED"}
+        assert library["APPENDED"].N == 1.5
+
+def test_subckt_index_crlf(tmp_path):
+    import subckt_index
+    source = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "diodes_subckts.txt")
+    with open(source, "rb") as f:
+        buffer = f.read().replace(b"\r\n", b"\n")
+    paths = []
+    for name, text in (("lf.txt", buffer), ("crlf.txt", buffer.replace(b"\n", b"\r\n"))):
+        paths.append(str(tmp_path / name))
+        with open(paths[-1], "wb") as f:
+            f.write(text)
+    def blocks(path):
+        with subckt_index.SubcktIndex(path) as index:
+            return ({name : (block.linenum, block.last, sorted(block.models)) for name, block in index.subckts.items()}, sorted(index.models))
+    lf, crlf = blocks(paths[0]), blocks(paths[1])
+    assert lf[0] and crlf == lf
@@ -0,0 +1,118 @@
+import os
+import pickle
+
+import diodes
+import library_cache
+
+def models(diode_list):
+    return [(diode.name, diode.linenum, str(diode)) for diode in diode_list]
+
+def parsed(path):
+    return models(diodes.SpiceDiode.parse(path))
+
+def bump_mtime(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+def write(path, text, mode="a"):
+    with open(path, mode, encoding="latin-1", newline="") as f:
+        f.write(text)
+    bump_mtime(path)
+
+def test_miss_then_hit(test_data):
+    cache = library_cache.LibraryCache(test_data)
+    first = cache.load()
+    assert models(first) == parsed(test_data)
+    assert os.path.exists(test_data + ".cache")
+    cache = library_cache.LibraryCache(test_data)
+    assert models(cache.load()) == parsed(test_data)
+    assert cache.stats == {"hits" : 1, "misses" : 0, "refreshes" : 0}
+
+def test_touched(test_data):
+    library_cache.load(test_data)
+    bump_mtime(test_data)
+    cache = library_cache.LibraryCache(test_data)
+    cache.load()
+    assert cache.stats["hits"] == 1
+    # the new mtime was saved, so the next load does not hash the file again
+    with open(test_data + ".cache", "rb") as f:
+        assert pickle.load(f)["mtime"] == os.stat(test_data).st_mtime_ns
+
+def test_append_refreshes(test_data):
+    library_cache.load(test_data)
+    write(test_data, "\n.model APPENDED D(IS=1n\n+ N=1.5)\n")
+    cache = library_cache.LibraryCache(test_data)
+    refreshed = cache.load()
+    assert cache.stats["refreshes"] == 1
+    assert models(refreshed) == parsed(test_data)
+    assert refreshed[-1].name == "APPENDED"
+
+def test_append_continues_last_model(test_data):
+    write(test_data, ".model LAST D(IS=1n\n")
+    assert library_cache.load(test_data)[-1].N == 1
+    # + lines added to the last card of the cached contents change that model
+    write(test_data, "+ N=2)\n")
+    cache = library_cache.LibraryCache(test_data)
+    refreshed = cache.load()
+    assert cache.stats["refreshes"] == 1
+    assert models(refreshed) == parsed(test_data)
+    assert refreshed[-1].name == "LAST" and refreshed[-1].N == 2
+
+def test_rewrite_misses(test_data):
+    library_cache.load(test_data)
+    with open(test_data, encoding="latin-1") as f:
+        text = f.read()
+    write(test_data, text.replace("D1N4148", "D1N4148X"), "w")
+    cache = library_cache.LibraryCache(test_data)
+    diode_list = cache.load()
+    assert cache.stats["misses"] == 1
+    assert models(diode_list) == parsed(test_data)
+    assert "D1N4148X" in [diode.name for diode in diode_list]
+
+def test_truncate_misses(test_data):
+    library_cache.load(test_data)
+    with open(test_data, encoding="latin-1") as f:
+        text = f.read()
+    write(test_data, text[:len(text) // 2], "w")
+    cache = library_cache.LibraryCache(test_data)
+    assert models(cache.load()) == parsed(test_data)
+    assert cache.stats["misses"] == 1
+
+def test_bad_cache_misses(test_data):
+    with open(test_data + ".cache", "wb") as f:
+        f.write(b"not a pickle")
+    cache = library_cache.LibraryCache(test_data)
+    assert models(cache.load()) == parsed(test_data)
+    assert cache.stats["misses"] == 1
+    entry = cache.read()
+    entry["version"] = library_cache.CACHE_VERSION - 1
+    cache.write(entry)
+    cache = library_cache.LibraryCache(test_data)
+    cache.load()
+    assert cache.stats["misses"] == 1
+
+def test_skip_subckt_is_part_of_the_key(test_data):
+    library_cache.load(test_data)
+    cache = library_cache.LibraryCache(test_data, skip_subckt=False)
+    assert models(cache.load()) == models(diodes.SpiceDiode.parse(test_data, skip_subckt=False))
+    assert cache.stats["misses"] == 1
+
+def test_unwritable_cache_falls_back_to_parsing(test_data, monkeypatch):
+    # the cache path is inside the library file, so every write fails
+    monkeypatch.setattr(library_cache.LibraryCache, "suffix", os.sep + "library.cache")
+    assert models(library_cache.load(test_data)) == parsed(test_data)
+    write(test_data, "\n.model APPENDED D(IS=1n)\n")
+    assert models(library_cache.load(test_data)) == parsed(test_data)
+
+def test_instrument_counts(test_data):
+    import instrument
+    instrument.enable()
+    try:
+        library_cache.load(test_data)
+        library_cache.load(test_data)
+        write(test_data, "\n.model APPENDED D(IS=1n)\n")
+        library_cache.load(test_data)
+        counters = instrument.snapshot()["counters"]
+    finally:
+        instrument.disable()
+    assert (counters["cache.misses"], counters["cache.hits"], counters["cache.refreshes"]) == (1, 1, 1)
@@ -0,0 +1,42 @@
+import importlib
+import io
+
+import diodes
+import lazy_library
+import netlist
+
+names = ["D1N4148", "1N5818", "UF4007"]
+
+def test_models_match_the_diode_test_listing(test_data, tmp_path):
+    diode_test = importlib.import_module("diode-test")
+    out = tmp_path / "sweep.cir"
+    with lazy_library.LazyLibrary(test_data) as library:
+        listing = diode_test.listing(names, library)
+        with netlist.NetlistWriter(str(out), library) as writer:
+            for circuit in netlist.sweep(names, depth=2):
+                writer.add(circuit, nodes=(1, 2, 0))
+    text = out.read_text()
+    # the .MODEL cards are the same text, in the same order, as in the listing
+    cards = "\n".join(str(library[name]) for name in names)
+    assert cards in listing
+    assert text.endswith("\n\n" + cards + "\n")
+    assert text.count(".MODEL") == listing.count(".MODEL") == len(names)
+    # and they parse back to the same diodes
+    (tmp_path / "listing.cir").write_text(listing)
+    parsed = lambda path: [repr(diode) for diode in diodes.SpiceDiode.parse(str(path))]
+    assert parsed(out) == parsed(tmp_path / "listing.cir")
+
+def test_each_topology_once():
+    out = io.StringIO()
+    library = {name : diodes.SpiceDiode(name, "IS=1n") for name in names}
+    circuits = list(netlist.sweep(names[:2], depth=2)) * 2
+    with netlist.NetlistWriter(out, library) as writer:
+        for circuit in circuits:
+            writer.add(circuit)
+    text = out.getvalue()
+    assert writer.duplicates == len(circuits) // 2
+    assert text.count(".SUBCKT") == len(circuits) // 2 == 3 * 4
+    for circuit in circuits:
+        assert text.count(circuit.subckt() + "\n") == 1
+    # only the models that were used
+    assert text.count(".MODEL") == 2 and "UF4007" not in text
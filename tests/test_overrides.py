@@ -0,0 +1,42 @@
+import gc
+import pickle
+
+import diode_library
+import diodes
+
+def test_defaults_are_not_overrides():
+    diode = diodes.SpiceDiode("D1", "IS=1e-14 N=1 RS=0.5 BV=100")
+    assert set(diode._overrides) == {"RS", "BV"}
+    assert diode.IS == 1e-14 and diode.N == 1
+
+def test_identical_models_share_overrides():
+    a = diodes.SpiceDiode("A", "IS=2n RS=0.5")
+    b = diodes.SpiceDiode("B", "RS=0.5 IS=2n")
+    assert a._overrides is b._overrides
+    c = pickle.loads(pickle.dumps(a))
+    assert c._overrides is a._overrides and str(c) == str(a)
+
+def test_setattr_does_not_intern():
+    diode = diodes.SpiceDiode("D1", "IS=2n RS=0.5")
+    shared = diode._overrides
+    size = len(diodes.SpiceDiode._interned)
+    for rs in range(1, 50):
+        diode.RS = float(rs)
+    assert len(diodes.SpiceDiode._interned) == size
+    assert diode.RS == 49.0 and shared["RS"] == 0.5
+    diode.RS = 0 # the default
+    assert "RS" not in diode._overrides
+    diode.freeze()
+    assert diode._overrides is diodes.SpiceDiode("D2", "IS=2n")._overrides
+
+def test_intern_table_is_released(test_data):
+    gc.collect()
+    before = len(diodes.SpiceDiode._interned)
+    library = diode_library.DiodeLibrary.parse(test_data)
+    diode_list = library.to_diodes()
+    parsed = list(diodes.SpiceDiode.parse(test_data))
+    assert [str(d) for d in diode_list] == [str(d) for d in parsed]
+    assert len(diodes.SpiceDiode._interned) <= before + len(parsed)
+    del library, diode_list, parsed
+    gc.collect()
+    assert len(diodes.SpiceDiode._interned) == before
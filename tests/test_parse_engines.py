@@ -0,0 +1,140 @@
+import gzip
+import io
+import os
+import zipfile
+
+import pytest
+
+import diodes
+
+def models(diode_list):
+    return [(diode.name, diode.linenum, str(diode)) for diode in diode_list]
+
+@pytest.fixture
+def reference(test_data):
+    return models(diodes.SpiceDiode.parse(test_data, engine="regex"))
+
+def crlf(path, tmp_path):
+    with open(path, "rb") as f:
+        buffer = f.read().replace(b"\n", b"\r\n")
+    crlf_path = str(tmp_path / "crlf.txt")
+    with open(crlf_path, "wb") as f:
+        f.write(buffer)
+    return crlf_path
+
+def compressed(path, tmp_path):
+    """Return the .gz and .zip copies of path."""
+    with open(path, "rb") as f:
+        buffer = f.read()
+    gz_path = str(tmp_path / (os.path.basename(path) + ".gz"))
+    with gzip.open(gz_path, "wb") as f:
+        f.write(buffer)
+    zip_path = str(tmp_path / (os.path.basename(path) + ".zip"))
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("library.txt", buffer)
+    return [gz_path, zip_path]
+
+def test_reference_has_models(reference):
+    assert len(reference) > 10
+
+@pytest.mark.parametrize("engine", diodes.SpiceDiode.parse_engines)
+def test_engines_agree(test_data, reference, engine):
+    assert models(diodes.SpiceDiode.parse(test_data, engine=engine)) == reference
+
+@pytest.mark.parametrize("engine", diodes.SpiceDiode.parse_engines)
+@pytest.mark.parametrize("newline", ["lf", "crlf"])
+def test_compressed(test_data, reference, tmp_path, engine, newline):
+    path = crlf(test_data, tmp_path) if newline == "crlf" else test_data
+    for compressed_path in compressed(path, tmp_path):
+        assert models(diodes.SpiceDiode.parse(compressed_path, engine=engine)) == reference, compressed_path
+
+@pytest.mark.parametrize("chunk", [1, 7, 64, 4096])
+def test_record_stream_chunks(test_data, reference, tmp_path, chunk):
+    with open(crlf(test_data, tmp_path), "rb") as f:
+        buffer = f.read()
+    records = diodes.RecordStream()
+    found = []
+    for start in range(0, len(buffer), chunk):
+        found.extend(records.feed(buffer[start:start + chunk]))
+    found.extend(records.close())
+    assert [(name, linenum) for name, _, linenum in found] == [(name, linenum) for name, linenum, _ in reference]
+
+def test_parse_async(test_data, reference):
+    import asyncio
+    with open(test_data, "rb") as f:
+        buffer = f.read()
+    async def chunks():
+        for start in range(0, len(buffer), 10):
+            yield buffer[start:start + 10]
+    async def parse():
+        return [diode async for diode in diodes.SpiceDiode.parse_async(chunks())]
+    assert models(asyncio.run(parse())) == reference
+
+def test_zip_member(test_data, reference, tmp_path):
+    zip_path = str(tmp_path / "bundle.zip")
+    with open(test_data, "rb") as f:
+        buffer = f.read()
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        archive.writestr("a.txt", buffer)
+        archive.writestr("b.lib", buffer)
+    assert diodes.archive_members(zip_path) == ["a.txt", "b.lib"]
+    with pytest.raises(ValueError):
+        list(diodes.SpiceDiode.parse(zip_path))
+    with diodes.open_library(zip_path, "b.lib") as f:
+        assert models(diodes.SpiceDiode.parse(f, engine="stream")) == reference
+
+fuzz_lines = [
+    "", "  ", "+", "+ ", " + \t", "+ .model LEAD D(IS=1n)", "+.MODEL PLUS D IS=2n", "+ x",
+    ".model A D(IS=1n", "+ N=1.5)", "+ RS=0.1", " .MODEL B D IS=3n N=2", ".model Q NPN(BF=100)",
+    "* comment", "*SRC=A;B;Diodes;Si;  50.0V  10.0A", ".subckt S 1 2", "+ .subckt T 1 2", ".ends", ".ENDS S",
+]
+
+def fuzz_records(text, skip_subckt):
+    """Return the records of each engine for text, keyed by engine."""
+    data = text.encode("latin-1")
+    engines = {
+        "regex" : diodes.SpiceDiode.parse_lines(io.StringIO(text), skip_subckt),
+        "scan" : diodes.SpiceDiode.scan(text, skip_subckt),
+        "scan bytes" : diodes.SpiceDiode.scan(data, skip_subckt),
+        "scan crlf" : diodes.SpiceDiode.scan(data.replace(b"\n", b"\r\n"), skip_subckt),
+        "stream" : diodes.SpiceDiode.stream(io.BytesIO(data), skip_subckt, chunk_size=64),
+    }
+    for chunk in (1, 5):
+        records = diodes.RecordStream(skip_subckt)
+        found = []
+        for start in range(0, len(data), chunk):
+            found.extend(records.feed(data[start:start + chunk]))
+        engines["feed {chunk}".format(chunk=chunk)] = found + records.close()
+    return {engine : list(records) for engine, records in engines.items()}
+
+@pytest.mark.parametrize("skip_subckt", [True, False])
+def test_fuzzed_engines_agree(skip_subckt):
+    import random
+    rng = random.Random(2)
+    for run in range(2000):
+        lines = [rng.choice(fuzz_lines) for _ in range(rng.randint(0, 8))]
+        if run % 2:
+            lines.insert(0, rng.choice([line for line in fuzz_lines if line.startswith("+")]))
+        text = "\n".join(lines) + rng.choice(["", "\n"])
+        found = fuzz_records(text, skip_subckt)
+        for engine, records in found.items():
+            assert records == found["regex"], (engine, text)
+
+@pytest.mark.parametrize("text, expected", [
+    ("+ .model LEAD D(IS=1n)\n.model A D(IS=2n)\n", [("LEAD", 1), ("A", 2)]),
+    ("+\n+ .model LEAD D(IS=1n\n+ N=2)", [("LEAD", 3)]),
+    ("\n+ .model BLANK D(IS=1n)\n", [("BLANK", 2)]),
+    ("* x\n+ .model CONTINUED D(IS=1n)\n", []),
+])
+def test_leading_continuation(text, expected):
+    for engine, records in fuzz_records(text, True).items():
+        assert [(name, linenum) for name, _, linenum in records] == expected, engine
+
+@pytest.mark.parametrize("engine", diodes.SpiceDiode.parse_engines)
+def test_latin_1_path(tmp_path, engine):
+    path = str(tmp_path / "latin-1.txt")
+    with open(path, "wb") as f:
+        f.write(b"* 1\xb5A \xc2 not utf-8\n.model A D(IS=1n)\n*SRC=A;A;Diodes;Si;  50.0V  10.0A  \xb5 rectifier\n")
+    assert [diode.name for diode in diodes.SpiceDiode.parse(path, engine=engine)] == ["A"]
+    comment, = diodes.SourceComment.parse(path)
+    assert comment.description == "\xb5 rectifier"
@@ -0,0 +1,108 @@
+import json
+import os
+import sys
+
+import scheduler
+
+simulator = """
+import os, sys
+netlist = sys.argv[1]
+with open(netlist) as f:
+    text = f.read()
+if "FAIL" in text and not os.path.exists("fixed"):
+    sys.exit("simulation failed")
+with open(netlist[:-len(".cir")] + ".out", "w") as f:
+    f.write(text)
+"""
+
+def jobs(*names):
+    return [scheduler.Job(name, name + ".out", "* {name}\n".format(name=name)) for name in names]
+
+def command(tmp_path):
+    script = tmp_path / "simulator.py"
+    script.write_text(simulator)
+    return [sys.executable, str(script), "{netlist}"]
+
+def manifest(folder):
+    with open(os.path.join(folder, scheduler.Manifest.file_name)) as f:
+        return [json.loads(line) for line in f]
+
+def test_schedule_records_every_job(tmp_path):
+    folder = str(tmp_path / "out")
+    progress = scheduler.schedule(jobs("A", "B", "C"), command(tmp_path), folder, workers=2)
+    assert progress.counts == {"ok" : 3, "failed" : 0}
+    assert sorted(entry["job"] for entry in manifest(folder)) == ["A", "B", "C"]
+    assert all(os.path.exists(os.path.join(folder, name + ".out")) for name in "ABC")
+
+def test_resume_skips_done_jobs(tmp_path):
+    folder = str(tmp_path / "out")
+    scheduler.schedule(jobs("A", "B"), command(tmp_path), folder)
+    progress = scheduler.schedule(jobs("A", "B", "C"), command(tmp_path), folder)
+    assert progress.counts == {"ok" : 1, "failed" : 0}
+    assert [entry["job"] for entry in manifest(folder)] == ["A", "B", "C"]
+
+def test_failed_jobs_are_retried_only_when_asked(tmp_path):
+    folder = str(tmp_path / "out")
+    sweep = jobs("A") + [scheduler.Job("B", "B.out", "* FAIL\n")]
+    progress = scheduler.schedule(sweep, command(tmp_path), folder)
+    assert progress.counts == {"ok" : 1, "failed" : 1}
+    failed, = [entry for entry in manifest(folder) if entry["job"] == "B"]
+    assert failed["status"] == "failed" and "simulation failed" in failed["error"]
+    open(os.path.join(folder, "fixed"), "w").close()
+    assert scheduler.schedule(sweep, command(tmp_path), folder).counts == {"ok" : 0, "failed" : 0}
+    assert scheduler.schedule(sweep, command(tmp_path), folder, retry=True).counts == {"ok" : 1, "failed" : 0}
+    with scheduler.Manifest(folder) as resumed:
+        assert resumed.done("B", retry=True)
+
+def test_missing_output_is_a_failure(tmp_path):
+    folder = str(tmp_path / "out")
+    job = scheduler.Job("A", "elsewhere.out", "* A\n")
+    assert scheduler.schedule([job], command(tmp_path), folder).counts == {"ok" : 0, "failed" : 1}
+    assert manifest(folder)[0]["error"] == "no output"
+
+def test_cut_short_manifest_line(tmp_path):
+    folder = str(tmp_path / "out")
+    scheduler.schedule(jobs("A", "B"), command(tmp_path), folder)
+    with open(os.path.join(folder, scheduler.Manifest.file_name), "a") as f:
+        f.write('{"job" : "C", "sta')
+    with scheduler.Manifest(folder) as resumed:
+        assert sorted(resumed.entries) == ["A", "B"]
+    assert scheduler.schedule(jobs("A", "B", "C"), command(tmp_path), folder).counts == {"ok" : 1, "failed" : 0}
+
+def test_stub_simulator(tmp_path, test_data):
+    import lazy_library
+    folder = str(tmp_path / "out")
+    stub = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(scheduler.__file__)), "spice_stub.py"), "{netlist}"]
+    with lazy_library.LazyLibrary(test_data) as library:
+        sweep = list(scheduler.four_jobs(["D1N4148", "1N5818"], library)) + list(scheduler.dc_jobs(["D1N4148"], library))
+    progress = scheduler.schedule(sweep, stub, folder, workers=2)
+    assert progress.counts == {"ok" : 4, "failed" : 0}, manifest(folder)
+    assert os.path.exists(os.path.join(folder, "D1N4148__1N5818.four"))
+    assert os.path.exists(os.path.join(folder, "D1N4148.data"))
+
+def test_jobs_are_built_as_they_are_handed_out(tmp_path, monkeypatch):
+    folder = str(tmp_path / "out")
+    scheduler.schedule(jobs("J0", "J1"), command(tmp_path), folder)
+    built = []
+    def sweep():
+        for i in range(20):
+            built.append(i)
+            yield from jobs("J{i}".format(i=i))
+    started = []
+    run = scheduler.run
+    def counted_run(job, *args):
+        started.append(len(built))
+        return run(job, *args)
+    monkeypatch.setattr(scheduler, "run", counted_run)
+    progress = scheduler.schedule(sweep(), command(tmp_path), folder, total=20)
+    assert progress.total == 18 and progress.counts == {"ok" : 18, "failed" : 0}
+    # the queue is at most two jobs per worker ahead of the one running, after the two skipped
+    assert started[0] <= 5
+
+def test_netlist_write_error_fails_only_that_job(tmp_path):
+    folder = str(tmp_path / "out")
+    sweep = jobs("A") + [scheduler.Job(os.path.join("missing", "B"), "B.out", "* B\n")] + jobs("C")
+    progress = scheduler.schedule(sweep, command(tmp_path), folder)
+    assert progress.counts == {"ok" : 2, "failed" : 1}
+    failed, = [entry for entry in manifest(folder) if entry["status"] == "failed"]
+    assert failed["returncode"] is None and "missing" in failed["error"]
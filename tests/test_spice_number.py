@@ -0,0 +1,59 @@
+import pytest
+
+import instrument
+import spice_number
+
+@pytest.mark.parametrize("literal, value", [
+    # exponent
+    ("2.06E-3", 2.06e-3),
+    ("1e9", 1e9),
+    ("-4.5e+2", -450),
+    ("3.28772E-011", 3.28772e-11),
+    # scale suffix, in either case, with or without a unit after it
+    ("1k", 1e3),
+    ("2.2K", 2.2e3),
+    ("1meg", 1e6),
+    ("4.7MEG", 4.7e6),
+    ("1x", 1e6),
+    ("2.04m", 2.04e-3),
+    ("10.0u", 1e-5),
+    ("10.0uA", 1e-5),
+    ("10.0uF", 1e-5),
+    ("12n", 12e-9),
+    ("99.5p", 99.5e-12),
+    ("1f", 1e-15),
+    ("1F", 1e-15),
+    ("3g", 3e9),
+    ("1t", 1e12),
+    (".4m", .4e-3),
+    ("-3m", -3e-3),
+    # plain
+    ("16", 16),
+    ("0.600", 0.6),
+    (".99", 0.99),
+    ("-5", -5),
+    ("100V", 100),
+    (" 75", 75),
+])
+def test_parse(literal, value):
+    assert spice_number.parse(literal) == pytest.approx(value, rel=1e-12)
+
+@pytest.mark.parametrize("literal", ["", "abc", "meg"])
+def test_no_number(literal):
+    with pytest.raises(ValueError):
+        spice_number.parse(literal)
+
+def test_parse_list():
+    assert spice_number.parse_list(["1k", "1m", "1k", "1"]) == pytest.approx([1e3, 1e-3, 1e3, 1])
+
+def test_counts():
+    spice_number.parse.cache_clear()
+    instrument.enable()
+    try:
+        for literal in ["1e3", "1k", "1", "1k"]:
+            spice_number.parse(literal)
+        counters = instrument.snapshot()["counters"]
+    finally:
+        instrument.disable()
+    assert counters["float.exponent"] == counters["float.scale"] == counters["float.plain"] == 1
+    assert counters["float.cache_hits"] == 1 and counters["float.cache_misses"] == 3
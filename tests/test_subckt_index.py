@@ -0,0 +1,79 @@
+import pytest
+
+import subckt_index
+
+def index(tmp_path, text):
+    path = tmp_path / "library.txt"
+    path.write_text(text)
+    return subckt_index.SubcktIndex(str(path))
+
+def blocks(ix):
+    return {block.path : (block.linenum, block.last, sorted(block.models), block.closed) for top in ix.top for block in top.walk()}
+
+def test_nested(tmp_path):
+    with index(tmp_path, """.SUBCKT OUTER 1 2
+X1 1 3 INNER
+D1 3 2 DOUT
+.SUBCKT INNER 1 2
+D1 1 2 DIN
+.model DIN D(IS=1n)
+.ENDS INNER
+.model DOUT D(IS=2n)
+.ENDS OUTER
+.model TOP D(IS=3n)
+""") as ix:
+        assert blocks(ix) == {"OUTER" : (1, 9, ["DOUT"], True), "OUTER.INNER" : (4, 7, ["DIN"], True)}
+        assert list(ix.models) == ["TOP"]
+        assert [diode.name for diode in ix.diodes("OUTER")] == ["DOUT", "DIN"]
+        assert [diode.name for diode in ix.diodes("OUTER", nested=False)] == ["DOUT"]
+        assert ix.body("INNER").startswith(".SUBCKT INNER") and ix.body("INNER").endswith(".ENDS INNER\n")
+
+def test_unterminated_before_a_subckt_it_does_not_use(tmp_path):
+    with index(tmp_path, """.SUBCKT A 1 2
+D1 1 2 DA
+.model DA D(IS=1n)
+.model LOOSE D(IS=2n)
+.SUBCKT B 1 2
+D1 1 2 DB
+.model DB D(IS=3n)
+.ENDS B
+""") as ix:
+        # A ends with the last model it uses, LOOSE goes back to the top level
+        assert blocks(ix) == {"A" : (1, 3, ["DA"], False), "B" : (5, 8, ["DB"], True)}
+        assert list(ix.models) == ["LOOSE"]
+        assert ix.diodes("A")[0].IS == pytest.approx(1e-9)
+
+def test_unterminated_at_the_end(tmp_path):
+    with index(tmp_path, """.SUBCKT Z 1 2
+D1 1 2 DZ
+.model DZ D(IS=1n)
+.model TAIL D(IS=2n)
+""") as ix:
+        assert blocks(ix) == {"Z" : (1, 3, ["DZ"], False)}
+        assert list(ix.models) == ["TAIL"]
+
+def test_named_ends_closes_the_inner_blocks(tmp_path):
+    with index(tmp_path, """.SUBCKT OUTER 1 2
+X1 1 2 INNER
+.SUBCKT INNER 1 2
+D1 1 2 DIN
+.model DIN D(IS=1n)
+.ENDS OUTER
+.model TOP D(IS=3n)
+""") as ix:
+        assert blocks(ix) == {"OUTER" : (1, 6, [], True), "OUTER.INNER" : (3, 5, ["DIN"], False)}
+        assert list(ix.models) == ["TOP"]
+
+def test_stray_ends(tmp_path):
+    with index(tmp_path, """.ENDS
+.model TOP D(IS=1n)
+.SUBCKT C 1 2
+D1 1 2 DC
+.model DC D(IS=1n)
+.ENDS
+.ENDS
+.model AFTER D(IS=1n)
+""") as ix:
+        assert blocks(ix) == {"C" : (3, 6, ["DC"], True)}
+        assert list(ix.models) == ["TOP", "AFTER"]
+        assert ix.model(None, "AFTER").linenum == 8
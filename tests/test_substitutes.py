@@ -0,0 +1,62 @@
+import os
+
+import numpy
+import pytest
+
+import diode_library
+import substitutes
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def brute_force(points, point, k, exclude=()):
+    distances = numpy.sqrt(((points - point) ** 2).sum(axis=1))
+    order = [row for row in numpy.argsort(distances, kind="stable") if row not in exclude]
+    return [(float(distances[row]), int(row)) for row in order[:k]]
+
+@pytest.mark.parametrize("leaf_size", [1, 4, 32])
+def test_kd_tree_matches_brute_force(leaf_size):
+    rng = numpy.random.default_rng(8)
+    points = rng.normal(size=(500, 5)) * [1, 10, 0.1, 1, 1]
+    tree = substitutes.KDTree(points, leaf_size)
+    for _ in range(50):
+        point = rng.normal(size=5) * 2
+        k = int(rng.integers(1, 12))
+        exclude = set(rng.integers(0, len(points), 3).tolist())
+        found = tree.query(point, k, exclude)
+        expected = brute_force(points, point, k, exclude)
+        assert [row for _, row in found] == [row for _, row in expected]
+        numpy.testing.assert_allclose([d for d, _ in found], [d for d, _ in expected])
+
+def test_kd_tree_duplicates_and_small_sets():
+    points = numpy.array([[0.0, 0.0]] * 40 + [[1.0, 1.0]] * 3)
+    tree = substitutes.KDTree(points, leaf_size=4)
+    found = tree.query([1.0, 1.0], k=5)
+    assert sorted(row for _, row in found[:3]) == [40, 41, 42]
+    assert [d for d, _ in found] == pytest.approx([0, 0, 0, 2 ** 0.5, 2 ** 0.5])
+    assert len(substitutes.KDTree(points[:2]).query([0, 0], k=5)) == 2
+
+@pytest.fixture(scope="module")
+def finder():
+    library = diode_library.DiodeLibrary.parse(os.path.join(root, "diodes-inc.txt"))
+    return substitutes.SubstituteFinder(library, weights={"BV" : 2})
+
+def test_nearest_matches_brute_force(finder):
+    points = finder.tree.points
+    for name in ("DI_10A01", "DI_DFLS160", "1N4148W"):
+        row = finder.library.row(name)
+        found = finder.nearest(name, k=5)
+        expected = brute_force(points, points[row], 5, {row})
+        assert [found_name for found_name, _ in found] == [finder.library.names[row] for _, row in expected]
+        assert [distance for _, distance in found] == pytest.approx([distance for distance, _ in expected])
+
+def test_nearest_of_a_model_or_parameters(finder):
+    # a model that is not looked up by name is not left out, it is its own nearest
+    found = finder.nearest(finder.library["DI_DFLS160"], k=6)
+    assert found[0] == ("DI_DFLS160", pytest.approx(0))
+    assert found[1:] == finder.nearest("DI_DFLS160", k=5)
+    parameters = {p : finder.library.columns[p][finder.library.row("DI_DFLS160")] for p in finder.library.columns}
+    assert finder.nearest(parameters, k=6) == found
+
+def test_unknown_weight(finder):
+    with pytest.raises(ValueError):
+        substitutes.SubstituteFinder(finder.library, weights={"XX" : 1})
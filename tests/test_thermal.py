@@ -0,0 +1,56 @@
+import numpy
+import pytest
+
+import diode_library
+import diodes
+import thermal
+
+@pytest.fixture
+def library(test_data):
+    return diode_library.DiodeLibrary.parse(test_data)
+
+def columns(*parameters):
+    return diode_library.DiodeLibrary([diodes.SpiceDiode("D%d" % i, p) for i, p in enumerate(parameters)]).columns
+
+def test_tnom_is_the_identity(library):
+    p = thermal.scale(library.columns, 27)
+    for name, column in library.columns.items():
+        numpy.testing.assert_allclose(p[name], column, rtol=1e-12, err_msg=name)
+
+def test_tnom_of_each_model():
+    c = columns("IS=1n TNOM=50 TBV1=1m TRS1=2m RS=1 BV=10")
+    p = thermal.scale(c, 50)
+    for name in ("IS", "ISR", "VJ", "CJO", "BV", "RS"):
+        assert p[name][0] == pytest.approx(c[name][0], rel=1e-12)
+    assert thermal.scale(c, 27)["IS"][0] < c["IS"][0]
+
+def test_is_by_hand():
+    # 127C from TNOM 27C: T/Tnom = 400.15/300.15 = 1.33317, Vt = 34.482 mV
+    # 1e-14 * 1.33317^3 * exp(0.33317 * 1.11 / 0.034482) = 1e-14 * 2.3695 * 45468 = 1.0774e-9
+    p = thermal.scale(columns("IS=1e-14 N=1 EG=1.11 XTI=3"), 127)
+    assert p["IS"][0] == pytest.approx(1.0774e-9, rel=1e-4)
+    assert p["TNOM"][0] == 127
+
+def test_eg_xti_and_n():
+    p = thermal.scale(columns("IS=1e-14 EG=0 XTI=0", "IS=1e-14 EG=0 XTI=3", "IS=1e-14 EG=0 XTI=3 N=2", "IS=1e-14 EG=0.69 XTI=0", "IS=1e-14 EG=1.11 XTI=0"), 127)
+    ratio = 400.15 / 300.15
+    assert p["IS"][0] == pytest.approx(1e-14)
+    assert p["IS"][1] == pytest.approx(1e-14 * ratio**3)
+    assert p["IS"][2] == pytest.approx(1e-14 * ratio**1.5)
+    assert 1e-14 < p["IS"][3] < p["IS"][4]
+
+def test_tbv1_and_trs1():
+    c = columns("BV=10 RS=2 TBV1=1m TRS1=5m", "BV=10 RS=2")
+    hot = thermal.scale(c, 127)
+    cold = thermal.scale(c, -73)
+    assert list(hot["BV"]) == pytest.approx([11, 10])
+    assert list(hot["RS"]) == pytest.approx([3, 2])
+    assert list(cold["BV"]) == pytest.approx([9, 10])
+    assert list(cold["RS"]) == pytest.approx([1, 2])
+
+def test_cached_per_temperature(library):
+    thermal_library = thermal.ThermalLibrary(library)
+    assert thermal_library.parameters(85) is thermal_library.parameters(85.0)
+    v = thermal_library.iv_voltage([1e-3], [-40, 27, 125])[:, :, 0]
+    assert v.shape == (3, len(library.names))
+    assert numpy.all(v[0] > v[1]) and numpy.all(v[1] > v[2])
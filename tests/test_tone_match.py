@@ -0,0 +1,45 @@
+import math
+
+import pytest
+
+import four_table
+import tone_match
+
+nan = float("nan")
+
+@pytest.fixture
+def index():
+    # fundamental 1, so each profile value is 100 * the magnitude of a lone harmonic
+    table = four_table.FourierTable([
+        (("A", "A"), 5, 10, [0, 1, 0.1, 0, 0]),
+        (("A", "B"), 5, 10.2, [0, 1, 0.1, 0.02, 0]),
+        (("B", "B"), 5, 10, [0, 1, 0, 0.1, 0]),
+        (("C", "C"), 5, 20, [0, 1, 0.2, 0, 0]),
+        (("D", "D"), 5, 10, [0, 1, 0.1, nan, 0]), # incomplete, not indexed
+    ])
+    return tone_match.HarmonicIndex(table)
+
+def test_profiles(index):
+    assert len(index) == 4 and ("D", "D") not in index.rows
+    assert list(index.harmonics) == [2, 3, 4]
+    assert list(index.signature("A__B")) == pytest.approx([10, 100 * math.sqrt(0.0104) - 10, 0], rel=1e-5)
+    assert list(index.signature({3 : 10, 9 : 1})) == [0, 10, 0]
+    assert list(index.signature("X,Y,1.0,0,10")) == [0, 10, 0]
+    assert list(index.signature([5])) == [5, 0, 0]
+
+def test_euclidean_ranking(index):
+    ranking = index.query("A__A", k=10)
+    assert [pair[:2] for pair in ranking] == [("A", "B"), ("C", "C"), ("B", "B")]
+    assert [pair[2] for pair in ranking] == pytest.approx([0.198039, 10, math.hypot(10, 10)], rel=1e-4)
+    assert index.query("A__A", k=1, exclude=False) == [("A", "A", 0.0)]
+    assert index.query([0, 10, 0], k=1)[0][:2] == ("B", "B")
+    assert index.query("A__A", k=0) == []
+
+def test_cosine_ranking(index):
+    # only the shape counts, so C C is as close as it gets
+    ranking = index.query("A__A", k=3, metric="cosine")
+    assert [pair[:2] for pair in ranking] == [("C", "C"), ("A", "B"), ("B", "B")]
+    assert ranking[0][2] == pytest.approx(0, abs=1e-6)
+    assert ranking[2][2] == pytest.approx(1)
+    with pytest.raises(ValueError):
+        index.query("A__A", metric="manhattan")
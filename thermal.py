@@ -0,0 +1,101 @@
+#! python3
+r""" thermal.py
+
+Evaluate diode libraries across temperature using EG, XTI and TNOM.
+
+Temperatures are in C, like TNOM. At temperature T (kelvin) with
+Tnom = TNOM + 273.15 and Vt = k*T/q:
+
+IS(T)   = IS * (T/Tnom)^(XTI/N) * exp((T/Tnom - 1)*EG/(N*Vt))
+ISR(T)  = ISR * (T/Tnom)^(XTI/NR) * exp((T/Tnom - 1)*EG/(NR*Vt))
+VJ(T)   = VJ*T/Tnom - 3*Vt*ln(T/Tnom) - Eg(Tnom)*T/Tnom + Eg(T)
+CJO(T)  = CJO * (1 + M*(0.0004*(T - Tnom) + 1 - VJ(T)/VJ))
+BV(T)   = BV * (1 + TBV1*(T - Tnom))
+RS(T)   = RS * (1 + TRS1*(T - Tnom))
+
+Eg(T) = 1.16 - 7.02e-4*T^2/(T + 1108) is the silicon band gap SPICE uses
+for the junction potential.
+"""
+
+import argparse
+
+import numpy
+
+import diode_library
+import diodes
+import iv_curves
+import spice_number
+
+parser = argparse.ArgumentParser(description='Show forward voltage across temperature for some diode models.')
+parser.add_argument('models', nargs='+', help='The name(s) of the diode model(s) to evaluate.')
+parser.add_argument('--model_file', '-f', default=r"E:\eda\diodes\diodes-inc.txt", help='The file to get the model(s) from.')
+parser.add_argument('--current', '-i', default='1m', help='The forward current, e.g. 1m')
+parser.add_argument('--low', type=float, default=-40, help='The lowest temperature in C')
+parser.add_argument('--high', type=float, default=125, help='The highest temperature in C')
+parser.add_argument('--step', type=float, default=1, help='The temperature step in C')
+
+kelvin = 273.15
+
+def band_gap(t):
+    return 1.16 - 7.02e-4 * t**2 / (t + 1108)
+
+def scale(columns, temperature):
+    """Return a new dict of parameter columns adjusted to temperature (C)."""
+    p = dict(columns)
+    t = temperature + kelvin
+    tnom = p["TNOM"] + kelvin
+    ratio = t / tnom
+    vt = diodes.SpiceDiode.thermal_voltage(t)
+    p["IS"] = p["IS"] * ratio**(p["XTI"] / p["N"]) * numpy.exp((ratio - 1) * p["EG"] / (p["N"] * vt))
+    p["ISR"] = p["ISR"] * ratio**(p["XTI"] / p["NR"]) * numpy.exp((ratio - 1) * p["EG"] / (p["NR"] * vt))
+    vj = p["VJ"] * ratio - 3 * vt * numpy.log(ratio) - band_gap(tnom) * ratio + band_gap(t)
+    p["CJO"] = p["CJO"] * (1 + p["M"] * (0.0004 * (t - tnom) + 1 - vj / p["VJ"]))
+    p["VJ"] = vj
+    p["BV"] = p["BV"] * (1 + p["TBV1"] * (t - tnom))
+    p["RS"] = p["RS"] * (1 + p["TRS1"] * (t - tnom))
+    p["TNOM"] = numpy.full_like(p["TNOM"], temperature)
+    return p
+
+class ThermalLibrary():
+    """A set of models with their temperature adjusted parameters cached per temperature."""
+    def __init__(self, models):
+        self.columns = iv_curves.columns(models)
+        self.cache = {}
+    def __repr__(self):
+        return "ThermalLibrary({n} models, {t} temperatures cached)".format(n=len(self.columns["IS"]), t=len(self.cache))
+    def parameters(self, temperature):
+        """Return the parameter columns at temperature (C)."""
+        temperature = float(temperature)
+        if temperature not in self.cache:
+            self.cache[temperature] = scale(self.columns, temperature)
+        return self.cache[temperature]
+    def stacked(self, temperatures):
+        """Return parameter columns for every (temperature, model) row and the matching kelvin temperature of each row."""
+        sets = [self.parameters(t) for t in temperatures]
+        columns = {p : numpy.concatenate([s[p] for s in sets]) for p in self.columns}
+        n = len(self.columns["IS"])
+        kelvins = numpy.repeat(numpy.asarray(temperatures, dtype=numpy.float64) + kelvin, n)
+        return columns, kelvins
+    def iv_voltage(self, currents, temperatures):
+        """Return the (temperatures x models x points) array of terminal voltage at each current."""
+        columns, kelvins = self.stacked(temperatures)
+        v = iv_curves.iv_voltage(columns, currents, kelvins)
+        return v.reshape(len(temperatures), -1, v.shape[-1])
+    def iv_current(self, voltages, temperatures):
+        """Return the (temperatures x models x points) array of current at each terminal voltage."""
+        columns, kelvins = self.stacked(temperatures)
+        i = iv_curves.iv_current(columns, voltages, kelvins)
+        return i.reshape(len(temperatures), -1, i.shape[-1])
+
+def main():
+    args = parser.parse_args()
+    library = diode_library.DiodeLibrary.parse(args.model_file)
+    library = library.select(library.rows(args.models))
+    temperatures = numpy.arange(args.low, args.high + args.step / 2, args.step)
+    vf = ThermalLibrary(library).iv_voltage([spice_number.parse(args.current)], temperatures)[:, :, 0]
+    print (",".join(["T"] + list(library.names)))
+    for t, row in zip(temperatures, vf):
+        print (",".join(["{0:g}".format(t)] + ["{0:.4f}".format(v) for v in row]))
+
+if __name__ == '__main__':
+    main()
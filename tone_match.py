@@ -0,0 +1,137 @@
+#! python3
+r""" tone_match.py
+
+Find the diode pairs whose harmonic distortion profile is closest to a
+target.
+
+A profile is the distortion each harmonic adds, the FourierAnalysis
+distortion dict, harmonics 2 to n-1. HarmonicIndex is built once from a
+FourierTable: the complete pairs' profiles as one float32 matrix with the
+squared norm of each row. A query is one matrix-vector product, distances
+from |x|^2 - 2 x.t + |t|^2, and numpy.argpartition for the top k, so it
+stays interactive with hundreds of thousands of pairs.
+
+The target can be a distortion dict, a list of values for harmonics 2, 3...,
+a row of four_table.txt, or the name of a pair in the index as
+<positive>__<negative> to find pairs that sound like it. With the cosine
+metric only the shape of the profile counts, not its level.
+
+    python tone_match.py DI_1N4001__DI_1N4001 -k 10
+    python tone_match.py "DI_10A01,DI_BAT54A,21.4,9.0,18.0,5.2,4.3"
+"""
+
+import argparse
+
+import numpy
+
+import four_table
+
+parser = argparse.ArgumentParser(description='Find the diode pairs with the harmonic distortion profile closest to a target.')
+parser.add_argument('target', help='<positive>__<negative>, a four_table.txt row or comma separated distortion values for harmonics 2, 3...')
+parser.add_argument('--four_folder', default=r"E:\eda\fourier", help='Where all the .four files are.')
+parser.add_argument('--diode_list', '-l', default=r"E:\eda\diodes\diode-list.txt", help='A file with one diode model name per line.')
+parser.add_argument('--top', '-k', type=int, default=10, help='How many pairs to show.')
+parser.add_argument('--metric', '-m', choices=('euclidean', 'cosine'), default='euclidean', help='How profiles are compared.')
+parser.add_argument('--harmonics', '-n', type=int, help='Only compare harmonics 2 to n-1.')
+parser.add_argument('--workers', '-j', type=int, default=None, help='Number of worker processes for parsing, default is one per core.')
+
+metrics = ("euclidean", "cosine")
+
+class HarmonicIndex():
+    def __init__(self, table, harmonics=None):
+        """
+        Index the complete pairs of a four_table.FourierTable, comparing
+        harmonics 2 to harmonics-1 (all of them by default).
+        """
+        rows = numpy.flatnonzero(table.complete())
+        width = table.distortion.shape[1] if harmonics is None else min(harmonics, table.distortion.shape[1])
+        self.pairs = [tuple(table.pairs[row]) for row in rows]
+        self.thd = table.thd[rows]
+        self.harmonics = numpy.arange(2, max(width, 2))
+        # harmonics past a pair's own n count as adding nothing
+        profiles = numpy.nan_to_num(table.distortion[rows, 2:width], nan=0.0)
+        self.profiles = numpy.ascontiguousarray(profiles, dtype=numpy.float32)
+        self.norms = numpy.einsum("ij,ij->i", self.profiles, self.profiles)
+        self.lengths = numpy.sqrt(self.norms)
+        self.rows = {pair : row for row, pair in enumerate(self.pairs)}
+    def __repr__(self):
+        return "HarmonicIndex: {pairs} pairs, harmonics 2 to {last}".format(pairs=len(self), last=self.harmonics[-1] if len(self.harmonics) else 1)
+    def __len__(self):
+        return len(self.pairs)
+    def signature(self, target):
+        """
+        Return the profile vector for target: a pair in the index, a dict of
+        harmonic : distortion, a sequence of values for harmonics 2, 3... or a
+        string with a pair name, a four_table.txt row or comma separated values.
+        """
+        if isinstance(target, str):
+            fields = [field.strip() for field in target.split(",")]
+            if len(fields) == 1 and "__" in fields[0]:
+                target = tuple(fields[0].split("__", 1))
+            else:
+                if len(fields) >= 3 and not self.number(fields[0]):
+                    fields = fields[3:] # positive, negative, thd
+                target = [float(field) for field in fields if field]
+        if isinstance(target, tuple) and len(target) == 2 and all(isinstance(name, str) for name in target):
+            return self.profiles[self.rows[target]]
+        vector = numpy.zeros(len(self.harmonics), dtype=numpy.float32)
+        if isinstance(target, dict):
+            for k, value in target.items():
+                if 2 <= k < 2 + len(vector):
+                    vector[k - 2] = value
+        else:
+            values = numpy.asarray(target, dtype=numpy.float32)[:len(vector)]
+            vector[:len(values)] = values
+        return vector
+    @staticmethod
+    def number(text):
+        try:
+            float(text)
+        except ValueError:
+            return False
+        return True
+    def distances(self, target, metric="euclidean"):
+        """Return the distance from target to every pair in the index."""
+        if metric not in metrics:
+            raise ValueError("Unknown metric {metric}, expected one of {metrics}.".format(metric=metric, metrics=", ".join(metrics)))
+        vector = self.signature(target)
+        dot = self.profiles @ vector
+        if metric == "cosine":
+            length = numpy.sqrt(vector @ vector)
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                similarity = dot / (self.lengths * length)
+            return 1 - numpy.nan_to_num(similarity, nan=0.0)
+        # rounding can leave tiny negative squares
+        return numpy.sqrt(numpy.maximum(self.norms - 2 * dot + vector @ vector, 0))
+    def query(self, target, k=10, metric="euclidean", exclude=True):
+        """
+        Return [(positive, negative, distance)] for the k pairs closest to
+        target, closest first. When target names a pair, that pair is left
+        out unless exclude is False.
+        """
+        distances = self.distances(target, metric)
+        if exclude and isinstance(target, (str, tuple)):
+            pair = tuple(target.split("__", 1)) if isinstance(target, str) else target
+            if pair in self.rows:
+                distances[self.rows[pair]] = numpy.inf
+        k = min(k, len(distances))
+        if k <= 0:
+            return []
+        top = numpy.argpartition(distances, k - 1)[:k]
+        top = top[numpy.argsort(distances[top], kind='stable')]
+        return [self.pairs[row] + (float(distances[row]),) for row in top if numpy.isfinite(distances[row])]
+
+def main():
+    args = parser.parse_args()
+    with open(args.diode_list) as f:
+        diode_list = f.read().splitlines()
+    table, _ = four_table.load_table(args.four_folder, diode_list, args.workers)
+    index = HarmonicIndex(table, args.harmonics)
+    print (index)
+    print ("{0:<4} {1:<20} {2:<20} {3:>10} {4:>10}".format("Rank", "Positive", "Negative", "Distance", "THD"))
+    for rank, (positive, negative, distance) in enumerate(index.query(args.target, args.top, args.metric), 1):
+        thd = index.thd[index.rows[(positive, negative)]]
+        print ("{0:<4} {1:<20} {2:<20} {3:>10.4f} {4:>10.4f}".format(rank, positive, negative, distance, thd))
+
+if __name__ == '__main__':
+    main()